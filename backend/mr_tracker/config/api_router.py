@@ -1,8 +1,10 @@
 from django.conf import settings
 from django.urls import include, path
-from rest_framework.routers import DefaultRouter, SimpleRouter
+from rest_framework.routers import SimpleRouter
 
+from config.transactions import DefaultRouter
 from mr_tracker.users.api.views import UserViewSet
+from mr_tracker.visits.api.views import SearchView
 
 router = DefaultRouter() if settings.DEBUG else SimpleRouter()
 
@@ -14,4 +16,5 @@ urlpatterns = [
     *router.urls,  
 
     path("auth/", include("mr_tracker.users.api.urls")),
+    path("search/", SearchView.as_view(), name="search"),
 ]
@@ -0,0 +1,28 @@
+"""
+ASGI config for MR-tracker project.
+
+This module contains the ASGI application used by production ASGI servers,
+such as gunicorn with uvicorn workers (``DJANGO_SERVER=asgi`` in the
+production start script). It exposes a module-level variable named
+``application``.
+
+Under ASGI the async dashboard views run their sections concurrently
+without holding a worker per request; the other views run in a thread as
+they do under WSGI.
+
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from django.core.asgi import get_asgi_application
+
+# This allows easy placement of apps within the interior
+# mr_tracker directory.
+BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
+sys.path.append(str(BASE_DIR / "mr_tracker"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.production")
+
+# This application object is used by any ASGI server configured to use this file.
+application = get_asgi_application()
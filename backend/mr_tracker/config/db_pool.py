@@ -0,0 +1,35 @@
+"""
+Metrics of the database connection pools in the serving process.
+
+With ``DATABASE_POOL`` each process keeps a psycopg pool per database. The
+stats are psycopg's counters since the process started (see
+https://www.psycopg.org/psycopg3/docs/advanced/pool.html#pool-stats): how
+many connections are open and idle, how many requests waited and for how
+long, errors and connections lost. Each worker process has its own pool,
+so the response names the process that answered.
+"""
+
+import os
+
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from config.transactions import ReadPolicyMixin
+
+
+def pool_stats():
+    """``{alias: stats}`` for each database with a connection pool."""
+    return {
+        connection.alias: connection.pool.get_stats()
+        for connection in connections.all()
+        if getattr(connection, "pool", None) is not None
+    }
+
+
+class DatabasePoolView(ReadPolicyMixin, APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), "pools": pool_stats()})
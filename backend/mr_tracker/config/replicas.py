@@ -0,0 +1,83 @@
+"""
+Read replica routing for the reporting endpoints.
+
+Views with ``ReplicaReadsMixin`` read from the ``REPLICA_DATABASE`` alias
+once the request is authenticated; every other read, and every write, uses
+``default``. A replica trails the primary, so a user who has just written
+might not see the change in a report. ``ReplicaMiddleware`` notes any write
+made during a request and pins that user to the primary for
+``REPLICA_PIN_SECONDS``, which should exceed the usual replication lag.
+Pins are cache keys, so they hold across processes.
+
+The request state is a dict in a context variable, so it reaches the
+threads the async dashboards run their sections in.
+"""
+
+import contextvars
+
+from django.conf import settings
+from django.core.cache import cache
+
+_request_state = contextvars.ContextVar("replica_request_state", default=None)
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+def read_from_replica(user):
+    """Send the current request's reads to the replica, unless ``user`` is pinned."""
+    state = _request_state.get()
+    alias = settings.REPLICA_DATABASE
+    if state is None or alias is None or cache.get(_pin_key(user.pk)):
+        return
+    state["read"] = alias
+
+
+class ReplicaReadsMixin:
+    """For read-only reporting views that tolerate replication lag."""
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permission checks still read the primary.
+        super().initial(request, *args, **kwargs)
+        read_from_replica(request.user)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        return state.get("read") if state else None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state["wrote"] = True
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary, so objects read from
+        # either may be related to each other.
+        if settings.REPLICA_DATABASE is not None:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = {}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        user = getattr(request, "user", None)
+        if (
+            settings.REPLICA_DATABASE
+            and state.get("wrote")
+            and user is not None
+            and user.is_authenticated
+        ):
+            cache.set(_pin_key(user.pk), 1, settings.REPLICA_PIN_SECONDS)
+        return response
@@ -0,0 +1,70 @@
+"""
+The OpenAPI schema, generated once per deploy and served from memory.
+
+Generating the schema introspects every view and serializer, so the first
+``/api/schema/`` request after a deploy was slow. The production start
+script now writes it to ``OPENAPI_SCHEMA_FILE`` after ``collectstatic``.
+``SchemaView`` reads that file, renders each format once per process and
+serves the bytes with an ``ETag``, answering a matching ``If-None-Match``
+with a 304. Without the file (local development, or a request for another
+``lang`` or ``version``) it generates the schema as before.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS
+from drf_spectacular.views import SpectacularAPIView
+from drf_spectacular.views import SpectacularSwaggerView
+
+from config.transactions import ReadPolicyMixin
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def _load(path):
+    return json.loads(Path(path).read_text())
+
+
+@functools.cache
+def _render(path, renderer_class, accepted_media_type):
+    body = renderer_class().render(_load(path), accepted_media_type)
+    return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+class SchemaView(ReadPolicyMixin, SpectacularAPIView):
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        path = settings.OPENAPI_SCHEMA_FILE
+        if path is None or request.GET.get("lang") or request.GET.get("version"):
+            return super().get(request, *args, **kwargs)
+        if not Path(path).exists():
+            logger.warning("%s is missing, generating the schema per request", path)
+            return super().get(request, *args, **kwargs)
+
+        renderer = request.accepted_renderer
+        body, etag = _render(path, type(renderer), request.accepted_media_type)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        content_type = request.accepted_media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = HttpResponse(body, content_type=content_type)
+        response["ETag"] = etag
+        response["Content-Disposition"] = (
+            f'inline; filename="{self._get_filename(request, None)}"'
+        )
+        return response
+
+
+class SchemaDocsView(ReadPolicyMixin, SpectacularSwaggerView):
+    pass
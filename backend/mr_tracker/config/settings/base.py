@@ -2,6 +2,7 @@
 """Base settings to build other settings files upon."""
 
 
+import os
 from pathlib import Path
 
 import environ
@@ -48,6 +49,13 @@ LOCALE_PATHS = [str(BASE_DIR / "locale")]
 # https://docs.djangoproject.com/en/dev/ref/settings/#databases
 DATABASES = {"default": env.db("DATABASE_URL")}
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
+# Optional read replica for the reporting endpoints, see config/replicas.py.
+if env("DATABASE_REPLICA_URL", default=""):
+    DATABASES["replica"] = env.db("DATABASE_REPLICA_URL")
+REPLICA_DATABASE = "replica" if "replica" in DATABASES else None
+# Seconds a user's reports read the primary after they write.
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+DATABASE_ROUTERS = ["config.replicas.ReplicaRouter"]
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -69,6 +77,7 @@ DJANGO_APPS = [
     "django.contrib.staticfiles",
     # "django.contrib.humanize", # Handy template tags
     "django.contrib.admin",
+    "django.contrib.postgres",
     "django.forms",
 ]
 THIRD_PARTY_APPS = [
@@ -83,6 +92,7 @@ THIRD_PARTY_APPS = [
     "rest_framework.authtoken",
     "corsheaders",
     "drf_spectacular",
+    "drf_spectacular_sidecar",
 ]
 
 LOCAL_APPS = [
@@ -103,6 +113,11 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": True,
 }
+# How long CachedJWTAuthentication may serve a user without reading the database.
+JWT_USER_CACHE_TTL = env.int("JWT_USER_CACHE_TTL", default=60)
+# Size of the blacklist Bloom filter; 2**24 bits (2 MiB) keep false positives
+# near 1% for up to 1.7 million live blacklisted tokens.
+JWT_BLACKLIST_FILTER_BITS = env.int("JWT_BLACKLIST_FILTER_BITS", default=2**24)
 
 # MIGRATIONS
 # ------------------------------------------------------------------------------
@@ -128,11 +143,22 @@ LOGIN_URL = "account_login"
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
 PASSWORD_HASHERS = [
     # https://docs.djangoproject.com/en/dev/topics/auth/passwords/#using-argon2-with-django
-    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "mr_tracker.users.passwords.Argon2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2PasswordHasher",
     "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
     "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
 ]
+# Argon2 cost; changing it rehashes each password at its next login.
+ARGON2_TIME_COST = env.int("ARGON2_TIME_COST", default=2)
+ARGON2_MEMORY_COST = env.int("ARGON2_MEMORY_COST", default=102400)
+ARGON2_PARALLELISM = env.int("ARGON2_PARALLELISM", default=8)
+# Password hashes run at once per host by the login endpoints, and how long
+# a login waits for a free slot before it gets a 503.
+PASSWORD_HASH_CONCURRENCY = env.int(
+    "PASSWORD_HASH_CONCURRENCY",
+    default=os.cpu_count() or 1,
+)
+PASSWORD_HASH_QUEUE_TIMEOUT = env.float("PASSWORD_HASH_QUEUE_TIMEOUT", default=2.0)
 # https://docs.djangoproject.com/en/dev/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -158,6 +184,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
+    "config.replicas.ReplicaMiddleware",
 ]
 
 # STATIC
@@ -304,7 +331,7 @@ SOCIALACCOUNT_FORMS = {"signup": "mr_tracker.users.forms.UserSocialSignupForm"}
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.SessionAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "mr_tracker.users.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.TokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
@@ -321,7 +348,12 @@ SPECTACULAR_SETTINGS = {
     "DESCRIPTION": "Documentation of API endpoints of MR-tracker",
     "VERSION": "1.0.0",
     "SCHEMA_PATH_PREFIX": "/api/",
+    # Serve the Swagger UI assets as static files rather than from a CDN.
+    "SWAGGER_UI_DIST": "SIDECAR",
+    "SWAGGER_UI_FAVICON_HREF": "SIDECAR",
 }
+# Pre-generated schema served by /api/schema/; None generates it per request.
+OPENAPI_SCHEMA_FILE = None
 # Your stuff...
 # ------------------------------------------------------------------------------
 
@@ -346,3 +378,12 @@ CORS_ALLOW_METHODS = [
     "DELETE",
     "OPTIONS",
 ]
+
+# MR dashboard: pending overdue tasks plus tasks due in the next N days.
+MR_DASHBOARD_TASK_DAYS = env.int("MR_DASHBOARD_TASK_DAYS", default=7)
+# Threads per process running dashboard sections concurrently. Each keeps
+# its own database connection, so this bounds the extra connections too.
+DASHBOARD_SECTION_WORKERS = env.int("DASHBOARD_SECTION_WORKERS", default=8)
+# Count each day's visits in Redis for the admin dashboard and the day's
+# analytics (mr_tracker.visits.live). Needs the django-redis cache.
+LIVE_VISIT_COUNTERS = env.bool("LIVE_VISIT_COUNTERS", default=False)
@@ -1,5 +1,8 @@
 # ruff: noqa: E501
+from psycopg_pool import ConnectionPool
+
 from .base import *  # noqa: F403
+from .base import BASE_DIR
 from .base import DATABASES
 from .base import INSTALLED_APPS
 from .base import REDIS_URL
@@ -15,7 +18,26 @@ ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["example.com"])
 
 # DATABASES
 # ------------------------------------------------------------------------------
-DATABASES["default"]["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
+# With DATABASE_POOL each process shares a psycopg pool of at most
+# DATABASE_POOL_MAX_SIZE connections per database among its threads, instead
+# of every thread keeping its own (CONN_MAX_AGE, which pooling replaces).
+# https://docs.djangoproject.com/en/dev/ref/databases/#connection-pool
+if env.bool("DATABASE_POOL", default=False):
+    for database in DATABASES.values():
+        database["CONN_MAX_AGE"] = 0
+        database.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=2),
+            "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=4),
+            # Seconds a request waits for a free connection before failing.
+            "timeout": env.float("DATABASE_POOL_TIMEOUT", default=10.0),
+            "max_idle": env.float("DATABASE_POOL_MAX_IDLE", default=300.0),
+            "max_lifetime": env.float("DATABASE_POOL_MAX_LIFETIME", default=3600.0),
+            # Check each connection as it is handed out; replaces CONN_HEALTH_CHECKS.
+            "check": ConnectionPool.check_connection,
+        }
+else:
+    for database in DATABASES.values():
+        database["CONN_MAX_AGE"] = env.int("CONN_MAX_AGE", default=60)
 
 # CACHES
 # ------------------------------------------------------------------------------
@@ -31,6 +53,7 @@ CACHES = {
         },
     },
 }
+LIVE_VISIT_COUNTERS = env.bool("LIVE_VISIT_COUNTERS", default=True)
 
 # SECURITY
 # ------------------------------------------------------------------------------
@@ -156,5 +179,7 @@ LOGGING = {
 SPECTACULAR_SETTINGS["SERVERS"] = [
     {"url": "https://example.com", "description": "Production server"},
 ]
+# Written by the start script after collectstatic.
+OPENAPI_SCHEMA_FILE = BASE_DIR / "openapi.json"
 # Your stuff...
 # ------------------------------------------------------------------------------
@@ -3,6 +3,7 @@ With these settings, tests run faster.
 """
 
 from .base import *  # noqa: F403
+from .base import DATABASES
 from .base import TEMPLATES
 from .base import env
 
@@ -16,6 +17,26 @@ SECRET_KEY = env(
 # https://docs.djangoproject.com/en/dev/ref/settings/#test-runner
 TEST_RUNNER = "django.test.runner.DiscoverRunner"
 
+# DATABASES
+# ------------------------------------------------------------------------------
+# A second test database stands in for a read replica that never catches up.
+# REPLICA_DATABASE stays unset; tests that use it set it themselves.
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "ATOMIC_REQUESTS": False,
+    "TEST": {"NAME": f"test_{DATABASES['default']['NAME']}_replica"},
+}
+# The default database again, through a small connection pool (tests/test_db_pool.py).
+DATABASES["pooled"] = {
+    **DATABASES["default"],
+    "ATOMIC_REQUESTS": False,
+    "OPTIONS": {
+        **DATABASES["default"].get("OPTIONS", {}),
+        "pool": {"min_size": 1, "max_size": 4, "timeout": 10},
+    },
+    "TEST": {"MIRROR": "default"},
+}
+
 # PASSWORDS
 # ------------------------------------------------------------------------------
 # https://docs.djangoproject.com/en/dev/ref/settings/#password-hashers
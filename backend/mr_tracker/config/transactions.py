@@ -0,0 +1,101 @@
+"""
+Per-view transaction policy for the API.
+
+``ATOMIC_REQUESTS`` wraps every request in a transaction, so a dashboard
+GET held a transaction (and a snapshot) open for as long as it ran,
+without writing anything. Views with ``ReadPolicyMixin`` opt out of it:
+
+- safe methods (GET, HEAD, OPTIONS) follow the view's ``read_policy``:
+  ``NON_ATOMIC`` runs each query in autocommit, ``READ_ONLY`` runs the
+  view in one ``REPEATABLE READ, READ ONLY`` transaction, for views whose
+  queries must see the same data and must not write;
+- every other method still runs in a transaction, as before.
+
+Async views and views that read the replica must be ``NON_ATOMIC``: their
+queries run on other connections than the one a transaction would hold.
+``tests/test_transactions.py`` checks that every API view that serves GET
+declares a policy.
+"""
+
+import contextlib
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connections
+from django.db import transaction
+from rest_framework import routers
+from rest_framework.permissions import SAFE_METHODS
+
+from config.replicas import ReplicaReadsMixin
+
+NON_ATOMIC = "non-atomic"
+READ_ONLY = "read-only"
+
+
+@contextlib.contextmanager
+def read_only_transaction(using=DEFAULT_DB_ALIAS):
+    """A read-only transaction with one snapshot for all of its queries."""
+    connection = connections[using]
+    if connection.in_atomic_block:
+        # Already in a transaction (a test, or a view called by another):
+        # its isolation level can no longer be changed.
+        with transaction.atomic(using=using):
+            yield
+        return
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+def _savepoint_if_nested(using=DEFAULT_DB_ALIAS):
+    # DRF marks the current transaction for rollback when a view fails.
+    # Inside a caller's transaction, confine that to the view, as
+    # ATOMIC_REQUESTS did.
+    if connections[using].in_atomic_block:
+        return transaction.atomic(using=using)
+    return contextlib.nullcontext()
+
+
+class ReadPolicyMixin:
+    """Run safe methods per ``read_policy`` and other methods atomically."""
+
+    read_policy = NON_ATOMIC
+
+    @classmethod
+    def as_view(cls, *args, **kwargs):
+        if cls.read_policy not in (NON_ATOMIC, READ_ONLY):
+            msg = f"{cls.__name__}.read_policy must be NON_ATOMIC or READ_ONLY"
+            raise ImproperlyConfigured(msg)
+        if cls.read_policy == READ_ONLY and (
+            cls.view_is_async or issubclass(cls, ReplicaReadsMixin)
+        ):
+            msg = (
+                f"{cls.__name__} does not run its queries on one connection "
+                "and must be NON_ATOMIC"
+            )
+            raise ImproperlyConfigured(msg)
+        return transaction.non_atomic_requests(super().as_view(*args, **kwargs))
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            # GET-only; the request transaction never applied to these.
+            return super().dispatch(request, *args, **kwargs)
+        if request.method not in SAFE_METHODS:
+            with transaction.atomic():
+                return super().dispatch(request, *args, **kwargs)
+        if self.read_policy == READ_ONLY:
+            with read_only_transaction():
+                return super().dispatch(request, *args, **kwargs)
+        with _savepoint_if_nested():
+            return super().dispatch(request, *args, **kwargs)
+
+
+class APIRootView(ReadPolicyMixin, routers.APIRootView):
+    pass
+
+
+class DefaultRouter(routers.DefaultRouter):
+    """A ``DefaultRouter`` whose API root view follows the policy too."""
+
+    APIRootView = APIRootView
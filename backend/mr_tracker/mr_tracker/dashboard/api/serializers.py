@@ -1,7 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
-from mr_tracker.visits.models import DoctorVisit, ShopVisit
-from mr_tracker.users.models import User
+
 from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.models import User
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
 
 
 class RecentVisitSerializer(serializers.Serializer):
@@ -30,9 +33,64 @@ class TaskSummarySerializer(serializers.Serializer):
     notes = serializers.CharField()
 
 
+class OverdueMRSerializer(serializers.Serializer):
+    mr_id = serializers.IntegerField()
+    mr = serializers.CharField()
+    overdue = serializers.IntegerField()
+    at_risk = serializers.IntegerField()
+    oldest_due_date = serializers.DateField(allow_null=True)
+
+
+class OverdueSummarySerializer(serializers.Serializer):
+    overdue = serializers.IntegerField()
+    at_risk = serializers.IntegerField()
+    per_mr = OverdueMRSerializer(many=True)
+
+
+class MRDashboardQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(
+        required=False,
+        default=settings.MR_DASHBOARD_TASK_DAYS,
+        min_value=0,
+        max_value=60,
+        help_text="Include tasks due up to this many days ahead.",
+    )
+
+
+class TerritoryRollupQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(
+        required=False,
+        default=30,
+        min_value=1,
+        max_value=365,
+        help_text="Count visits of this many days, today included.",
+    )
+
+
+class TerritoryRollupSerializer(serializers.Serializer):
+    territory_id = serializers.IntegerField()
+    territory = serializers.CharField()
+    doctors = serializers.IntegerField()
+    mrs = serializers.IntegerField()
+    visits = serializers.IntegerField()
+    doctors_visited = serializers.IntegerField()
+    coverage = serializers.FloatField(
+        help_text="Share of the territory's doctors visited, in percent.",
+    )
+    pending_tasks = serializers.IntegerField()
+
+
+class TaskCountsSerializer(serializers.Serializer):
+    total = serializers.IntegerField()
+    pending = serializers.IntegerField()
+    completed = serializers.IntegerField()
+    overdue = serializers.IntegerField()
+
+
 class MRDashboardSerializer(serializers.Serializer):
     today_visits = serializers.IntegerField()
     assigned_tasks = TaskSummarySerializer(many=True)
+    task_counts = TaskCountsSerializer()
     todays_doctor_visits = RecentVisitSerializer(many=True)
     todays_shop_visits = serializers.ListField()
 
@@ -43,3 +101,4 @@ class AdminDashboardSerializer(serializers.Serializer):
     recent_visits = RecentVisitSerializer(many=True)
     mr_tracking = MRTrackingSerializer(many=True)
     assigned_tasks = TaskSummarySerializer(many=True)
+    overdue_tasks = OverdueSummarySerializer()
@@ -4,6 +4,7 @@ from .views import (
     AdminDashboardView,
     AdminMRDetailView,
     AdminAnalyticsView,
+    AdminTerritoryView,
 )
 
 urlpatterns = [
@@ -11,4 +12,5 @@ urlpatterns = [
     path("admin/", AdminDashboardView.as_view(), name="admin-dashboard"),
     path("admin/mr/<int:mr_id>/", AdminMRDetailView.as_view(), name="admin-mr-detail"),
     path("admin/analytics/", AdminAnalyticsView.as_view(), name="admin-analytics"),
+    path("admin/territories/", AdminTerritoryView.as_view(), name="admin-territories"),
 ]
@@ -1,20 +1,40 @@
+from collections import Counter
 from datetime import timedelta
+
+from adrf.views import APIView as AsyncAPIView
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import Q
 from django.utils import timezone
-from rest_framework.views import APIView
-from rest_framework.response import Response
+from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied, NotFound
-from django.db import models
-from django.db.models import Count, Q, F
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from mr_tracker.visits.models import DoctorVisit, ShopVisit, Doctor
+from config.replicas import ReplicaReadsMixin
+from config.transactions import ReadPolicyMixin
+from mr_tracker.dashboard import sections
 from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.hierarchy import is_company_wide
+from mr_tracker.users.hierarchy import scope_to
 from mr_tracker.users.models import User
-from .serializers import (
-    MRDashboardSerializer,
-    AdminDashboardSerializer
-)
-from mr_tracker.visits.api.serializers import DoctorVisitSerializer, ShopVisitSerializer
+from mr_tracker.visits import live
+from mr_tracker.visits.api.serializers import DoctorVisitSerializer
+from mr_tracker.visits.api.serializers import ShopVisitSerializer
+from mr_tracker.visits.archive import read_archived_visits
+from mr_tracker.visits.archive import to_payload
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+from mr_tracker.visits.territories import territory_rollup
+
+from .serializers import AdminDashboardSerializer
+from .serializers import MRDashboardQuerySerializer
+from .serializers import MRDashboardSerializer
+from .serializers import TerritoryRollupQuerySerializer
+from .serializers import TerritoryRollupSerializer
 
 
 class IsMR:
@@ -27,183 +47,104 @@ class IsAdmin:
 
 
 
-class MRDashboardView(APIView):
+class AsyncDashboardView(ReadPolicyMixin, AsyncAPIView):
+    """
+    An async view whose ``get`` runs its sections concurrently with ``gather``.
+
+    The sections use their own connections, so there is no request
+    transaction for them to share and ``ATOMIC_REQUESTS`` does not apply.
+    """
+
+
+class MRDashboardView(AsyncDashboardView):
+    """
+    Today's visits and the MR's current tasks.
+
+    Tasks are limited to pending overdue ones plus those due in the next
+    ``days`` days (``MR_DASHBOARD_TASK_DAYS`` by default), oldest first and
+    at most ``MR_DASHBOARD_MAX_TASKS``; ``task_counts`` covers all of the
+    MR's tasks. The query count does not depend on the data.
+    """
     permission_classes = [IsAuthenticated, IsMR]
 
-    def get(self, request):
+    @extend_schema(
+        parameters=[MRDashboardQuerySerializer],
+        responses=MRDashboardSerializer,
+    )
+    async def get(self, request):
+        params = MRDashboardQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
 
         user = request.user
-        today = timezone.now().date()
-
-        today_doctor_visits = DoctorVisit.objects.filter(
-            mr=user,
-            visit_date=today
-        ).order_by("-visit_time")
-
-        today_shop_visits = ShopVisit.objects.filter(
-            mr=user,
-            visit_date=today
-        ).order_by("-visit_time")
-
-        tasks = DoctorVisitTask.objects.filter(assigned_to=user)
-
-        task_list = [
-            {
-                "mr": t.assigned_to.username,
-                "doctor": t.assigned_doctor.name,
-                "date": t.due_date,
-                "time": t.due_time,
-                "status": "completed" if t.completed else "pending",
-                "notes": t.notes,
-            }
-            for t in tasks
-        ]
-
-        recent_doctor_visits = [
-            {
-                "mr": dv.mr.username,
-                "doctor": dv.doctor_name.name,
-                "time": dv.visit_time.strftime("%I:%M %p"),
-                "notes": dv.notes,
-            }
-            for dv in today_doctor_visits
-        ]
+        today = timezone.localdate()
+        horizon = today + timedelta(days=params.validated_data["days"])
+        doctor_visits, shop_visits, tasks, task_counts = await sections.gather(
+            (sections.mr_doctor_visits, user, today),
+            (sections.mr_shop_visits, user, today),
+            (sections.mr_tasks, user, today, horizon),
+            (sections.mr_task_counts, user, today),
+        )
 
         data = {
-            "today_visits": today_doctor_visits.count() + today_shop_visits.count(),
-            "assigned_tasks": task_list,
-            "todays_doctor_visits": recent_doctor_visits,
-            "todays_shop_visits": [
-                {
-                    "shop_name": sv.shop_name,
-                    "location": sv.location,
-                    "notes": sv.notes,
-                    "time": sv.visit_time.strftime("%I:%M %p"),
-                }
-                for sv in today_shop_visits
-            ],
+            "today_visits": len(doctor_visits) + len(shop_visits),
+            "assigned_tasks": tasks,
+            "task_counts": task_counts,
+            "todays_doctor_visits": doctor_visits,
+            "todays_shop_visits": shop_visits,
         }
 
         serializer = MRDashboardSerializer(data)
         return Response(serializer.data)
 
 
-class AdminDashboardView(APIView):
-    permission_classes = [IsAuthenticated, IsAdmin]
-
-    def get(self, request):
-
-        today = timezone.now().date()
-
-        total_visits_today = (
-            DoctorVisit.objects.filter(visit_date=today).count()
-            + ShopVisit.objects.filter(visit_date=today).count()
-        )
-
-        active_mrs = User.objects.filter(role="MR").count()
+class AdminDashboardView(ReplicaReadsMixin, AsyncDashboardView):
+    """
+    Today's activity across the admin's team.
 
-        visited_today = DoctorVisit.objects.filter(
-            visit_date=today
-        ).values("mr").distinct().count()
+    Admins with a manager see their reporting subtree, others the whole
+    company. Per-MR figures come from grouped queries, so the query count
+    does not grow with the team, and the sections run concurrently. The
+    whole company's summary comes from the live visit counters.
+    """
 
-        coverage_rate = (visited_today / active_mrs * 100) if active_mrs else 0
+    permission_classes = [IsAuthenticated, IsAdmin]
 
-        top_doctor = (
-            DoctorVisit.objects.filter(visit_date=today)
-            .values("doctor_name__name")
-            .annotate(count=models.Count("id"))
-            .order_by("-count")
-            .first()
+    async def get(self, request):
+        user = request.user
+        today = timezone.localdate()
+        summary, daily, recent, tracking, tasks, overdue = await sections.gather(
+            (sections.admin_summary, user, today),
+            (sections.admin_daily_visits, user, today),
+            (sections.admin_recent_visits, user),
+            (sections.admin_mr_tracking, user, today),
+            (sections.admin_tasks, user),
+            (sections.admin_overdue_tasks, user, timezone.now()),
         )
 
-        summary_block = {
-            "total_visits_today": total_visits_today,
-            "active_mrs": active_mrs,
-            "coverage_rate": f"{coverage_rate:.0f}%",
-            "top_doctor_today": (
-                {
-                    "name": top_doctor["doctor_name__name"],
-                    "visits": top_doctor["count"],
-                }
-                if top_doctor else None
-            ),
-        }
-
-        last_7_days = []
-        for i in range(7):
-            day = today - timedelta(days=i)
-            visits = (
-                DoctorVisit.objects.filter(visit_date=day).count()
-                + ShopVisit.objects.filter(visit_date=day).count()
-            )
-            last_7_days.append({"date": day, "count": visits})
-        last_7_days.reverse()
-
-        recent_doctors = DoctorVisit.objects.order_by(
-            "-visit_date", "-visit_time"
-        )[:10]
-
-        recent_visits = [
-            {
-                "mr": v.mr.username,
-                "doctor": v.doctor_name.name,
-                "time": v.visit_time.strftime("%I:%M %p"),
-                "notes": v.notes,
-                "gps_lat": getattr(v, "gps_lat", None),
-                "gps_long": getattr(v, "gps_long", None),
-            }
-            for v in recent_doctors
-        ]
-
-        mr_tracking_list = []
-        for mr in User.objects.filter(role="MR"):
-            visits_today = DoctorVisit.objects.filter(mr=mr, visit_date=today)
-
-            first = visits_today.order_by("visit_time").first()
-            last = visits_today.order_by("-visit_time").first()
-
-            mr_tracking_list.append({
-                "mr_id": mr.id,
-                "mr": mr.username,
-                "visits_today": visits_today.count(),
-                "first_punch": first.visit_time.strftime("%I:%M %p") if first else None,
-                "last_punch": last.visit_time.strftime("%I:%M %p") if last else None,
-            })
-
-        tasks = DoctorVisitTask.objects.all().order_by("-due_date")
-        task_summary = [
-            {
-                "mr": t.assigned_to.username,
-                "doctor": t.assigned_doctor.name,
-                "date": t.due_date,
-                "time": t.due_time,
-                "status": "completed" if t.completed else "pending",
-                "notes": t.notes,
-            }
-            for t in tasks
-        ]
-
         data = {
-            "summary": summary_block,
-            "daily_visits": last_7_days,
-            "recent_visits": recent_visits,
-            "mr_tracking": mr_tracking_list,
-            "assigned_tasks": task_summary,
+            "summary": summary,
+            "daily_visits": daily,
+            "recent_visits": recent,
+            "mr_tracking": tracking,
+            "assigned_tasks": tasks,
+            "overdue_tasks": overdue,
         }
         serializer = AdminDashboardSerializer(data)
         return Response(serializer.data)
 
 
-class AdminMRDetailView(APIView):
+class AdminMRDetailView(ReplicaReadsMixin, ReadPolicyMixin, APIView):
     """
     Detailed MR view with complete visit history and filtering by date range.
+    Only MRs in the admin's reporting subtree are found.
     Endpoint: GET /api/dashboard/admin/mr/{mr_id}/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
     """
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get(self, request, mr_id=None):
         try:
-            mr = User.objects.get(id=mr_id, role="MR")
+            mrs = scope_to(User.objects.filter(role="MR"), request.user, "pk")
+            mr = mrs.get(id=mr_id)
         except User.DoesNotExist:
             raise NotFound(f"MR with ID {mr_id} not found")
 
@@ -212,7 +153,8 @@ class AdminMRDetailView(APIView):
         visit_type = request.query_params.get('visit_type')
 
         filters = Q(mr=mr)
-        
+        start_date_obj = end_date_obj = None
+
         if start_date:
             try:
                 start_date_obj = timezone.datetime.strptime(start_date, '%Y-%m-%d').date()
@@ -227,41 +169,99 @@ class AdminMRDetailView(APIView):
             except ValueError:
                 pass
 
-        doctor_visits_qs = DoctorVisit.objects.filter(filters).order_by('-visit_date', '-visit_time')
+        # Months moved out by `manage.py archive_visits`; empty unless the
+        # requested range reaches back into the archive.
+        archived_doctor_visits = read_archived_visits(
+            "doctor_visits",
+            mr_id=mr.id,
+            start_date=start_date_obj,
+            end_date=end_date_obj,
+        )
+        archived_shop_visits = read_archived_visits(
+            "shop_visits",
+            mr_id=mr.id,
+            start_date=start_date_obj,
+            end_date=end_date_obj,
+        )
+
+        doctor_visits_qs = DoctorVisit.objects.filter(filters).order_by("-visited_at")
         doctor_visits = DoctorVisitSerializer(doctor_visits_qs, many=True).data
+        doctor_visits += [to_payload(row) for row in archived_doctor_visits]
 
-        shop_visits_qs = ShopVisit.objects.filter(filters).order_by('-visit_date', '-visit_time')
+        shop_visits_qs = ShopVisit.objects.filter(filters).order_by("-visited_at")
         shop_visits = ShopVisitSerializer(shop_visits_qs, many=True).data
+        shop_visits += [to_payload(row) for row in archived_shop_visits]
 
-        total_doctor_visits = doctor_visits_qs.count()
-        total_shop_visits = shop_visits_qs.count()
+        total_doctor_visits = doctor_visits_qs.count() + len(archived_doctor_visits)
+        total_shop_visits = shop_visits_qs.count() + len(archived_shop_visits)
         total_visits = total_doctor_visits + total_shop_visits
 
-        task_based_doctor = doctor_visits_qs.filter(visit_type='task').count()
-        self_visit_doctor = doctor_visits_qs.filter(visit_type='self').count()
-        task_based_shop = shop_visits_qs.filter(visit_type='task').count()
-        self_visit_shop = shop_visits_qs.filter(visit_type='self').count()
+        archived_doctor_types = Counter(
+            row["visit_type"] for row in archived_doctor_visits
+        )
+        archived_shop_types = Counter(row["visit_type"] for row in archived_shop_visits)
+        task_based_doctor = (
+            doctor_visits_qs.filter(visit_type="task").count()
+            + archived_doctor_types["task"]
+        )
+        self_visit_doctor = (
+            doctor_visits_qs.filter(visit_type="self").count()
+            + archived_doctor_types["self"]
+        )
+        task_based_shop = (
+            shop_visits_qs.filter(visit_type="task").count()
+            + archived_shop_types["task"]
+        )
+        self_visit_shop = (
+            shop_visits_qs.filter(visit_type="self").count()
+            + archived_shop_types["self"]
+        )
 
         top_doctors = (
             doctor_visits_qs
             .values('doctor_name__name', 'doctor_name__specialization')
             .annotate(count=Count('id'))
-            .order_by('-count')[:5]
-        )
-
-        daily_breakdown = (
-            doctor_visits_qs
-            .extra(select={'visit_date_str': 'DATE(visit_date)'})
-            .values('visit_date_str')
-            .annotate(doctor_count=Count('id'))
-        )
-
-        shop_daily = (
-            shop_visits_qs
-            .extra(select={'visit_date_str': 'DATE(visit_date)'})
-            .values('visit_date_str')
-            .annotate(shop_count=Count('id'))
+            .order_by("-count")
         )
+        if archived_doctor_visits:
+            doctor_counts = Counter()
+            for d in top_doctors:
+                key = (d["doctor_name__name"], d["doctor_name__specialization"])
+                doctor_counts[key] = d["count"]
+            doctor_counts.update(
+                (row["doctor_name_display"], row["doctor_specialization"])
+                for row in archived_doctor_visits
+            )
+            top_doctors = [
+                {
+                    "doctor_name__name": name,
+                    "doctor_name__specialization": specialization,
+                    "count": count,
+                }
+                for (name, specialization), count in doctor_counts.most_common(5)
+            ]
+        else:
+            top_doctors = top_doctors[:5]
+
+        # Per-day counts, with archived days folded in like top_doctors.
+        daily = {}
+        for kind, visits, archived in (
+            ("doctor_visits", doctor_visits_qs, archived_doctor_visits),
+            ("shop_visits", shop_visits_qs, archived_shop_visits),
+        ):
+            counts = Counter(
+                dict(visits.order_by().values_list("visit_date").annotate(Count("id"))),
+            )
+            counts.update(row["visit_date"] for row in archived)
+            for day, count in counts.items():
+                daily.setdefault(
+                    day,
+                    {"date": day.isoformat(), "doctor_visits": 0, "shop_visits": 0},
+                )[kind] = count
+        daily_breakdown = [
+            {**row, "total": row["doctor_visits"] + row["shop_visits"]}
+            for _, row in sorted(daily.items())
+        ]
 
         data = {
             "mr_id": mr.id,
@@ -277,6 +277,7 @@ class AdminMRDetailView(APIView):
                 "self_visit_shop_visits": self_visit_shop,
             },
             "top_doctors": top_doctors,
+            "daily_breakdown": daily_breakdown,
             "doctor_visits": doctor_visits,
             "shop_visits": shop_visits,
             "date_range": {
@@ -288,15 +289,17 @@ class AdminMRDetailView(APIView):
         return Response(data)
 
 
-class AdminAnalyticsView(APIView):
+class AdminAnalyticsView(ReplicaReadsMixin, ReadPolicyMixin, APIView):
     """
     Real-time analytics dashboard with aggregated metrics from database.
+    Covers the admin's reporting subtree, like ``AdminDashboardView``.
+    A company-wide admin's ``day`` figures come from the live visit counters.
     """
     permission_classes = [IsAuthenticated, IsAdmin]
 
     def get(self, request):
         period = request.query_params.get('period', 'day')  
-        today = timezone.now().date()
+        today = timezone.localdate()
 
         if period == 'week':
             start_date = today - timedelta(days=7)
@@ -305,45 +308,101 @@ class AdminAnalyticsView(APIView):
         else:  # day
             start_date = today
 
-        mrs = User.objects.filter(role="MR")
-        mr_stats = []
+        mrs = scope_to(User.objects.filter(role="MR"), request.user, "pk")
+        counters = (
+            live.read(request.user, today, top=10, per_mr=True)
+            if period == "day"
+            else None
+        )
+        if counters is not None:
+            per_mr = {}
+            for kind, visits in counters["per_mr"].items():
+                for mr_id, count in visits.items():
+                    per_mr.setdefault(mr_id, Counter())[kind] = count
+            top_doctors = [
+                {
+                    "doctor_name__id": doctor.id,
+                    "doctor_name__name": doctor.name,
+                    "doctor_name__specialization": doctor.specialization,
+                    "total_visits": visits,
+                }
+                for doctor, visits in live.top_doctors(counters)
+            ]
+            doctor_daily = {today: counters["doctor"]}
+            shop_daily = {today: counters["shop"]}
+        else:
+            doctor_visits = scope_to(
+                DoctorVisit.objects.filter(visit_date__gte=start_date),
+                request.user,
+            )
+            shop_visits = scope_to(
+                ShopVisit.objects.filter(visit_date__gte=start_date),
+                request.user,
+            )
+
+            per_mr = {}
+            for kind, visits in (("doctor", doctor_visits), ("shop", shop_visits)):
+                rows = (
+                    visits.values("mr")
+                    .annotate(
+                        total=Count("id"),
+                        task=Count("id", filter=Q(visit_type="task")),
+                        self_visits=Count("id", filter=Q(visit_type="self")),
+                    )
+                    .order_by()
+                )
+                for row in rows:
+                    counts = per_mr.setdefault(row["mr"], Counter())
+                    counts.update(
+                        {
+                            kind: row["total"],
+                            "task": row["task"],
+                            "self": row["self_visits"],
+                        },
+                    )
+
+            top_doctors = list(
+                doctor_visits.values(
+                    "doctor_name__id",
+                    "doctor_name__name",
+                    "doctor_name__specialization",
+                )
+                .annotate(total_visits=Count("id"))
+                .order_by("-total_visits")[:10],
+            )
 
-        for mr in mrs:
-            doctor_visits = DoctorVisit.objects.filter(
-                mr=mr,
-                visit_date__gte=start_date
+            doctor_daily = dict(
+                doctor_visits.values_list("visit_date")
+                .annotate(Count("id"))
+                .order_by(),
             )
-            shop_visits = ShopVisit.objects.filter(
-                mr=mr,
-                visit_date__gte=start_date
+            shop_daily = dict(
+                shop_visits.values_list("visit_date").annotate(Count("id")).order_by(),
             )
-            total = doctor_visits.count() + shop_visits.count()
-
-            mr_stats.append({
-                "mr_id": mr.id,
-                "mr_username": mr.username,
-                "mr_name": mr.name or mr.username,
-                "doctor_visits": doctor_visits.count(),
-                "shop_visits": shop_visits.count(),
-                "total_visits": total,
-                "task_based_visits": doctor_visits.filter(visit_type='task').count() + shop_visits.filter(visit_type='task').count(),
-                "self_visits": doctor_visits.filter(visit_type='self').count() + shop_visits.filter(visit_type='self').count(),
-            })
 
-        mr_stats.sort(key=lambda x: x['total_visits'], reverse=True)
+        mr_stats = []
+        for mr in mrs.order_by("id").only("id", "username", "name"):
+            counts = per_mr.get(mr.id, Counter())
+            mr_stats.append(
+                {
+                    "mr_id": mr.id,
+                    "mr_username": mr.username,
+                    "mr_name": mr.name or mr.username,
+                    "doctor_visits": counts["doctor"],
+                    "shop_visits": counts["shop"],
+                    "total_visits": counts["doctor"] + counts["shop"],
+                    "task_based_visits": counts["task"],
+                    "self_visits": counts["self"],
+                },
+            )
 
-        top_doctors = (
-            DoctorVisit.objects.filter(visit_date__gte=start_date)
-            .values('doctor_name__id', 'doctor_name__name', 'doctor_name__specialization')
-            .annotate(total_visits=Count('id'))
-            .order_by('-total_visits')[:10]
-        )
+        mr_stats.sort(key=lambda x: x["total_visits"], reverse=True)
 
         daily_trends = []
         for i in range(30 if period == 'month' else 7 if period == 'week' else 1):
             day = today - timedelta(days=i)
-            doctor_count = DoctorVisit.objects.filter(visit_date=day).count()
-            shop_count = ShopVisit.objects.filter(visit_date=day).count()
+            doctor_count = doctor_daily.get(day, 0)
+            shop_count = shop_daily.get(day, 0)
             daily_trends.append({
                 "date": day.isoformat(),
                 "doctor_visits": doctor_count,
@@ -353,11 +412,9 @@ class AdminAnalyticsView(APIView):
 
         daily_trends.reverse()
 
-        total_doctor_visits = DoctorVisit.objects.filter(visit_date__gte=start_date).count()
-        total_shop_visits = ShopVisit.objects.filter(visit_date__gte=start_date).count()
-        active_mrs_count = User.objects.filter(role="MR").annotate(
-            visit_count=Count('doctor_visits') + Count('shop_visits')
-        ).filter(visit_count__gt=0).count()
+        total_doctor_visits = sum(doctor_daily.values())
+        total_shop_visits = sum(shop_daily.values())
+        active_mrs_count = sum(1 for row in mr_stats if row["total_visits"])
 
         data = {
             "period": period,
@@ -368,11 +425,46 @@ class AdminAnalyticsView(APIView):
                 "total_doctor_visits": total_doctor_visits,
                 "total_shop_visits": total_shop_visits,
                 "active_mrs": active_mrs_count,
-                "total_mrs": mrs.count(),
+                "total_mrs": len(mr_stats),
             },
             "mr_performance": mr_stats,
-            "top_doctors": list(top_doctors),
+            "top_doctors": top_doctors,
             "daily_trends": daily_trends,
         }
 
         return Response(data)
+
+
+class AdminTerritoryView(ReplicaReadsMixin, ReadPolicyMixin, APIView):
+    """
+    Per-territory doctors, MRs, visits, coverage and pending tasks.
+
+    Endpoint: GET /api/dashboard/admin/territories/?days=30
+    Territories, MRs, visits and tasks are those of the admin's reporting
+    subtree: the territories its MRs cover, counting only those MRs.
+    """
+
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    @extend_schema(
+        parameters=[TerritoryRollupQuerySerializer],
+        responses=TerritoryRollupSerializer(many=True),
+    )
+    def get(self, request):
+        params = TerritoryRollupQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start_date = timezone.localdate() - timedelta(
+            days=params.validated_data["days"] - 1,
+        )
+
+        rollup = territory_rollup(
+            scope_to(
+                DoctorVisit.objects.filter(visit_date__gte=start_date),
+                request.user,
+            ),
+            scope_to(DoctorVisitTask.objects.all(), request.user, "assigned_to"),
+            None
+            if is_company_wide(request.user)
+            else scope_to(User.objects.filter(role="MR"), request.user, "pk"),
+        )
+        return Response(TerritoryRollupSerializer(rollup, many=True).data)
@@ -0,0 +1,89 @@
+import http.client
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+CONNECTIONS = {"http": http.client.HTTPConnection, "https": http.client.HTTPSConnection}
+
+
+class Command(BaseCommand):
+    help = (
+        "Load a running server's dashboard endpoint with concurrent requests and "
+        "report latency percentiles and throughput. Run it against the WSGI and "
+        "the ASGI start modes with the same arguments to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "url",
+            help="Full URL, e.g. http://localhost:5000/api/dashboard/admin/.",
+        )
+        parser.add_argument(
+            "--token",
+            required=True,
+            help="JWT access token of the user to load as.",
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Total requests.")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Requests in flight at once.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=30.0,
+            help="Per-request timeout in seconds.",
+        )
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["url"])
+        if url.scheme not in CONNECTIONS:
+            msg = "The URL must start with http:// or https://."
+            raise CommandError(msg)
+        path = url.path or "/"
+        if url.query:
+            path += f"?{url.query}"
+        headers = {"Authorization": f"Bearer {options['token']}"}
+
+        def fetch(_):
+            connection = CONNECTIONS[url.scheme](url.netloc, timeout=options["timeout"])
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                return None
+            finally:
+                connection.close()
+            if response.status >= HTTPStatus.BAD_REQUEST:
+                return None
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(fetch, range(options["requests"])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(result for result in results if result is not None)
+        if not latencies:
+            msg = "Every request failed."
+            raise CommandError(msg)
+        percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+        self.stdout.write(
+            f"{len(latencies)} ok, {len(results) - len(latencies)} failed "
+            f"at concurrency {options['concurrency']} in {elapsed:.2f}s "
+            f"({len(latencies) / elapsed:.1f} requests/s)",
+        )
+        self.stdout.write(
+            f"latency ms: p50 {percentiles[49] * 1000:.0f}, "
+            f"p95 {percentiles[94] * 1000:.0f}, "
+            f"max {latencies[-1] * 1000:.0f}",
+        )
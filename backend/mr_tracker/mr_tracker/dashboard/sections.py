@@ -0,0 +1,273 @@
+"""
+The independent sections of the MR and admin dashboards.
+
+Each section is a plain function that runs its own queries and returns
+part of the response. ``gather`` runs a view's sections at the same time,
+each in a worker thread with its own database connection, so a dashboard
+takes about as long as its slowest section rather than the sum of all of
+them. The threads come from one pool of ``DASHBOARD_SECTION_WORKERS`` per
+process, so their connections are reused across requests (up to
+``CONN_MAX_AGE``). Separate connections cannot see uncommitted rows, so
+when the caller is inside a transaction (a test, or the index advisor's
+seeded workload) the sections run one after another on the caller's
+connection instead.
+"""
+
+import asyncio
+import functools
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db import connections
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models import Min
+from django.db.models import Q
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.tasks.overdue import overdue_summary
+from mr_tracker.users.hierarchy import scope_to
+from mr_tracker.users.models import User
+from mr_tracker.visits import live
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+
+# Upper bound on assigned_tasks, however far behind an MR is.
+MR_DASHBOARD_MAX_TASKS = 200
+
+
+@functools.cache
+def _executor():
+    return ThreadPoolExecutor(
+        settings.DASHBOARD_SECTION_WORKERS,
+        thread_name_prefix="dashboard-section",
+    )
+
+
+def _in_transaction():
+    return any(conn.in_atomic_block for conn in connections.all(initialized_only=True))
+
+
+def _on_own_connection(section, *args):
+    # Worker threads outlive the request, so treat each section like one:
+    # drop a broken or expired connection before and after.
+    close_old_connections()
+    try:
+        return section(*args)
+    finally:
+        close_old_connections()
+
+
+async def gather(*calls):
+    """Run ``(section, *args)`` calls concurrently; returns their results in order."""
+    if await sync_to_async(_in_transaction)():
+        return [await sync_to_async(section)(*args) for section, *args in calls]
+    return await asyncio.gather(
+        *(
+            sync_to_async(
+                _on_own_connection,
+                thread_sensitive=False,
+                executor=_executor(),
+            )(section, *args)
+            for section, *args in calls
+        ),
+    )
+
+
+def _task_row(task, username):
+    return {
+        "mr": username,
+        "doctor": task.assigned_doctor.name,
+        "date": task.due_date,
+        "time": task.due_time,
+        "status": "completed" if task.completed else "pending",
+        "notes": task.notes,
+    }
+
+
+# MR dashboard
+
+
+def mr_doctor_visits(user, today):
+    visits = (
+        DoctorVisit.objects.filter(mr=user, visit_date=today)
+        .select_related("doctor_name")
+        .order_by("-visited_at")
+    )
+    return [
+        {
+            "mr": user.username,
+            "doctor": visit.doctor_name.name,
+            "time": visit.visit_time.strftime("%I:%M %p"),
+            "notes": visit.notes,
+        }
+        for visit in visits
+    ]
+
+
+def mr_shop_visits(user, today):
+    return [
+        {
+            "shop_name": visit.shop_name,
+            "location": visit.location,
+            "notes": visit.notes,
+            "time": visit.visit_time.strftime("%I:%M %p"),
+        }
+        for visit in ShopVisit.objects.filter(mr=user, visit_date=today).order_by(
+            "-visited_at",
+        )
+    ]
+
+
+def mr_tasks(user, today, horizon):
+    tasks = (
+        DoctorVisitTask.objects.filter(assigned_to=user)
+        .filter(
+            Q(completed=False, due_date__lt=today)
+            | Q(due_date__gte=today, due_date__lte=horizon),
+        )
+        .select_related("assigned_doctor")
+        .order_by("due_date", "due_time", "id")[:MR_DASHBOARD_MAX_TASKS]
+    )
+    return [_task_row(task, user.username) for task in tasks]
+
+
+def mr_task_counts(user, today):
+    counts = DoctorVisitTask.objects.filter(assigned_to=user).aggregate(
+        total=Count("id"),
+        pending=Count("id", filter=Q(completed=False)),
+        overdue=Count("id", filter=Q(completed=False, due_date__lt=today)),
+    )
+    counts["completed"] = counts["total"] - counts["pending"]
+    return counts
+
+
+# Admin dashboard
+
+
+def admin_summary(user, today):
+    active_mrs = scope_to(User.objects.filter(role="MR"), user, "pk").count()
+    counters = live.read(user, today)
+    if counters is not None:
+        total_visits_today = counters["doctor"] + counters["shop"]
+        visited_today = counters["mrs_visited"]
+        top_doctor = next(
+            (
+                {"name": doctor.name, "visits": visits}
+                for doctor, visits in live.top_doctors(counters)
+            ),
+            None,
+        )
+    else:
+        doctor_visits = scope_to(DoctorVisit.objects.filter(visit_date=today), user)
+        total_visits_today = (
+            doctor_visits.count()
+            + scope_to(ShopVisit.objects.filter(visit_date=today), user).count()
+        )
+        visited_today = doctor_visits.values("mr").distinct().count()
+        top = (
+            doctor_visits.values("doctor_name__name")
+            .annotate(count=Count("id"))
+            .order_by("-count")
+            .first()
+        )
+        top_doctor = (
+            {"name": top["doctor_name__name"], "visits": top["count"]} if top else None
+        )
+    coverage_rate = (visited_today / active_mrs * 100) if active_mrs else 0
+    return {
+        "total_visits_today": total_visits_today,
+        "active_mrs": active_mrs,
+        "coverage_rate": f"{coverage_rate:.0f}%",
+        "top_doctor_today": top_doctor,
+    }
+
+
+def admin_daily_visits(user, today):
+    week_start = today - timedelta(days=6)
+    daily_counts = Counter()
+    for model in (DoctorVisit, ShopVisit):
+        daily_counts.update(
+            {
+                row["visit_date"]: row["count"]
+                for row in scope_to(
+                    model.objects.filter(visit_date__gte=week_start),
+                    user,
+                )
+                .values("visit_date")
+                .annotate(count=Count("id"))
+                .order_by()
+            },
+        )
+    return [
+        {"date": day, "count": daily_counts[day]}
+        for day in (week_start + timedelta(days=i) for i in range(7))
+    ]
+
+
+def admin_recent_visits(user):
+    visits = (
+        scope_to(DoctorVisit.objects.all(), user)
+        .select_related("mr", "doctor_name")
+        .order_by("-visited_at")
+    )
+    return [
+        {
+            "mr": visit.mr.username,
+            "doctor": visit.doctor_name.name,
+            "time": visit.visit_time.strftime("%I:%M %p"),
+            "notes": visit.notes,
+            "gps_lat": getattr(visit, "gps_lat", None),
+            "gps_long": getattr(visit, "gps_long", None),
+        }
+        for visit in visits[:10]
+    ]
+
+
+def admin_mr_tracking(user, today):
+    # Visits of one local day are in the same order by visit_time as by visited_at.
+    punches = {
+        row["mr"]: row
+        for row in scope_to(DoctorVisit.objects.filter(visit_date=today), user)
+        .values("mr")
+        .annotate(visits=Count("id"), first=Min("visit_time"), last=Max("visit_time"))
+        .order_by()
+    }
+    tracking = []
+    for mr in (
+        scope_to(User.objects.filter(role="MR"), user, "pk")
+        .order_by("id")
+        .only("id", "username")
+    ):
+        row = punches.get(mr.id)
+        tracking.append(
+            {
+                "mr_id": mr.id,
+                "mr": mr.username,
+                "visits_today": row["visits"] if row else 0,
+                "first_punch": row["first"].strftime("%I:%M %p") if row else None,
+                "last_punch": row["last"].strftime("%I:%M %p") if row else None,
+            },
+        )
+    return tracking
+
+
+def admin_tasks(user):
+    tasks = scope_to(DoctorVisitTask.objects.all(), user, "assigned_to")
+    return [
+        _task_row(task, task.assigned_to.username)
+        for task in tasks.select_related("assigned_to", "assigned_doctor").order_by(
+            "-due_date",
+        )
+    ]
+
+
+def admin_overdue_tasks(user, now):
+    return overdue_summary(
+        scope_to(DoctorVisitTask.objects.all(), user, "assigned_to"),
+        now,
+    )
@@ -1,3 +1,195 @@
-from django.test import TestCase
+import datetime
+import time
 
-# Create your tests here.
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mr_tracker.dashboard import sections
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.tests.factories import UserFactory
+from mr_tracker.visits.index_advisor import seed_workload
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+
+pytestmark = pytest.mark.django_db
+
+
+def _add_activity(mr, manager, doctor, *, days):
+    today = timezone.localdate()
+    DoctorVisit.objects.create(mr=mr, doctor_name=doctor)
+    ShopVisit.objects.create(mr=mr, shop_name="Apollo Pharmacy")
+    for offset in days:
+        DoctorVisitTask.objects.create(
+            assigned_to=mr,
+            assigned_by=manager,
+            assigned_doctor=doctor,
+            due_date=today + datetime.timedelta(days=offset),
+            due_time=datetime.time(10, 0),
+        )
+
+
+def test_mr_dashboard_windows_tasks_in_fixed_queries(django_assert_num_queries):
+    mr = UserFactory()
+    manager = UserFactory(role="admin")
+    client = APIClient()
+    client.force_authenticate(mr)
+    url = reverse("mr-dashboard")
+
+    _add_activity(
+        mr,
+        manager,
+        Doctor.objects.create(name="Dr. Pillai", specialization="ENT"),
+        days=[0],
+    )
+    # Two visit lists, the task counts and the task list; no request savepoint.
+    with django_assert_num_queries(4):
+        client.get(url)
+
+    # Overdue, inside and outside the window, and a completed one from last year.
+    doctor = Doctor.objects.create(name="Dr. Joshi", specialization="ENT")
+    _add_activity(mr, manager, doctor, days=[-3, 2, 7, 30])
+    DoctorVisitTask.objects.create(
+        assigned_to=mr,
+        assigned_by=manager,
+        assigned_doctor=doctor,
+        completed=True,
+        due_date=timezone.localdate() - datetime.timedelta(days=365),
+        due_time=datetime.time(9, 0),
+    )
+    with django_assert_num_queries(4):
+        response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data["today_visits"] == 4
+    today = timezone.localdate()
+    assert [task["date"] for task in response.data["assigned_tasks"]] == [
+        (today + datetime.timedelta(days=offset)).isoformat()
+        for offset in (-3, 0, 2, 7)
+    ]
+    assert response.data["task_counts"] == {
+        "total": 6,
+        "pending": 5,
+        "completed": 1,
+        "overdue": 1,
+    }
+
+    wider = client.get(url, {"days": 30})
+    assert len(wider.data["assigned_tasks"]) == 5
+
+
+ADMIN_SECTIONS = [
+    "admin_summary",
+    "admin_daily_visits",
+    "admin_recent_visits",
+    "admin_mr_tracking",
+    "admin_tasks",
+    "admin_overdue_tasks",
+]
+SECTION_DELAY = 0.3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_admin_dashboard_runs_sections_concurrently(monkeypatch):
+    """With no open transaction each section gets its own connection, all at once."""
+    backends = []
+
+    def delayed(section):
+        def run(*args):
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_backend_pid(), pg_sleep(%s)", [SECTION_DELAY])
+                backends.append(cursor.fetchone()[0])
+            return section(*args)
+
+        return run
+
+    for name in ADMIN_SECTIONS:
+        monkeypatch.setattr(sections, name, delayed(getattr(sections, name)))
+    admin = UserFactory(role="admin", company_wide=True)
+    mr = UserFactory()
+    _add_activity(
+        mr,
+        admin,
+        Doctor.objects.create(name="Dr. Menon", specialization="ENT"),
+        days=[-1, 0],
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+
+    response = client.get(reverse("admin-dashboard"))
+
+    assert response.status_code == 200
+    assert response.data["summary"]["total_visits_today"] == 2
+    assert [row["mr"] for row in response.data["mr_tracking"]] == [mr.username]
+    assert response.data["overdue_tasks"]["overdue"] == 1
+    # One backend per section: they ran at the same time, on their own connections.
+    assert len(set(backends)) == len(ADMIN_SECTIONS)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_dashboard_latency(record_property):
+    """Admin dashboard wall-clock time, sections in sequence and concurrently."""
+    admin, _ = seed_workload(mrs=200, doctors=100, visits=20000, days=30)
+    today, now = timezone.localdate(), timezone.now()
+    calls = [
+        (sections.admin_summary, admin, today),
+        (sections.admin_daily_visits, admin, today),
+        (sections.admin_recent_visits, admin),
+        (sections.admin_mr_tracking, admin, today),
+        (sections.admin_tasks, admin),
+        (sections.admin_overdue_tasks, admin, now),
+    ]
+    async_to_sync(sections.gather)(*calls)  # Start the pool's threads.
+
+    started = time.perf_counter()
+    expected = [section(*args) for section, *args in calls]
+    sequential = time.perf_counter() - started
+    started = time.perf_counter()
+    assert async_to_sync(sections.gather)(*calls) == expected
+    concurrent = time.perf_counter() - started
+
+    record_property("admin_dashboard_sequential_ms", round(sequential * 1000))
+    record_property("admin_dashboard_concurrent_ms", round(concurrent * 1000))
+
+
+@pytest.mark.django_db(databases=["default", "replica"])
+def test_reports_read_the_replica_until_the_user_writes(settings):
+    """The stand-in replica never receives writes, so it shows what lag would hide."""
+    settings.REPLICA_DATABASE = "replica"
+    admin = UserFactory(role="admin", company_wide=True)
+    mr = UserFactory()
+    _add_activity(
+        mr,
+        admin,
+        Doctor.objects.create(name="Dr. Iyer", specialization="ENT"),
+        days=[0],
+    )
+    client = APIClient()
+    client.force_authenticate(admin)
+
+    dashboard = client.get(reverse("admin-dashboard")).data
+    assert dashboard["summary"]["total_visits_today"] == 0
+    assert dashboard["mr_tracking"] == []
+    assert (
+        client.get(reverse("admin-analytics")).data["summary"]["total_doctor_visits"]
+        == 0
+    )
+    # The MR's own dashboard always reads the primary.
+    mr_client = APIClient()
+    mr_client.force_authenticate(mr)
+    assert mr_client.get(reverse("mr-dashboard")).data["today_visits"] == 2
+
+    response = client.post(
+        reverse("doctors-list"),
+        {"name": "Dr. Kaur", "specialization": "ENT"},
+    )
+    assert response.status_code == 201
+    dashboard = client.get(reverse("admin-dashboard")).data
+    assert dashboard["summary"]["total_visits_today"] == 2
+    assert [row["mr"] for row in dashboard["mr_tracking"]] == [mr.username]
+    analytics = client.get(reverse("admin-analytics")).data
+    assert analytics["summary"]["total_doctor_visits"] == 1
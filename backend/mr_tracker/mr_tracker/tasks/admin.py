@@ -1,5 +1,6 @@
 from django.contrib import admin
 from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.tasks.models import TaskSchedule
 
 
 @admin.register(DoctorVisitTask)
@@ -14,6 +15,7 @@ class DoctorVisitTaskAdmin(admin.ModelAdmin):
         "due_time",
         "completed",
         "visit_record",
+        "schedule",
         "assigned_date",
     )
 
@@ -35,6 +37,39 @@ class DoctorVisitTaskAdmin(admin.ModelAdmin):
         "assigned_date",
         "visit_record",
         "completed",
+        "schedule",
     )
 
     ordering = ("-assigned_date", "-id")
+
+
+@admin.register(TaskSchedule)
+class TaskScheduleAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "assigned_to",
+        "assigned_doctor",
+        "frequency",
+        "interval",
+        "weekdays",
+        "due_time",
+        "start_date",
+        "end_date",
+        "active",
+        "materialized_until",
+    )
+
+    list_filter = (
+        "active",
+        "frequency",
+    )
+
+    search_fields = (
+        "assigned_to__username",
+        "assigned_doctor__name",
+        "notes",
+    )
+
+    readonly_fields = ("materialized_until",)
+
+    ordering = ("-id",)
@@ -1,12 +1,29 @@
+import itertools
+
+from django.db import transaction
 from rest_framework import serializers
-from mr_tracker.users.models import User
-from mr_tracker.visits.models import DoctorVisit, Doctor
+
 from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.hierarchy import scope_to
+from mr_tracker.users.models import User
+from mr_tracker.visits.api.serializers import DateRangeQuerySerializer
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+
+
+def team_mrs(user):
+    """The MRs ``user`` may assign tasks to: those in their reporting subtree."""
+    return scope_to(User.objects.filter(role="MR"), user, "pk")
+
+
+class TeamMRField(serializers.PrimaryKeyRelatedField):
+    def get_queryset(self):
+        return team_mrs(self.context["request"].user)
 
 
 class DoctorVisitTaskSerializer(serializers.ModelSerializer):
 
-    assigned_to = serializers.PrimaryKeyRelatedField(
+    assigned_to = TeamMRField(
         queryset=User.objects.filter(role="MR")
     )
     assigned_by = serializers.HiddenField(
@@ -42,3 +59,210 @@ class DoctorVisitTaskSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("You cannot assign a task to yourself.")
 
         return attrs
+
+
+MAX_BULK_TASKS = 5000
+
+
+class BulkTaskEntrySerializer(serializers.Serializer):
+    assigned_to = serializers.IntegerField()
+    assigned_doctor = serializers.IntegerField()
+    due_date = serializers.DateField()
+    due_time = serializers.TimeField()
+    notes = serializers.CharField(required=False, allow_blank=True, default="")
+
+
+class BulkTaskCrossProductSerializer(serializers.Serializer):
+    assigned_to = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
+    assigned_doctor = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
+    due_date = serializers.ListField(child=serializers.DateField(), allow_empty=False)
+    due_time = serializers.TimeField()
+    notes = serializers.CharField(required=False, allow_blank=True, default="")
+
+    def validate(self, attrs):
+        size = (
+            len(attrs["assigned_to"])
+            * len(attrs["assigned_doctor"])
+            * len(attrs["due_date"])
+        )
+        if size > MAX_BULK_TASKS:
+            raise serializers.ValidationError(
+                f"The cross product has {size} tasks; "
+                f"at most {MAX_BULK_TASKS} are allowed.",
+            )
+        return attrs
+
+
+class DoctorVisitTaskBulkSerializer(serializers.Serializer):
+    """
+    Many task assignments at once: an explicit ``tasks`` list, or a
+    ``cross_product`` of MRs x doctors x due dates at one due time.
+
+    All MR and doctor ids are checked in one query each (MRs must be in the
+    requesting manager's subtree), and the whole batch
+    is rejected if it repeats a task or one that already exists.
+    """
+
+    tasks = BulkTaskEntrySerializer(
+        many=True,
+        required=False,
+        max_length=MAX_BULK_TASKS,
+    )
+    cross_product = BulkTaskCrossProductSerializer(required=False)
+
+    def validate(self, attrs):
+        if ("tasks" in attrs) == ("cross_product" in attrs):
+            raise serializers.ValidationError("Send either tasks or cross_product.")
+
+        if "tasks" in attrs:
+            entries = attrs["tasks"]
+        else:
+            spec = attrs["cross_product"]
+            entries = [
+                {
+                    "assigned_to": mr_id,
+                    "assigned_doctor": doctor_id,
+                    "due_date": due_date,
+                    "due_time": spec["due_time"],
+                    "notes": spec["notes"],
+                }
+                for mr_id, doctor_id, due_date in itertools.product(
+                    spec["assigned_to"],
+                    spec["assigned_doctor"],
+                    spec["due_date"],
+                )
+            ]
+        if not entries:
+            raise serializers.ValidationError("No tasks to assign.")
+
+        keys = [
+            (
+                entry["assigned_to"],
+                entry["assigned_doctor"],
+                entry["due_date"],
+                entry["due_time"],
+            )
+            for entry in entries
+        ]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("The same task is listed more than once.")
+
+        mr_ids = {entry["assigned_to"] for entry in entries}
+        doctor_ids = {entry["assigned_doctor"] for entry in entries}
+        if self.context["request"].user.pk in mr_ids:
+            raise serializers.ValidationError("You cannot assign a task to yourself.")
+
+        unknown_mrs = mr_ids - set(
+            team_mrs(self.context["request"].user)
+            .filter(pk__in=mr_ids)
+            .values_list("pk", flat=True),
+        )
+        if unknown_mrs:
+            raise serializers.ValidationError(
+                f"Unknown MR ids, or MRs outside your team: {sorted(unknown_mrs)}",
+            )
+        unknown_doctors = doctor_ids - set(
+            Doctor.objects.filter(pk__in=doctor_ids).values_list("pk", flat=True),
+        )
+        if unknown_doctors:
+            raise serializers.ValidationError(
+                f"Unknown doctor ids: {sorted(unknown_doctors)}",
+            )
+
+        existing = set(
+            DoctorVisitTask.objects.filter(
+                assigned_to__in=mr_ids,
+                assigned_doctor__in=doctor_ids,
+                due_date__in={entry["due_date"] for entry in entries},
+            ).values_list("assigned_to", "assigned_doctor", "due_date", "due_time"),
+        )
+        if existing.intersection(keys):
+            raise serializers.ValidationError(
+                f"{len(existing.intersection(keys))} of these tasks "
+                "are already assigned.",
+            )
+
+        return {"entries": entries}
+
+    def create(self, validated_data):
+        assigned_by = self.context["request"].user
+        tasks = [
+            DoctorVisitTask(
+                assigned_to_id=entry["assigned_to"],
+                assigned_by=assigned_by,
+                assigned_doctor_id=entry["assigned_doctor"],
+                due_date=entry["due_date"],
+                due_time=entry["due_time"],
+                notes=entry["notes"],
+            )
+            for entry in validated_data["entries"]
+        ]
+        with transaction.atomic():
+            return DoctorVisitTask.objects.bulk_create(tasks, batch_size=1000)
+
+
+class OverdueQuerySerializer(serializers.Serializer):
+    mr = serializers.IntegerField(
+        required=False,
+        help_text="Admins only; MRs always see their own tasks.",
+    )
+    limit = serializers.IntegerField(
+        required=False,
+        default=100,
+        min_value=1,
+        max_value=500,
+    )
+
+
+class RouteQuerySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    mr = serializers.IntegerField(
+        required=False,
+        help_text="Required for admins; MRs always get their own route.",
+    )
+    lat = serializers.FloatField(
+        required=False,
+        min_value=-90,
+        max_value=90,
+        help_text="Where the MR sets off from.",
+    )
+    long = serializers.FloatField(required=False, min_value=-180, max_value=180)
+
+    def validate(self, data):
+        if ("lat" in data) != ("long" in data):
+            raise serializers.ValidationError("Give both lat and long, or neither.")
+        if self.context["request"].user.role != "MR" and "mr" not in data:
+            raise serializers.ValidationError({"mr": "Admins must choose an MR."})
+        return data
+
+
+class TaskFilterSerializer(DateRangeQuerySerializer):
+    """
+    Query parameters of the task list; the date range applies to ``due_date``.
+
+    Every combination is served by an index; see ``filter_tasks`` and the
+    plan tests before adding a filter or an ordering.
+    """
+
+    ORDERINGS = {
+        "-due_date": ("-due_date", "-due_time", "-id"),
+        "due_date": ("due_date", "due_time", "id"),
+    }
+
+    status = serializers.ChoiceField(choices=["pending", "completed"], required=False)
+    mr = serializers.IntegerField(
+        required=False,
+        help_text="Admins only; MRs always see their own tasks.",
+    )
+    doctor = serializers.IntegerField(required=False)
+    ordering = serializers.ChoiceField(
+        choices=list(ORDERINGS),
+        required=False,
+        default="-due_date",
+    )
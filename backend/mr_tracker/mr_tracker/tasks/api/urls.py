@@ -1,4 +1,4 @@
-from rest_framework.routers import DefaultRouter
+from config.transactions import DefaultRouter
 from mr_tracker.tasks.api.views import DoctorVisitTaskViewSet
 
 router = DefaultRouter()
@@ -1,68 +1,311 @@
-from rest_framework.viewsets import GenericViewSet
-from rest_framework.mixins import (
-    CreateModelMixin,
-    ListModelMixin,
-    RetrieveModelMixin
-)
+import datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiResponse
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema_view
+from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.generics import get_object_or_404
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.mixins import ListModelMixin
+from rest_framework.mixins import RetrieveModelMixin
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.viewsets import GenericViewSet
 
-from mr_tracker.tasks.models import DoctorVisitTask
-from mr_tracker.visits.models import DoctorVisit, Doctor
+from config.transactions import READ_ONLY
+from config.transactions import ReadPolicyMixin
+from mr_tracker.dashboard.api.views import IsAdmin
+from mr_tracker.tasks.api.serializers import DoctorVisitTaskBulkSerializer
 from mr_tracker.tasks.api.serializers import DoctorVisitTaskSerializer
+from mr_tracker.tasks.api.serializers import OverdueQuerySerializer
+from mr_tracker.tasks.api.serializers import RouteQuerySerializer
+from mr_tracker.tasks.api.serializers import TaskFilterSerializer
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.tasks.overdue import overdue_summary
+from mr_tracker.tasks.overdue import overdue_tasks
+from mr_tracker.tasks.routing import DAY_START
+from mr_tracker.tasks.routing import minutes_since_midnight
+from mr_tracker.tasks.routing import plan_route
+from mr_tracker.users.hierarchy import scope_to
+from mr_tracker.visits.api.serializers import DoctorVisitSerializer
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+
 
+def filter_tasks(queryset, data):
+    """Apply validated ``TaskFilterSerializer`` parameters to a task queryset."""
+    filters = {}
+    if "status" in data:
+        filters["completed"] = data["status"] == "completed"
+    if "mr" in data:
+        filters["assigned_to_id"] = data["mr"]
+    if "doctor" in data:
+        filters["assigned_doctor_id"] = data["doctor"]
+    if "start_date" in data:
+        filters["due_date__gte"] = data["start_date"]
+    if "end_date" in data:
+        filters["due_date__lte"] = data["end_date"]
+    ordering = TaskFilterSerializer.ORDERINGS[data["ordering"]]
+    return queryset.filter(**filters).order_by(*ordering)
 
 
-class DoctorVisitTaskViewSet(CreateModelMixin,
-                             ListModelMixin,
-                             RetrieveModelMixin,
-                             GenericViewSet):
+@extend_schema_view(list=extend_schema(parameters=[TaskFilterSerializer]))
+class DoctorVisitTaskViewSet(
+    ReadPolicyMixin,
+    CreateModelMixin,
+    ListModelMixin,
+    RetrieveModelMixin,
+    GenericViewSet,
+):
     
+    read_policy = READ_ONLY
     serializer_class = DoctorVisitTaskSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
+        if getattr(self, "swagger_fake_view", False):  # Schema generation has no user.
+            return DoctorVisitTask.objects.none()
+        # MRs see their own tasks, managers their reporting subtree's.
+        return scope_to(DoctorVisitTask.objects.all(), self.request.user, "assigned_to")
+
+    def filter_queryset(self, queryset):
+        if self.action != "list":
+            return queryset
+        params = TaskFilterSerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        data = dict(params.validated_data)
+        if self.request.user.role == "MR":
+            data.pop("mr", None)
+        return filter_tasks(queryset, data)
+
+    def get_permissions(self):
+        # Only managers assign tasks, one at a time or in bulk.
+        if self.action in ("create", "bulk"):
+            return [IsAuthenticated(), IsAdmin()]
+        return super().get_permissions()
 
-        if user.role == "MR":
-            return DoctorVisitTask.objects.filter(assigned_to=user)
-        
-        return DoctorVisitTask.objects.all()
-    
     def perform_create(self, serializer):
         serializer.save(assigned_by=self.request.user)
 
-    @action(detail=True, methods=['post'])
-    def complete(self, request, pk=None):
+    @extend_schema(
+        request=DoctorVisitTaskBulkSerializer,
+        responses={
+            201: OpenApiResponse(description="{created, tasks} with the created tasks"),
+        },
+        description=(
+            "Assign many tasks at once, from a list or a cross product of MRs, "
+            "doctors and due dates. All or nothing."
+        ),
+    )
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        serializer = DoctorVisitTaskBulkSerializer(
+            data=request.data,
+            context=self.get_serializer_context(),
+        )
+        serializer.is_valid(raise_exception=True)
+        tasks = serializer.save()
+        return Response(
+            {
+                "created": len(tasks),
+                "tasks": self.get_serializer(tasks, many=True).data,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(
+        parameters=[OverdueQuerySerializer],
+        responses={
+            200: OpenApiResponse(
+                description=(
+                    "{overdue, at_risk, per_mr, results} with the oldest overdue tasks"
+                ),
+            ),
+        },
+        description=(
+            "Pending tasks past their due date and time, with overdue and at-risk "
+            "(due soon) counts per MR."
+        ),
+    )
+    @action(detail=False, methods=["get"])
+    def overdue(self, request):
+        params = OverdueQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
 
-        task = self.get_object()
+        tasks = self.get_queryset()
+        if request.user.role != "MR" and "mr" in params.validated_data:
+            tasks = tasks.filter(assigned_to=params.validated_data["mr"])
 
-        if request.user != task.assigned_to:
-            raise PermissionDenied("You cannot complete a task not assigned to you.")
+        now = timezone.now()
+        oldest = overdue_tasks(tasks, now).order_by("due_date", "due_time", "id")[
+            : params.validated_data["limit"]
+        ]
+        return Response(
+            {
+                **overdue_summary(tasks, now),
+                "results": self.get_serializer(oldest, many=True).data,
+            },
+        )
 
-        doctor_id = task.assigned_doctor.id
-        gps_lat = request.data.get("gps_lat")
-        gps_long = request.data.get("gps_long")
-        notes = request.data.get("notes", "")
+    @extend_schema(
+        parameters=[RouteQuerySerializer],
+        responses={
+            200: OpenApiResponse(
+                description="{date, distance_km, late_minutes, stops, unrouted}",
+            ),
+        },
+        description=(
+            "Suggested visiting order for an MR's pending tasks of one day, from the "
+            "doctors' locations (or their last visit GPS) and the tasks' due times. "
+            "Tasks whose doctor has no known location are listed under unrouted, in "
+            "due order."
+        ),
+    )
+    @action(detail=False, methods=["get"])
+    def route(self, request):
+        params = RouteQuerySerializer(
+            data=request.query_params,
+            context=self.get_serializer_context(),
+        )
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
 
-        visit = DoctorVisit.objects.create(
-            mr=request.user,
-            doctor_name=task.assigned_doctor,
-            gps_lat=gps_lat,
-            gps_long=gps_long,
-            notes=notes,
-            completed=True,
-            visit_type='task',  # Mark as task-based visit
+        tasks = self.get_queryset().filter(due_date=data["date"], completed=False)
+        if request.user.role != "MR":
+            tasks = tasks.filter(assigned_to=data["mr"])
+        last_visit = DoctorVisit.objects.filter(
+            doctor_name=OuterRef("assigned_doctor"),
+            gps_lat__isnull=False,
+            gps_long__isnull=False,
+        ).order_by("-visited_at")
+        tasks = list(
+            tasks.select_related("assigned_doctor")
+            .annotate(
+                lat=Coalesce(
+                    F("assigned_doctor__latitude"),
+                    Subquery(last_visit.values("gps_lat")[:1]),
+                ),
+                long=Coalesce(
+                    F("assigned_doctor__longitude"),
+                    Subquery(last_visit.values("gps_long")[:1]),
+                ),
+            )
+            .order_by("due_time", "id"),
         )
+        located = [
+            task for task in tasks if task.lat is not None and task.long is not None
+        ]
+        unrouted = [task for task in tasks if task.lat is None or task.long is None]
 
-        task.visit_record = visit
-        task.completed = True
-        task.save()
+        stops, km, late_minutes = [], 0.0, 0.0
+        if located:
+            start = minutes_since_midnight(min(DAY_START, located[0].due_time))
+            if data["date"] == timezone.localdate():
+                start = max(start, minutes_since_midnight(timezone.localtime().time()))
+            origin = (data["lat"], data["long"]) if "lat" in data else None
+            order, arrivals, km, late_minutes = plan_route(
+                [(task.lat, task.long) for task in located],
+                [minutes_since_midnight(task.due_time) for task in located],
+                start,
+                origin=origin,
+            )
+            midnight = datetime.datetime.combine(
+                data["date"],
+                datetime.time(),
+                tzinfo=timezone.get_current_timezone(),
+            )
+            for position, (index, arrival) in enumerate(zip(order, arrivals), start=1):
+                task = located[index]
+                stops.append(
+                    {
+                        "position": position,
+                        "eta": midnight + datetime.timedelta(minutes=arrival),
+                        "lat": task.lat,
+                        "long": task.long,
+                        "task": self.get_serializer(task).data,
+                    },
+                )
 
-        return Response({
-            "message": "Task completed successfully.",
-            "task_id": task.id,
-            "visit_id": visit.id
-        })
\ No newline at end of file
+        return Response(
+            {
+                "date": data["date"],
+                "distance_km": round(km, 2),
+                "late_minutes": round(late_minutes),
+                "stops": stops,
+                "unrouted": self.get_serializer(unrouted, many=True).data,
+            },
+        )
+
+    @extend_schema(
+        request=None,
+        responses={
+            200: OpenApiResponse(
+                description="{message, task_id, visit_id, task, visit}",
+            ),
+            403: OpenApiResponse(description="Task not assigned to you"),
+        },
+        description=(
+            "Complete a task by recording its doctor visit. Safe to repeat: later "
+            "calls return the visit from the first one."
+        ),
+    )
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        with transaction.atomic():
+            # Lock the task so a repeated tap waits for the first one and
+            # then sees it completed, instead of creating a second visit.
+            # The visit is not joined here: after waiting for the lock,
+            # Postgres re-reads the task row but not the rows joined to it.
+            task = get_object_or_404(
+                self.get_queryset()
+                .select_related("assigned_doctor")
+                .select_for_update(of=("self",)),
+                pk=pk,
+            )
+            self.check_object_permissions(request, task)
+
+            if request.user.id != task.assigned_to_id:
+                msg = "You cannot complete a task not assigned to you."
+                raise PermissionDenied(msg)
+
+            visit = None
+            if task.completed and task.visit_record_id is not None:
+                # None if the visit's month has been detached meanwhile.
+                visit = (
+                    DoctorVisit.objects.select_related("doctor_name")
+                    .filter(pk=task.visit_record_id)
+                    .first()
+                )
+            if visit is not None:
+                message = "Task was already completed."
+                task.visit_record = visit
+            else:
+                message = "Task completed successfully."
+                visit = DoctorVisit.objects.create(
+                    mr=request.user,
+                    doctor_name=task.assigned_doctor,
+                    gps_lat=request.data.get("gps_lat"),
+                    gps_long=request.data.get("gps_long"),
+                    notes=request.data.get("notes", ""),
+                    completed=True,
+                    visit_type="task",  # Mark as task-based visit
+                )
+                task.mark_completed(visit)
+
+        return Response(
+            {
+                "message": message,
+                "task_id": task.id,
+                "visit_id": visit.id,
+                "task": self.get_serializer(task).data,
+                "visit": DoctorVisitSerializer(visit).data,
+            },
+        )
@@ -0,0 +1,77 @@
+"""
+Complete pending tasks with the self visits that fulfil them.
+
+An MR who visits an assigned doctor straight from the visit form, instead of
+through the task's ``complete`` action, still fulfils the task. New visits
+are matched to open tasks for the same MR and doctor that are due within
+``TASK_LINK_WINDOW`` of the visit date, the closest due date first. Each
+batch of visits costs three queries, however many visits it has: one to
+find and lock the candidate tasks, one to link them and one to mark the
+visits as task-based.
+"""
+
+import datetime
+
+from django.db import transaction
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.visits.models import DoctorVisit
+
+# A visit this many days before or after a task's due date fulfils it.
+TASK_LINK_WINDOW = datetime.timedelta(days=2)
+
+
+def link_visits_to_tasks(visits):
+    """
+    Complete the open tasks fulfilled by ``visits`` (saved doctor visits).
+
+    Returns the completed tasks. Tasks being completed by a concurrent
+    request are skipped rather than waited for.
+    """
+    visits = [visit for visit in visits if visit.visit_type == "self"]
+    if not visits:
+        return []
+
+    with transaction.atomic():
+        candidates = (
+            DoctorVisitTask.objects.filter(
+                assigned_to__in={visit.mr_id for visit in visits},
+                assigned_doctor__in={visit.doctor_name_id for visit in visits},
+                completed=False,
+                due_date__range=(
+                    min(visit.visit_date for visit in visits) - TASK_LINK_WINDOW,
+                    max(visit.visit_date for visit in visits) + TASK_LINK_WINDOW,
+                ),
+            )
+            .order_by("due_date", "due_time", "id")
+            .select_for_update(skip_locked=True)
+        )
+        open_tasks = {}
+        for task in candidates:
+            open_tasks.setdefault(
+                (task.assigned_to_id, task.assigned_doctor_id),
+                [],
+            ).append(task)
+
+        linked = []
+        for visit in sorted(visits, key=lambda visit: visit.visited_at):
+            tasks = [
+                task
+                for task in open_tasks.get((visit.mr_id, visit.doctor_name_id), [])
+                if abs(task.due_date - visit.visit_date) <= TASK_LINK_WINDOW
+            ]
+            if not tasks:
+                continue
+            task = min(tasks, key=lambda task: abs(task.due_date - visit.visit_date))
+            open_tasks[(visit.mr_id, visit.doctor_name_id)].remove(task)
+            task.visit_record = visit
+            task.completed = True
+            visit.visit_type = "task"
+            linked.append(task)
+
+        if linked:
+            DoctorVisitTask.objects.bulk_update(linked, ["visit_record", "completed"])
+            DoctorVisit.objects.filter(
+                pk__in=[task.visit_record_id for task in linked],
+            ).update(visit_type="task")
+    return linked
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mr_tracker.tasks.schedules import materialize
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the doctor visit tasks of every active recurring schedule for "
+        "the coming days. Tasks that already exist are skipped. Run daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=14,
+            help="Create tasks due up to this many days ahead, today included.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Schedules handled per insert.",
+        )
+
+    def handle(self, *args, **options):
+        schedules, tasks = materialize(
+            today=timezone.localdate(),
+            horizon_days=options["days"],
+            chunk_size=options["chunk_size"],
+        )
+        self.stdout.write(f"Materialized {tasks} tasks from {schedules} schedules")
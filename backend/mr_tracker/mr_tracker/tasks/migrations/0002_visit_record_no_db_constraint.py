@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0001_initial'),
+        ('visits', '0003_doctorvisit_visit_type_shopvisit_visit_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='doctorvisittask',
+            name='visit_record',
+            field=models.OneToOneField(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='task', to='visits.doctorvisit'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_visit_record_no_db_constraint'),
+        ('visits', '0006_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorvisittask',
+            index=models.Index(fields=['assigned_to', 'completed', 'due_date'], name='tasks_docto_assigne_d87fa9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorvisittask',
+            index=models.Index(fields=['-due_date'], name='tasks_docto_due_dat_6d5f46_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:16
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_hot_query_indexes'),
+        ('visits', '0007_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('daily', 'Daily'), ('weekly', 'Weekly'), ('monthly', 'Monthly')], default='weekly', max_length=10)),
+                ('interval', models.PositiveSmallIntegerField(default=1, help_text='Every N days, weeks or months.')),
+                ('weekdays', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveSmallIntegerField(), blank=True, default=list, size=None)),
+                ('due_time', models.TimeField()),
+                ('notes', models.TextField(blank=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateField(blank=True, editable=False, null=True)),
+                ('assigned_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_task_schedules', to=settings.AUTH_USER_MODEL)),
+                ('assigned_doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_schedules', to='visits.doctor')),
+                ('assigned_to', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_schedules', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='doctorvisittask',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tasks', to='tasks.taskschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='doctorvisittask',
+            constraint=models.UniqueConstraint(fields=('schedule', 'due_date'), name='unique_schedule_due_date'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_task_schedules'),
+        ('visits', '0007_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorvisittask',
+            index=models.Index(fields=['assigned_to', 'assigned_doctor', 'completed'], name='tasks_docto_assigne_25d765_idx'),
+        ),
+    ]
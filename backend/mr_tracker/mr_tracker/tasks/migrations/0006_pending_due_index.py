@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_link_index'),
+        ('visits', '0007_search_vectors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorvisittask',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['due_date', 'due_time'], name='tasks_pending_due_idx'),
+        ),
+    ]
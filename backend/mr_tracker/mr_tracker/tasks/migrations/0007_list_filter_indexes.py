@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_pending_due_index'),
+        ('visits', '0009_list_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorvisittask',
+            index=models.Index(fields=['assigned_doctor', 'due_date'], name='tasks_docto_assigne_7f4b96_idx'),
+        ),
+    ]
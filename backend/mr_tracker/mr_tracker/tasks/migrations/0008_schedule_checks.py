@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:28
+
+import django.contrib.postgres.fields
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_list_filter_indexes'),
+        ('visits', '0010_territories'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='taskschedule',
+            name='interval',
+            field=models.PositiveSmallIntegerField(default=1, help_text='Every N days, weeks or months.', validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AlterField(
+            model_name='taskschedule',
+            name='weekdays',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.PositiveSmallIntegerField(validators=[django.core.validators.MaxValueValidator(6)]), blank=True, default=list, size=None),
+        ),
+        # Schedules saved before the checks: 0 meant a division by zero.
+        migrations.RunSQL(
+            [
+                'UPDATE tasks_taskschedule SET "interval" = 1 WHERE "interval" < 1',
+                "UPDATE tasks_taskschedule SET weekdays = ARRAY(SELECT d FROM unnest(weekdays) AS d WHERE d <= 6)"
+                " WHERE NOT weekdays <@ ARRAY[0, 1, 2, 3, 4, 5, 6]::smallint[]",
+            ],
+            migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='taskschedule',
+            constraint=models.CheckConstraint(condition=models.Q(('interval__gte', 1)), name='task_schedule_interval_positive'),
+        ),
+        migrations.AddConstraint(
+            model_name='taskschedule',
+            constraint=models.CheckConstraint(condition=models.Q(('weekdays__contained_by', [0, 1, 2, 3, 4, 5, 6])), name='task_schedule_weekdays_valid'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0008_schedule_checks'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='doctorvisittask',
+            name='tasks_docto_due_dat_6d5f46_idx',
+        ),
+    ]
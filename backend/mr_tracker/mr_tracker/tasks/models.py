@@ -1,7 +1,114 @@
+import datetime
+
+from django.contrib.postgres.fields import ArrayField
+from django.core.validators import MaxValueValidator
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils import timezone
+
 from mr_tracker.users.models import User
-from mr_tracker.visits.models import DoctorVisit, ShopVisit, Doctor
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+
+
+class TaskSchedule(models.Model):
+    """
+    A recurring doctor call plan for one MR.
+
+    ``manage.py materialize_task_schedules`` turns it into ``DoctorVisitTask``
+    rows for the coming days. Weekly schedules run on ``weekdays``
+    (0 = Monday) or, if empty, on the weekday of ``start_date``; monthly
+    schedules run on the day of month of ``start_date``.
+    """
+
+    FREQUENCY_CHOICES = [
+        ("daily", "Daily"),
+        ("weekly", "Weekly"),
+        ("monthly", "Monthly"),
+    ]
+
+    assigned_to = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="task_schedules",
+    )
+    assigned_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="created_task_schedules",
+    )
+    assigned_doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name="task_schedules",
+    )
+
+    frequency = models.CharField(
+        max_length=10,
+        choices=FREQUENCY_CHOICES,
+        default="weekly",
+    )
+    interval = models.PositiveSmallIntegerField(
+        default=1,
+        validators=[MinValueValidator(1)],
+        help_text="Every N days, weeks or months.",
+    )
+    weekdays = ArrayField(
+        models.PositiveSmallIntegerField(validators=[MaxValueValidator(6)]),
+        default=list,
+        blank=True,
+    )
+    due_time = models.TimeField()
+    notes = models.TextField(blank=True)
+
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    # Last due date already turned into tasks.
+    materialized_until = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            # occurs_on divides by interval, and weekdays outside 0-6 never match.
+            models.CheckConstraint(
+                condition=models.Q(interval__gte=1),
+                name="task_schedule_interval_positive",
+            ),
+            models.CheckConstraint(
+                condition=models.Q(weekdays__contained_by=list(range(7))),
+                name="task_schedule_weekdays_valid",
+            ),
+        ]
+
+    def occurs_on(self, day):
+        start = self.start_date
+        if self.frequency == "daily":
+            return (day - start).days % self.interval == 0
+        if self.frequency == "weekly":
+            weekdays = self.weekdays or [start.weekday()]
+            first_monday = start - datetime.timedelta(days=start.weekday())
+            weeks = (day - first_monday).days // 7
+            return day.weekday() in weekdays and weeks % self.interval == 0
+        months = (day.year - start.year) * 12 + day.month - start.month
+        return day.day == start.day and months % self.interval == 0
+
+    def occurrences(self, start, end):
+        """Due dates of this schedule between ``start`` and ``end``, inclusive."""
+        day = max(start, self.start_date)
+        if self.end_date is not None:
+            end = min(end, self.end_date)
+        while day <= end:
+            if self.occurs_on(day):
+                yield day
+            day += datetime.timedelta(days=1)
+
+    def __str__(self):
+        return (
+            f"{self.get_frequency_display()} calls on Dr. {self.assigned_doctor.name} "
+            f"for {self.assigned_to.username}"
+        )
+
 
 class DoctorVisitTask(models.Model):
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tasks')
@@ -20,15 +127,49 @@ class DoctorVisitTask(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name="task"
+        related_name="task",
+        # DoctorVisit is range-partitioned on visit_date, so its primary key is
+        # (id, visit_date) in the database and cannot be the target of a FK.
+        db_constraint=False,
     )
 
     completed = models.BooleanField(default=False)
-    
+
+    schedule = models.ForeignKey(
+        TaskSchedule,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="tasks",
+    )
+
+    class Meta:
+        indexes = [
+            # An MR's pending (or done) tasks by due date.
+            models.Index(fields=["assigned_to", "completed", "due_date"]),
+            # Open tasks a new self visit may fulfil (see tasks.linking).
+            models.Index(fields=["assigned_to", "assigned_doctor", "completed"]),
+            # A doctor's tasks by due date (see filter_tasks).
+            models.Index(fields=["assigned_doctor", "due_date"]),
+            # Pending tasks by due moment (see tasks.overdue).
+            models.Index(
+                fields=["due_date", "due_time"],
+                condition=models.Q(completed=False),
+                name="tasks_pending_due_idx",
+            ),
+        ]
+        constraints = [
+            # Lets the materializer insert with ON CONFLICT DO NOTHING.
+            models.UniqueConstraint(
+                fields=["schedule", "due_date"],
+                name="unique_schedule_due_date",
+            ),
+        ]
+
     def mark_completed(self, visit):
         self.visit_record = visit
         self.completed = True
-        self.save()
+        self.save(update_fields=["visit_record", "completed"])
 
     def __str__(self):
         return f"Doctor Task for {self.assigned_to.username} - Dr. {self.assigned_doctor.name}"
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Overdue and at-risk pending tasks.
+
+A task is due at ``due_date`` + ``due_time`` in local time. It is overdue
+once that moment has passed, and at risk while it falls within
+``AT_RISK_WINDOW`` from now. Every query here filters on
+``completed=False`` and an upper bound on the due moment, so the partial
+``tasks_pending_due_idx`` index serves it. The cost grows with the number
+of pending tasks, not with every task ever assigned.
+"""
+
+import datetime
+
+from django.db.models import Count
+from django.db.models import Min
+from django.db.models import Q
+from django.utils import timezone
+
+AT_RISK_WINDOW = datetime.timedelta(hours=2)
+
+
+def due_before(moment: datetime.datetime) -> Q:
+    """Tasks due strictly before ``moment``."""
+    moment = timezone.localtime(moment)
+    return Q(due_date__lt=moment.date()) | Q(
+        due_date=moment.date(),
+        due_time__lt=moment.time(),
+    )
+
+
+def overdue_tasks(queryset, now: datetime.datetime):
+    return queryset.filter(due_before(now), completed=False)
+
+
+def overdue_summary(queryset, now: datetime.datetime):
+    """
+    Overdue and at-risk counts for the pending tasks in ``queryset``.
+
+    Returns ``{"overdue", "at_risk", "per_mr"}``. ``per_mr`` lists every MR
+    with such tasks, most overdue first, with the oldest overdue due date.
+    """
+    is_overdue = due_before(now)
+    rows = (
+        queryset.filter(due_before(now + AT_RISK_WINDOW), completed=False)
+        .values("assigned_to", "assigned_to__username")
+        .annotate(
+            overdue=Count("id", filter=is_overdue),
+            at_risk=Count("id", filter=~is_overdue),
+            oldest_due_date=Min("due_date", filter=is_overdue),
+        )
+        .order_by("-overdue", "-at_risk", "assigned_to")
+    )
+    per_mr = [
+        {
+            "mr_id": row["assigned_to"],
+            "mr": row["assigned_to__username"],
+            "overdue": row["overdue"],
+            "at_risk": row["at_risk"],
+            "oldest_due_date": row["oldest_due_date"],
+        }
+        for row in rows
+    ]
+    return {
+        "overdue": sum(row["overdue"] for row in per_mr),
+        "at_risk": sum(row["at_risk"] for row in per_mr),
+        "per_mr": per_mr,
+    }
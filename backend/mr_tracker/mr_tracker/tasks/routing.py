@@ -0,0 +1,150 @@
+"""
+Visiting order for an MR's pending tasks of one day.
+
+Stops are ordered by a nearest-neighbour tour, improved with 2-opt over a
+great-circle distance matrix built with NumPy. Due times count first: a
+route is better when its total lateness (minutes past the due time, at an
+assumed travel speed and visit length) is lower, and only then when it is
+shorter. The earliest-due-first order is also tried as a starting tour, so
+the result is never later than visiting in due order.
+"""
+
+import datetime
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+# Assumed city travel speed and time spent with each doctor.
+AVERAGE_SPEED_KMH = 25.0
+VISIT_MINUTES = 20.0
+# Routes set off at this time, or at the first due time if that is earlier.
+DAY_START = datetime.time(9, 0)
+# Ignore improvements smaller than this (kilometres or minutes).
+EPSILON = 1e-9
+
+
+def minutes_since_midnight(time):
+    return time.hour * 60 + time.minute + time.second / 60
+
+
+def distance_matrix(points):
+    """Great-circle distances in km between ``points``, an (n, 2) array of degrees."""
+    lat, lon = np.radians(np.asarray(points, dtype=float)).T
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class RoutePlan:
+    """
+    Plan a path from an origin through every stop.
+
+    ``dist`` is the (n + 1) square distance matrix with the origin at index
+    0; a row and column of zeros means "start at whichever stop is best".
+    ``due`` holds each stop's due time and ``start`` the departure time, in
+    minutes since midnight.
+    """
+
+    def __init__(self, dist, due, start):
+        self.dist = dist
+        self.due = np.concatenate(([0.0], np.asarray(due, dtype=float)))
+        self.start = start
+        self.visits = VISIT_MINUTES * np.arange(len(due))
+
+    def costs(self, orders):
+        """``(late minutes, km, arrivals)`` arrays for an (m, n) array of tours."""
+        previous = np.concatenate(
+            (np.zeros((len(orders), 1), dtype=int), orders[:, :-1]),
+            axis=1,
+        )
+        legs = self.dist[previous, orders]
+        arrivals = (
+            self.start
+            + np.cumsum(legs, axis=1) * (60.0 / AVERAGE_SPEED_KMH)
+            + self.visits
+        )
+        lateness = np.maximum(arrivals - self.due[orders], 0.0).sum(axis=1)
+        return lateness, legs.sum(axis=1), arrivals
+
+    def cost(self, order):
+        """``(late minutes, km)`` of one tour; lower is better, in that order."""
+        lateness, km, _ = self.costs(order[None, :])
+        return float(lateness[0]), float(km[0])
+
+    def nearest_neighbour(self):
+        unvisited = np.ones(len(self.dist), dtype=bool)
+        unvisited[0] = False
+        current, order = 0, []
+        for _ in range(len(self.dist) - 1):
+            # Break distance ties (e.g. from a zero origin) by due time.
+            candidates = np.flatnonzero(unvisited)
+            nearest = candidates[
+                np.lexsort((self.due[candidates], self.dist[current, candidates]))[0]
+            ]
+            order.append(nearest)
+            unvisited[nearest] = False
+            current = nearest
+        return np.array(order, dtype=int)
+
+    def due_order(self):
+        return np.argsort(self.due[1:], kind="stable") + 1
+
+    def two_opt(self, order):
+        """
+        Reverse segments of ``order`` while that makes it better.
+
+        All reversals starting at one position are scored at once, so a pass
+        costs ``n`` array operations rather than ``n**2`` tour evaluations.
+        """
+        positions = np.arange(len(order))
+        late, km = self.cost(order)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(order) - 1):
+                ends = np.arange(i + 1, len(order))[:, None]
+                reversed_ = (positions >= i) & (positions <= ends)
+                candidates = order[np.where(reversed_, i + ends - positions, positions)]
+                lateness, length, _ = self.costs(candidates)
+                best = np.lexsort((length, lateness))[0]
+                if lateness[best] < late - EPSILON or (
+                    lateness[best] <= late + EPSILON and length[best] < km - EPSILON
+                ):
+                    order, late, km = candidates[best], lateness[best], length[best]
+                    improved = True
+        return order
+
+    def solve(self):
+        """Indices of the stops (0-based) in visiting order."""
+        if len(self.dist) <= 2:  # noqa: PLR2004
+            return np.arange(len(self.dist) - 1)
+        tours = [
+            self.two_opt(tour) for tour in (self.nearest_neighbour(), self.due_order())
+        ]
+        return min(tours, key=self.cost) - 1
+
+
+def plan_route(points, due, start, origin=None):
+    """
+    Order stops at ``points`` ((lat, long) pairs) with ``due`` times.
+
+    ``due`` and ``start`` are minutes since midnight; ``origin`` is where
+    the MR sets off from, if known. Returns ``(order, arrivals, km,
+    late_minutes)`` where ``order`` indexes into ``points`` and
+    ``arrivals`` holds the estimated arrival minute at each stop in order.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    if origin is None:
+        dist = np.zeros((len(points) + 1, len(points) + 1))
+        dist[1:, 1:] = distance_matrix(points)
+    else:
+        dist = distance_matrix(np.vstack([origin, points]))
+
+    plan = RoutePlan(dist, due, start)
+    order = plan.solve()
+    lateness, km, arrivals = plan.costs((order + 1)[None, :])
+    return order.tolist(), arrivals[0].tolist(), float(km[0]), float(lateness[0])
@@ -0,0 +1,107 @@
+"""
+Turn recurring ``TaskSchedule`` plans into ``DoctorVisitTask`` rows.
+
+Schedules are read in chunks. Each chunk costs a fixed number of queries,
+however many tasks it produces: one to find tasks that already exist, one
+multi-row insert and one update of ``materialized_until``. A schedule's
+``materialized_until`` only moves forward, so a rerun skips the days it has
+already covered. A task created by hand for the same MR, doctor and day is
+not duplicated. The unique ``(schedule, due_date)`` constraint makes two
+concurrent runs safe as well.
+"""
+
+import datetime
+
+from django.db import transaction
+from django.db.models import Q
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.tasks.models import TaskSchedule
+
+
+def _window_start(schedule, today):
+    start = max(today, schedule.start_date)
+    if schedule.materialized_until is not None:
+        start = max(start, schedule.materialized_until + datetime.timedelta(days=1))
+    return start
+
+
+def _existing(schedules, start, end):
+    """
+    ``(assigned_to, assigned_doctor, due_date)`` of tasks that already exist.
+
+    Filters on the MRs and doctors separately, which may return a few
+    unrelated pairs; the caller only looks up the pairs it needs.
+    """
+    return set(
+        DoctorVisitTask.objects.filter(
+            assigned_to__in={schedule.assigned_to_id for schedule in schedules},
+            assigned_doctor__in={schedule.assigned_doctor_id for schedule in schedules},
+            due_date__range=(start, end),
+        ).values_list("assigned_to_id", "assigned_doctor_id", "due_date"),
+    )
+
+
+def _materialize_chunk(schedules, today, horizon_end):
+    windows = {schedule.pk: _window_start(schedule, today) for schedule in schedules}
+    existing = _existing(schedules, min(windows.values()), horizon_end)
+
+    tasks = []
+    for schedule in schedules:
+        for due_date in schedule.occurrences(windows[schedule.pk], horizon_end):
+            if (
+                schedule.assigned_to_id,
+                schedule.assigned_doctor_id,
+                due_date,
+            ) in existing:
+                continue
+            tasks.append(
+                DoctorVisitTask(
+                    schedule=schedule,
+                    assigned_to_id=schedule.assigned_to_id,
+                    assigned_by_id=schedule.assigned_by_id,
+                    assigned_doctor_id=schedule.assigned_doctor_id,
+                    due_date=due_date,
+                    due_time=schedule.due_time,
+                    notes=schedule.notes,
+                ),
+            )
+
+    with transaction.atomic():
+        created = DoctorVisitTask.objects.bulk_create(tasks, ignore_conflicts=True)
+        TaskSchedule.objects.filter(pk__in=windows).update(
+            materialized_until=horizon_end,
+        )
+    return len(created)
+
+
+def materialize(*, today: datetime.date, horizon_days: int, chunk_size: int = 500):
+    """
+    Create the tasks of every active schedule due in the next ``horizon_days``.
+
+    Returns ``(schedules, tasks)``: how many schedules were looked at and how
+    many tasks were queued for insert. Tasks lost to a concurrent run are
+    still counted, since ``ON CONFLICT DO NOTHING`` does not report them.
+    """
+    horizon_end = today + datetime.timedelta(days=horizon_days - 1)
+    pending = (
+        TaskSchedule.objects.filter(active=True, start_date__lte=horizon_end)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=today))
+        .filter(
+            Q(materialized_until__isnull=True) | Q(materialized_until__lt=horizon_end),
+        )
+        .order_by("pk")
+    )
+
+    schedules = tasks = 0
+    chunk = []
+    for schedule in pending.iterator(chunk_size=chunk_size):
+        chunk.append(schedule)
+        if len(chunk) == chunk_size:
+            tasks += _materialize_chunk(chunk, today, horizon_end)
+            schedules += len(chunk)
+            chunk = []
+    if chunk:
+        tasks += _materialize_chunk(chunk, today, horizon_end)
+        schedules += len(chunk)
+    return schedules, tasks
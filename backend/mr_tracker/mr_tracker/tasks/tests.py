@@ -1,3 +1,577 @@
-from django.test import TestCase
+import datetime
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+import numpy as np
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db import connection
+from django.db import transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mr_tracker.tasks.api.serializers import TaskFilterSerializer
+from mr_tracker.tasks.api.views import filter_tasks
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.tasks.models import TaskSchedule
+from mr_tracker.tasks.overdue import overdue_tasks
+from mr_tracker.tasks.routing import RoutePlan
+from mr_tracker.tasks.routing import distance_matrix
+from mr_tracker.tasks.routing import plan_route
+from mr_tracker.tasks.schedules import materialize
+from mr_tracker.users.tests.factories import UserFactory
+from mr_tracker.visits.index_advisor import seed_workload
+from mr_tracker.visits.index_advisor import unindexed_scans
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def manager_client():
+    client = APIClient()
+    client.force_authenticate(UserFactory(role="admin", company_wide=True))
+    return client
+
+
+def test_bulk_assign_cross_product_in_fixed_queries(
+    manager_client,
+    django_assert_max_num_queries,
+):
+    mrs = UserFactory.create_batch(3)
+    doctors = [
+        Doctor.objects.create(name=f"Dr. {n}", specialization="ENT") for n in range(4)
+    ]
+    monday = datetime.date(2026, 11, 2)
+    days = [(monday + datetime.timedelta(days=n)).isoformat() for n in range(5)]
+
+    with django_assert_max_num_queries(8):
+        response = manager_client.post(
+            reverse("doctor-tasks-bulk"),
+            {
+                "cross_product": {
+                    "assigned_to": [mr.id for mr in mrs],
+                    "assigned_doctor": [doctor.id for doctor in doctors],
+                    "due_date": days,
+                    "due_time": "10:30",
+                },
+            },
+            format="json",
+        )
+
+    assert response.status_code == 201, response.data
+    assert response.data["created"] == 60
+    assert (
+        DoctorVisitTask.objects.filter(assigned_to=mrs[0], due_time="10:30").count()
+        == 20
+    )
+
+
+def test_bulk_assign_rejects_unknown_ids_and_duplicates(manager_client):
+    mr = UserFactory()
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    entry = {
+        "assigned_to": mr.id,
+        "assigned_doctor": doctor.id,
+        "due_date": "2026-11-02",
+        "due_time": "10:00",
+    }
+    url = reverse("doctor-tasks-bulk")
+
+    unknown = manager_client.post(
+        url,
+        {"tasks": [{**entry, "assigned_doctor": 999999}]},
+        format="json",
+    )
+    repeated = manager_client.post(url, {"tasks": [entry, entry]}, format="json")
+    assert unknown.status_code == 400
+    assert "999999" in str(unknown.data)
+    assert repeated.status_code == 400
+    assert not DoctorVisitTask.objects.exists()
+
+    assert (
+        manager_client.post(url, {"tasks": [entry]}, format="json").status_code == 201
+    )
+    again = manager_client.post(url, {"tasks": [entry]}, format="json")
+    assert again.status_code == 400
+    assert DoctorVisitTask.objects.count() == 1
+
+
+def test_only_managers_assign_tasks(user):
+    other = UserFactory()
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    entry = {
+        "assigned_to": other.id,
+        "assigned_doctor": doctor.id,
+        "due_date": "2026-11-02",
+        "due_time": "10:00",
+    }
+    client = APIClient()
+    client.force_authenticate(user)
+
+    bulk = client.post(reverse("doctor-tasks-bulk"), {"tasks": [entry]}, format="json")
+    single = client.post(reverse("doctor-tasks-list"), entry, format="json")
+    assert bulk.status_code == single.status_code == 403
+    assert not DoctorVisitTask.objects.exists()
+
+
+def _pending_task(mr):
+    return DoctorVisitTask.objects.create(
+        assigned_to=mr,
+        assigned_by=UserFactory(role="admin"),
+        assigned_doctor=Doctor.objects.create(name="Dr. Rao", specialization="ENT"),
+        due_date=datetime.date(2026, 11, 2),
+        due_time="10:00",
+    )
+
+
+def test_complete_task_is_idempotent_and_returns_task_and_visit(user):
+    task = _pending_task(user)
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("doctor-tasks-complete", kwargs={"pk": task.pk})
+
+    with CaptureQueriesContext(connection) as queries:
+        first = client.post(url, {"notes": "Left samples"})
+    statements = [
+        q["sql"].split()[0]
+        for q in queries.captured_queries
+        if "SAVEPOINT" not in q["sql"]
+    ]
+    second = client.post(url, {"notes": "Tapped again"})
+
+    assert first.status_code == second.status_code == 200
+    assert statements == ["SELECT", "INSERT", "UPDATE"]
+    assert second.data["visit_id"] == first.data["visit_id"]
+    assert first.data["task"]["completed"] is True
+    assert first.data["task"]["visit_record"] == first.data["visit_id"]
+    assert first.data["visit"]["notes"] == "Left samples"
+    assert first.data["visit"]["is_assigned_task"] is True
+    assert first.data["visit"]["doctor_name_display"] == "Dr. Rao"
+    assert second.data["visit"]["notes"] == "Left samples"
+    assert DoctorVisit.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_completions_create_one_visit(user):
+    task = _pending_task(user)
+    url = reverse("doctor-tasks-complete", kwargs={"pk": task.pk})
+    barrier = threading.Barrier(2)
+
+    def tap(_):
+        client = APIClient()
+        client.force_authenticate(user)
+        barrier.wait()
+        try:
+            return client.post(url).data["visit_id"]
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first, second = pool.map(tap, range(2))
+
+    assert first == second
+    assert DoctorVisit.objects.count() == 1
+
+
+def _schedule(**kwargs):
+    defaults = {
+        "assigned_to": UserFactory(),
+        "assigned_by": UserFactory(role="admin"),
+        "assigned_doctor": Doctor.objects.create(name="Dr. Iyer", specialization="ENT"),
+        "due_time": datetime.time(10, 0),
+        "start_date": datetime.date(2026, 11, 2),
+    }
+    return TaskSchedule.objects.create(**{**defaults, **kwargs})
+
+
+def test_schedule_recurrence_rules():
+    monday = datetime.date(2026, 11, 2)
+    fortnightly = _schedule(frequency="weekly", interval=2, weekdays=[0, 3])
+    monthly = _schedule(frequency="monthly", start_date=datetime.date(2026, 11, 15))
+    daily = _schedule(
+        frequency="daily",
+        interval=3,
+        end_date=datetime.date(2026, 11, 10),
+    )
+
+    window = (monday, monday + datetime.timedelta(days=27))
+    assert [day.day for day in fortnightly.occurrences(*window)] == [2, 5, 16, 19]
+    assert list(monthly.occurrences(monday, datetime.date(2027, 1, 31))) == [
+        datetime.date(2026, 11, 15),
+        datetime.date(2026, 12, 15),
+        datetime.date(2027, 1, 15),
+    ]
+    assert [day.day for day in daily.occurrences(*window)] == [2, 5, 8]
+
+
+def test_schedule_interval_and_weekdays_are_checked():
+    schedule = _schedule(interval=2, weekdays=[0, 6])
+    schedule.full_clean()
+    schedule.interval, schedule.weekdays = 0, [0, 7]
+    with pytest.raises(ValidationError) as error:
+        schedule.full_clean()
+    assert set(error.value.message_dict) >= {"interval", "weekdays"}
+
+    # The admin is not the only writer: the database refuses them too.
+    for fields in ({"interval": 0}, {"weekdays": [7]}):
+        with pytest.raises(IntegrityError), transaction.atomic():
+            TaskSchedule.objects.filter(pk=schedule.pk).update(**fields)
+
+
+def test_materialize_is_set_based_and_idempotent(django_assert_max_num_queries):
+    monday = datetime.date(2026, 11, 2)
+    mrs = UserFactory.create_batch(3)
+    doctors = [
+        Doctor.objects.create(name=f"Dr. {n}", specialization="ENT") for n in range(20)
+    ]
+    manager = UserFactory(role="admin")
+    TaskSchedule.objects.bulk_create(
+        [
+            TaskSchedule(
+                assigned_to=mr,
+                assigned_by=manager,
+                assigned_doctor=doctor,
+                frequency="weekly",
+                weekdays=[0, 2],
+                due_time=datetime.time(11, 0),
+                start_date=monday,
+            )
+            for mr in mrs
+            for doctor in doctors
+        ],
+    )
+    # Assigned by hand already; must not be duplicated.
+    DoctorVisitTask.objects.create(
+        assigned_to=mrs[0],
+        assigned_by=manager,
+        assigned_doctor=doctors[0],
+        due_date=monday,
+        due_time=datetime.time(9, 0),
+    )
+
+    # Two chunks of 50 schedules, a fixed number of queries each.
+    with django_assert_max_num_queries(12):
+        assert materialize(today=monday, horizon_days=14, chunk_size=50) == (
+            60,
+            60 * 4 - 1,
+        )
+    assert DoctorVisitTask.objects.filter(schedule__isnull=False).count() == 239
+    assert materialize(today=monday, horizon_days=14) == (0, 0)
+
+    # Each following day only the newly reached date is looked at.
+    assert materialize(today=monday + datetime.timedelta(days=1), horizon_days=14) == (
+        60,
+        60,
+    )
+    assert materialize(today=monday + datetime.timedelta(days=2), horizon_days=14) == (
+        60,
+        0,
+    )
+    assert DoctorVisitTask.objects.count() == 240 + 60
+
+
+def test_self_visit_completes_matching_task():
+    mr = UserFactory()
+    doctor = Doctor.objects.create(name="Dr. Nair", specialization="ENT")
+    today = timezone.localdate()
+    task = DoctorVisitTask.objects.create(
+        assigned_to=mr,
+        assigned_by=UserFactory(role="admin"),
+        assigned_doctor=doctor,
+        due_date=today + datetime.timedelta(days=1),
+        due_time=datetime.time(10, 0),
+    )
+    client = APIClient()
+    client.force_authenticate(mr)
+
+    response = client.post(
+        reverse("doctor-visits-list"),
+        {"doctor_name": doctor.id, "visited_at": timezone.now().isoformat()},
+        format="json",
+    )
+
+    assert response.status_code == 201, response.data
+    assert response.data["task_id"] == task.id
+    assert response.data["visit_type"] == "task"
+    task.refresh_from_db()
+    assert task.completed
+    assert task.visit_record_id == response.data["id"]
+
+
+def test_visit_upload_links_each_task_once():
+    mr, other_mr = UserFactory.create_batch(2)
+    manager = UserFactory(role="admin")
+    doctors = [
+        Doctor.objects.create(name=f"Dr. {n}", specialization="ENT") for n in range(3)
+    ]
+    today = timezone.localdate()
+    tasks = [
+        DoctorVisitTask.objects.create(
+            assigned_to=assignee,
+            assigned_by=manager,
+            assigned_doctor=doctor,
+            due_date=today + datetime.timedelta(days=days),
+            due_time=datetime.time(10, 0),
+        )
+        for assignee, doctor, days in [
+            (mr, doctors[0], 0),
+            (mr, doctors[0], 7),  # outside the window
+            (mr, doctors[1], -1),
+            (other_mr, doctors[2], 0),  # someone else's task
+        ]
+    ]
+    now = timezone.now()
+    visits = [
+        {
+            "doctor_name": doctor.id,
+            "visited_at": (now - datetime.timedelta(minutes=n)).isoformat(),
+        }
+        for n, doctor in enumerate([doctors[0], doctors[0], doctors[1], doctors[2]])
+    ]
+    client = APIClient()
+    client.force_authenticate(mr)
+
+    response = client.post(reverse("doctor-visits-list"), visits, format="json")
+
+    assert response.status_code == 201, response.data
+    assert [visit["visit_type"] for visit in response.data] == [
+        "self",
+        "task",
+        "task",
+        "self",
+    ]
+    completed = set(
+        DoctorVisitTask.objects.filter(completed=True).values_list("id", flat=True),
+    )
+    assert completed == {tasks[0].id, tasks[2].id}
+
+
+def test_overdue_lists_pending_tasks_with_per_mr_counts(manager_client):
+    now = timezone.localtime()
+    late, busy = UserFactory.create_batch(2)
+    manager = UserFactory(role="admin")
+    doctor = Doctor.objects.create(name="Dr. Menon", specialization="ENT")
+
+    def task(mr, due, **kwargs):
+        return DoctorVisitTask.objects.create(
+            assigned_to=mr,
+            assigned_by=manager,
+            assigned_doctor=doctor,
+            due_date=due.date(),
+            due_time=due.time().replace(microsecond=0),
+            **kwargs,
+        )
+
+    oldest = task(late, now - datetime.timedelta(days=3))
+    task(late, now - datetime.timedelta(minutes=5))
+    task(late, now - datetime.timedelta(days=1), completed=True)
+    task(busy, now + datetime.timedelta(minutes=30))
+    task(busy, now + datetime.timedelta(days=1))
+
+    response = manager_client.get(reverse("doctor-tasks-overdue"))
+
+    assert response.status_code == 200
+    assert (response.data["overdue"], response.data["at_risk"]) == (2, 1)
+    assert [
+        (row["mr"], row["overdue"], row["at_risk"]) for row in response.data["per_mr"]
+    ] == [
+        (late.username, 2, 0),
+        (busy.username, 0, 1),
+    ]
+    assert response.data["per_mr"][0]["oldest_due_date"] == oldest.due_date
+    assert response.data["results"][0]["id"] == oldest.id
+
+    client = APIClient()
+    client.force_authenticate(busy)
+    own = client.get(reverse("doctor-tasks-overdue"))
+    assert (own.data["overdue"], own.data["at_risk"], own.data["results"]) == (0, 1, [])
+
+    dashboard = manager_client.get(reverse("admin-dashboard"))
+    assert dashboard.data["overdue_tasks"]["overdue"] == 2
+
+
+def test_overdue_queries_use_the_pending_index():
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    plan = (
+        overdue_tasks(DoctorVisitTask.objects.all(), timezone.now())
+        .order_by("due_date", "due_time")
+        .explain()
+    )
+    assert "tasks_pending_due_idx" in plan
+
+
+def test_route_plan_matches_brute_force(record_property):
+    rng = np.random.default_rng(7)
+    points = np.column_stack([19.0 + rng.random(8) * 0.2, 72.8 + rng.random(8) * 0.2])
+    plan = RoutePlan(
+        distance_matrix(np.vstack([(19.1, 72.9), points])),
+        np.full(8, 24 * 60.0),
+        9 * 60,
+    )
+    brute_force = min(
+        plan.cost(np.array(order) + 1) for order in itertools.permutations(range(8))
+    )
+    assert plan.cost(plan.solve() + 1) == pytest.approx(brute_force)
+
+    points = np.column_stack([19.0 + rng.random(50) * 0.3, 72.8 + rng.random(50) * 0.3])
+    due = np.sort(rng.integers(9 * 60, 20 * 60, 50)).astype(float)
+    started = time.perf_counter()
+    order, _, _, _ = plan_route(points, due, 9 * 60, origin=(19.1, 72.9))
+    record_property(
+        "route_plan_50_stops_ms",
+        round((time.perf_counter() - started) * 1000),
+    )
+    assert sorted(order) == list(range(50))
+
+
+def test_route_orders_stops_by_distance_and_due_time():
+    mr = UserFactory()
+    manager = UserFactory(role="admin")
+    day = timezone.localdate() + datetime.timedelta(days=1)
+    # Clinics along one road, 1-2 km apart, listed out of order.
+    far, near, middle = [
+        Doctor.objects.create(
+            name=f"Dr. {n}",
+            specialization="ENT",
+            latitude=19.0 + n / 100,
+            longitude=72.8,
+        )
+        for n in (3, 1, 2)
+    ]
+    by_gps = Doctor.objects.create(name="Dr. GPS", specialization="ENT")
+    DoctorVisit.objects.create(mr=mr, doctor_name=by_gps, gps_lat=19.04, gps_long=72.8)
+    unknown = Doctor.objects.create(name="Dr. Nowhere", specialization="ENT")
+
+    def task(doctor, due_time):
+        return DoctorVisitTask.objects.create(
+            assigned_to=mr,
+            assigned_by=manager,
+            assigned_doctor=doctor,
+            due_date=day,
+            due_time=due_time,
+        )
+
+    for doctor in (far, middle, by_gps, unknown):
+        task(doctor, datetime.time(17, 0))
+    # Due first thing in the morning, so visited first despite the detour.
+    urgent = task(near, datetime.time(9, 15))
+    client = APIClient()
+    client.force_authenticate(mr)
+
+    response = client.get(
+        reverse("doctor-tasks-route"),
+        {"date": day.isoformat(), "lat": 19.05, "long": 72.8},
+    )
+
+    assert response.status_code == 200, response.data
+    assert [stop["task"]["assigned_doctor"] for stop in response.data["stops"]] == [
+        near.id,
+        middle.id,
+        far.id,
+        by_gps.id,
+    ]
+    assert response.data["stops"][0]["task"]["id"] == urgent.id
+    assert response.data["late_minutes"] == 0
+    assert [entry["assigned_doctor"] for entry in response.data["unrouted"]] == [
+        unknown.id,
+    ]
+
+    missing_mr = APIClient()
+    missing_mr.force_authenticate(manager)
+    assert (
+        missing_mr.get(
+            reverse("doctor-tasks-route"),
+            {"date": day.isoformat()},
+        ).status_code
+        == 400
+    )
+
+
+TASK_FILTER_COLUMNS = {
+    "status": "completed",
+    "mr": "assigned_to_id",
+    "doctor": "assigned_doctor_id",
+    "start_date": "due_date",
+    "end_date": "due_date",
+}
+
+
+def test_task_list_filters_are_index_backed():
+    _, mr = seed_workload(mrs=20, doctors=100, visits=20000, days=90)
+    today = timezone.localdate()
+    values = {
+        "status": "pending",
+        "mr": mr.id,
+        "doctor": Doctor.objects.order_by("id").first().id,
+        "start_date": today - datetime.timedelta(days=7),
+        "end_date": today + datetime.timedelta(days=7),
+    }
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    problems = {}
+    names = ["status", "mr", "doctor", "start_date", "end_date"]
+    # Without any filter the (unpaginated) list reads the whole table, which
+    # a sequential scan and a sort do best; every filter must use an index.
+    for combination in [
+        c
+        for size in range(1, len(names) + 1)
+        for c in itertools.combinations(names, size)
+    ]:
+        for ordering in TaskFilterSerializer.ORDERINGS:
+            data = {
+                **{name: values[name] for name in combination},
+                "ordering": ordering,
+            }
+            columns = {TASK_FILTER_COLUMNS[name] for name in combination}
+            if scans := unindexed_scans(
+                filter_tasks(DoctorVisitTask.objects.all(), data),
+                columns,
+            ):
+                problems[(combination, ordering)] = scans
+    assert problems == {}
+
+
+def test_task_list_filters_and_orders(manager_client):
+    mr = UserFactory()
+    doctors = [
+        Doctor.objects.create(name=f"Dr. {n}", specialization="ENT") for n in range(2)
+    ]
+    manager = UserFactory(role="admin")
+    tasks = [
+        DoctorVisitTask.objects.create(
+            assigned_to=mr,
+            assigned_by=manager,
+            assigned_doctor=doctors[n % 2],
+            due_date=datetime.date(2026, 11, 1 + n),
+            due_time=datetime.time(10, 0),
+            completed=n == 3,
+        )
+        for n in range(4)
+    ]
+    url = reverse("doctor-tasks-list")
+
+    pending = manager_client.get(
+        url,
+        {"status": "pending", "ordering": "due_date", "start_date": "2026-11-02"},
+    )
+    by_doctor = manager_client.get(url, {"doctor": doctors[1].id, "mr": mr.id})
+    bad_ordering = manager_client.get(url, {"ordering": "notes"})
+    bad_range = manager_client.get(
+        url,
+        {"start_date": "2026-11-05", "end_date": "2026-11-01"},
+    )
+
+    assert [task["id"] for task in pending.data] == [tasks[1].id, tasks[2].id]
+    assert [task["id"] for task in by_doctor.data] == [tasks[3].id, tasks[1].id]
+    assert bad_ordering.status_code == bad_range.status_code == 400
+    assert "ordering" in bad_ordering.data
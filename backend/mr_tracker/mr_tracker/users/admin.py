@@ -24,6 +24,7 @@ class UserAdmin(DjangoUserAdmin):
         "email",
         "name",
         "role",
+        "manager",
         "is_active",
         "is_staff",
         "last_login",
@@ -31,6 +32,7 @@ class UserAdmin(DjangoUserAdmin):
 
     list_filter = (
         "role",
+        "company_wide",
         "is_staff",
         "is_superuser",
         "is_active",
@@ -44,12 +46,14 @@ class UserAdmin(DjangoUserAdmin):
     )
 
     ordering = ("username",)
+    list_select_related = ("manager",)
+    autocomplete_fields = ("manager",)
 
     fieldsets = (
         (_("Credentials"), {"fields": ("username", "password")}),
         (
             _("Personal info"),
-            {"fields": ("name", "email", "role")},
+            {"fields": ("name", "email", "role", "manager", "company_wide")},
         ),
         (
             _("Permissions"),
@@ -75,6 +79,8 @@ class UserAdmin(DjangoUserAdmin):
                     "username",
                     "name",
                     "role",
+                    "manager",
+                    "company_wide",
                     "email",
                     "password1",
                     "password2",
@@ -85,4 +91,11 @@ class UserAdmin(DjangoUserAdmin):
         ),
     )
 
-    readonly_fields = ("last_login", "date_joined")
\ No newline at end of file
+    readonly_fields = ("last_login", "date_joined")
+
+    actions = ["revoke_tokens"]
+
+    @admin.action(description=_("Sign out of the API everywhere"))
+    def revoke_tokens(self, request, queryset):
+        for user in queryset:
+            user.revoke_tokens()
@@ -1,5 +1,9 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
 
+from mr_tracker.users.authentication import CachedJWTAuthentication
+from mr_tracker.users.authentication import VersionedRefreshToken
+from mr_tracker.users.hierarchy import reports_to
 from mr_tracker.users.models import User
 
 
@@ -12,12 +16,39 @@ class UserSerializer(serializers.ModelSerializer[User]):
             "email",
             "name",
             "role",
+            "manager",
         ]
-       
+
+    def validate_manager(self, manager):
+        if self.instance is None or manager is None:
+            return manager
+        if reports_to(manager, self.instance):
+            msg = "A user cannot report to one of their own reports."
+            raise serializers.ValidationError(msg)
+        return manager
+
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
 
 class LogoutSerializer(serializers.Serializer):
     refresh = serializers.CharField()
-    
+
+
+class RefreshSerializer(TokenRefreshSerializer):
+    """
+    Issue an access token for a refresh token.
+
+    The blacklist check goes through the Bloom filter and the user comes
+    from the authentication cache, so a steady-state refresh runs no query.
+    Refresh tokens are not rotated (``ROTATE_REFRESH_TOKENS`` is off).
+    """
+
+    token_class = VersionedRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        # Rejects inactive users and tokens revoked by a version bump.
+        CachedJWTAuthentication().get_user(refresh)
+        return {"access": str(refresh.access_token)}
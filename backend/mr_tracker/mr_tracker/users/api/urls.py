@@ -3,6 +3,7 @@ from users.api.views import (
     MRLoginView,
     AdminLoginView,
     LogoutView,
+    RefreshView,
     MRListView,
 )
 
@@ -12,6 +13,7 @@ app_name = "users_api"
 urlpatterns = [
     path("mr-login/", MRLoginView.as_view(), name="mr_login"),
     path("admin-login/", AdminLoginView.as_view(), name="admin_login"),
+    path("refresh/", RefreshView.as_view(), name="refresh"),
     path("logout/", LogoutView.as_view(), name="logout"),
     path("mrs/", MRListView.as_view(), name="mr_list"),
 ]
@@ -6,8 +6,13 @@ from rest_framework.mixins import UpdateModelMixin
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 from rest_framework.views import APIView
+from config.transactions import ReadPolicyMixin
 from mr_tracker.users.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
+from mr_tracker.users.authentication import VersionedRefreshToken
+from mr_tracker.users.hierarchy import scope_to
+from mr_tracker.users.passwords import hashing_slot
 from django.contrib.auth import authenticate
 from drf_spectacular.utils import extend_schema
 from rest_framework.permissions import IsAuthenticated
@@ -16,7 +21,10 @@ from rest_framework.permissions import AllowAny
 
 
 
-from .serializers import UserSerializer, LoginSerializer, LogoutSerializer
+from .serializers import LoginSerializer
+from .serializers import LogoutSerializer
+from .serializers import RefreshSerializer
+from .serializers import UserSerializer
 
 
 class UserViewSet(RetrieveModelMixin, ListModelMixin, UpdateModelMixin, GenericViewSet):
@@ -39,9 +47,12 @@ class MRLoginView(APIView):
 
     @extend_schema(
         request=LoginSerializer,
-        responses={200: UserSerializer,
-                   401: "Invalid credentials", 
-                   403: "User is not a Medical Representative"},
+        responses={
+            200: UserSerializer,
+            401: "Invalid credentials",
+            403: "User is not a Medical Representative",
+            503: "Too many logins in progress",
+        },
     )
     
     def post(self, request):
@@ -51,7 +62,8 @@ class MRLoginView(APIView):
         username = serializer.validated_data["username"]
         password = serializer.validated_data["password"]
 
-        user = authenticate(request, username=username, password=password)
+        with hashing_slot():
+            user = authenticate(request, username=username, password=password)
 
         if user is None:
             return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
@@ -59,7 +71,7 @@ class MRLoginView(APIView):
         if user.role != "MR":
             return Response({"detail": "User is not a Medical Representative"}, status=status.HTTP_403_FORBIDDEN)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = VersionedRefreshToken.for_user(user)
 
         return Response(
             {
@@ -77,9 +89,13 @@ class AdminLoginView(APIView):
 
     @extend_schema(
         request=LoginSerializer,
-        responses={200: UserSerializer,
-                   401: "Invalid credentials", 
-                   403: "User is not an Admin"},  )
+        responses={
+            200: UserSerializer,
+            401: "Invalid credentials",
+            403: "User is not an Admin",
+            503: "Too many logins in progress",
+        },
+    )
 
     def post(self,request):
         serializer = LoginSerializer(data=request.data)
@@ -88,7 +104,8 @@ class AdminLoginView(APIView):
         username = serializer.validated_data["username"]
         password = serializer.validated_data["password"]
 
-        user = authenticate(request, username=username, password=password)
+        with hashing_slot():
+            user = authenticate(request, username=username, password=password)
 
         if user is None:
             return Response({"detail": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
@@ -96,7 +113,7 @@ class AdminLoginView(APIView):
         if user.role != "admin":
             return Response({"detail": "User is not an Admin"}, status=status.HTTP_403_FORBIDDEN)
 
-        refresh = RefreshToken.for_user(user)
+        refresh = VersionedRefreshToken.for_user(user)
 
         return Response(
             {
@@ -108,6 +125,10 @@ class AdminLoginView(APIView):
         )
     
         
+class RefreshView(TokenRefreshView):
+    serializer_class = RefreshSerializer
+
+
 class LogoutView(APIView):
     
     @extend_schema(
@@ -126,12 +147,13 @@ class LogoutView(APIView):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class MRListView(APIView):
+class MRListView(ReadPolicyMixin, APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         if request.user.role != "admin":
             raise PermissionDenied("Only admins can list MRs.")
 
-        mrs = User.objects.filter(role="MR").values("id", "username", "name")
+        mrs = scope_to(User.objects.filter(role="MR"), request.user, "pk")
+        mrs = mrs.values("id", "username", "name")
         return Response(list(mrs), status=status.HTTP_200_OK)
\ No newline at end of file
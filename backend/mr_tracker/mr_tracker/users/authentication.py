@@ -0,0 +1,83 @@
+"""
+JWT authentication that resolves the user from the cache.
+
+Every API request used to load its ``User`` row. ``CachedJWTAuthentication``
+keeps the user in the default cache for ``JWT_USER_CACHE_TTL`` seconds,
+keyed by user id and token version, so steady-state traffic costs no auth
+queries. Saving or deleting a user drops the cached copy once the
+transaction commits, so role changes and deactivation apply on the next
+request. ``QuerySet.update()`` sends no signals and leaves the copy in
+place until the TTL expires.
+
+Tokens carry the user's ``token_version``. ``User.revoke_tokens()`` bumps
+it, which rejects every token issued before.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from mr_tracker.users.blacklist import might_be_blacklisted
+
+TOKEN_VERSION_CLAIM = "ver"
+
+
+def user_cache_key(user_id, version) -> str:
+    return f"jwt-user:{user_id}:{version}"
+
+
+def forget_user(user) -> None:
+    """Drop the cached copies of ``user`` after the current transaction commits."""
+    # revoke_tokens() bumps the version by one, so drop the previous key too.
+    keys = [
+        user_cache_key(user.pk, user.token_version),
+        user_cache_key(user.pk, user.token_version - 1),
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class VersionedRefreshToken(RefreshToken):
+    """A refresh token (and its access tokens) stamped with the user's token version."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token[TOKEN_VERSION_CLAIM] = user.token_version
+        return token
+
+    def check_blacklist(self):
+        # The Bloom filter answers "not blacklisted" without a query.
+        if might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification"),
+            ) from exc
+        version = validated_token.get(TOKEN_VERSION_CLAIM, 0)
+
+        key = user_cache_key(user_id, version)
+        user = cache.get(key)
+        if user is None:
+            # Raises for unknown and inactive users.
+            user = super().get_user(validated_token)
+            if user.token_version == version:
+                cache.set(key, user, settings.JWT_USER_CACHE_TTL)
+
+        if user.token_version != version:
+            raise AuthenticationFailed(
+                _("Token has been revoked."),
+                code="token_revoked",
+            )
+        return user
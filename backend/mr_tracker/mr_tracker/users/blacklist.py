@@ -0,0 +1,186 @@
+"""
+A Bloom filter in front of the refresh token blacklist.
+
+Every refresh used to look its token up in ``BlacklistedToken``. Now the
+token's ``jti`` is first checked against a Bloom filter of the blacklisted
+tokens that have not expired yet. A filter never misses a token it holds,
+so a "no" skips the database; a "maybe" (any blacklisted token, plus about
+1% of the others) falls back to the table.
+
+With the Redis cache the filter is a shared Redis bitmap, so a logout in
+one process is seen by all of them. With any other cache it lives in
+process memory, which is only correct for a single process, as in local
+development and tests. Bit 0 marks a filter as built: a missing or evicted
+bitmap reads as unbuilt and is rebuilt from the table, and until then every
+check goes to the table. One request builds it, under a ``SET NX`` lock;
+the others keep checking the table meanwhile instead of each scanning it.
+Blacklisting adds to the filter as the row is saved; if that fails the save
+fails too, so the filter never misses a token. ``prune_token_blacklist``
+rebuilds it to shed expired tokens.
+"""
+
+import datetime
+import functools
+import hashlib
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+logger = logging.getLogger(__name__)
+
+HASHES = 7
+# Tokens blacklisted this long before a rebuild started are re-added after
+# it, in case their transaction committed after the rebuild read the table.
+REBUILD_OVERLAP = datetime.timedelta(minutes=1)
+BUILD_CHUNK = 1000
+# Longest a build may take before another request may start one.
+BUILD_LOCK_SECONDS = 300
+
+
+def _positions(jti: str, bits: int) -> list[int]:
+    # Double hashing over one digest; bit 0 is reserved for the built flag.
+    digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "big")
+    step = int.from_bytes(digest[8:], "big") | 1
+    return [1 + (first + i * step) % (bits - 1) for i in range(HASHES)]
+
+
+def _live_jtis(since=None):
+    rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+    if since is not None:
+        rows = rows.filter(blacklisted_at__gte=since)
+    return rows.values_list("token__jti", flat=True).iterator(chunk_size=BUILD_CHUNK)
+
+
+class LocalFilter:
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.array = None
+
+    def _set(self, array, jtis):
+        for jti in jtis:
+            for position in _positions(jti, self.bits):
+                array[position >> 3] |= 1 << (position & 7)
+
+    def add(self, jti: str) -> None:
+        if self.array is not None:
+            self._set(self.array, [jti])
+
+    def might_contain(self, jti: str) -> bool:
+        if self.array is None:
+            self.rebuild()
+        return all(
+            self.array[position >> 3] & (1 << (position & 7))
+            for position in _positions(jti, self.bits)
+        )
+
+    def rebuild(self) -> None:
+        array = bytearray((self.bits + 7) // 8)
+        self._set(array, _live_jtis())
+        self.array = array
+
+
+class RedisFilter:
+    key = "jwt-blacklist-filter"
+
+    def __init__(self, bits: int):
+        from django_redis import get_redis_connection
+
+        self.bits = bits
+        self.redis = get_redis_connection("default")
+
+    def _set(self, key, jtis):
+        pipe = self.redis.pipeline(transaction=False)
+        for count, jti in enumerate(jtis, start=1):
+            for position in _positions(jti, self.bits):
+                pipe.setbit(key, position, 1)
+            if count % BUILD_CHUNK == 0:
+                pipe.execute()
+        pipe.execute()
+
+    def add(self, jti: str) -> None:
+        self._set(self.key, [jti])
+
+    def might_contain(self, jti: str) -> bool:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.getbit(self.key, 0)
+        for position in _positions(jti, self.bits):
+            pipe.getbit(self.key, position)
+        built, *found = pipe.execute()
+        if not built:
+            if self.redis.set(
+                f"{self.key}:building",
+                1,
+                nx=True,
+                ex=BUILD_LOCK_SECONDS,
+            ):
+                try:
+                    self.build()
+                finally:
+                    self.redis.delete(f"{self.key}:building")
+            return True
+        return all(found)
+
+    def _fill(self):
+        started = timezone.now()
+        key = f"{self.key}:build:{uuid.uuid4().hex}"
+        self._set(key, _live_jtis())
+        self.redis.setbit(key, 0, 1)
+        return key, started
+
+    def build(self) -> None:
+        """Fill an unbuilt filter, keeping bits added while it was unbuilt."""
+        key, _ = self._fill()
+        self.redis.bitop("OR", self.key, self.key, key)
+        self.redis.delete(key)
+
+    def rebuild(self) -> None:
+        """Replace the filter, dropping the bits of expired and pruned tokens."""
+        key, started = self._fill()
+        self.redis.rename(key, self.key)
+        self._set(self.key, _live_jtis(since=started - REBUILD_OVERLAP))
+
+
+@functools.cache
+def get_filter():
+    bits = settings.JWT_BLACKLIST_FILTER_BITS
+    if settings.CACHES["default"]["BACKEND"] == "django_redis.cache.RedisCache":
+        return RedisFilter(bits)
+    return LocalFilter(bits)
+
+
+def might_be_blacklisted(jti: str) -> bool:
+    """False only if the token with ``jti`` is certainly not blacklisted."""
+    try:
+        return get_filter().might_contain(jti)
+    except Exception:
+        logger.exception("Blacklist filter unavailable, checking the table")
+        return True
+
+
+def prune(*, now: datetime.datetime, batch_size: int = 1000) -> int:
+    """
+    Delete expired outstanding and blacklisted tokens, ``batch_size`` at a time.
+
+    Expired tokens are rejected before the blacklist is consulted, so their
+    rows serve no purpose. Each batch is its own short transaction. Returns
+    the number of outstanding tokens deleted.
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size],
+            )
+            if not batch:
+                return deleted
+            BlacklistedToken.objects.filter(token__in=batch).delete()
+            OutstandingToken.objects.filter(pk__in=batch).delete()
+        deleted += len(batch)
@@ -0,0 +1,100 @@
+"""
+The reporting hierarchy of managers and MRs.
+
+Regional managers, area managers and MRs form a tree through
+``User.manager``, mirrored in the ``ReportingLine`` closure table. An admin
+sees their own subtree, wherever they are in the tree; only admins marked
+``company_wide`` see the whole company. ``scope_to`` applies that rule to
+any queryset with a user column as one semi-join on the closure table's
+``(ancestor, descendant)`` index, however deep the tree is.
+"""
+
+from django.db import transaction
+
+from mr_tracker.users.models import ReportingLine
+from mr_tracker.users.models import User
+
+
+def subtree(user):
+    """Ids of ``user`` and everyone reporting to them, directly or not."""
+    return ReportingLine.objects.filter(ancestor=user).values("descendant")
+
+
+def reports_to(user, manager) -> bool:
+    """Whether ``user`` is ``manager`` or in their subtree."""
+    return ReportingLine.objects.filter(ancestor=manager, descendant=user).exists()
+
+
+def is_company_wide(user) -> bool:
+    return user.role == "admin" and user.company_wide
+
+
+def scope_to(queryset, user, field: str = "mr"):
+    """``queryset`` limited to rows whose ``field`` is ``user`` or in their subtree."""
+    if is_company_wide(user):
+        return queryset
+    if user.role == "MR":
+        return queryset.filter(**{field: user})
+    return queryset.filter(**{f"{field}__in": subtree(user)})
+
+
+def attach(user) -> None:
+    """Add the closure rows of a newly created ``user``."""
+    lines = [ReportingLine(ancestor_id=user.pk, descendant_id=user.pk, depth=0)]
+    if user.manager_id is not None:
+        above = ReportingLine.objects.filter(descendant=user.manager_id).values_list(
+            "ancestor_id",
+            "depth",
+        )
+        lines += [
+            ReportingLine(ancestor_id=ancestor, descendant_id=user.pk, depth=depth + 1)
+            for ancestor, depth in above
+        ]
+    ReportingLine.objects.bulk_create(lines)
+
+
+def move(user) -> None:
+    """Re-link ``user``'s subtree under their current manager."""
+    with transaction.atomic():
+        members = ReportingLine.objects.filter(ancestor=user)
+        below = list(members.values_list("descendant_id", "depth"))
+        ReportingLine.objects.filter(
+            descendant__in=members.values("descendant"),
+        ).exclude(
+            ancestor__in=members.values("descendant"),
+        ).delete()
+        if user.manager_id is None:
+            return
+        above = ReportingLine.objects.filter(descendant=user.manager_id).values_list(
+            "ancestor_id",
+            "depth",
+        )
+        ReportingLine.objects.bulk_create(
+            ReportingLine(
+                ancestor_id=ancestor,
+                descendant_id=descendant,
+                depth=up + down + 1,
+            )
+            for ancestor, up in above
+            for descendant, down in below
+        )
+
+
+def rebuild() -> int:
+    """Recreate every closure row from ``User.manager``; returns the row count."""
+    managers = dict(User.objects.values_list("pk", "manager_id"))
+    lines = []
+    for pk in managers:
+        ancestor, depth = pk, 0
+        while ancestor is not None:
+            if depth > len(managers):
+                msg = f"User {pk} is in a reporting cycle"
+                raise ValueError(msg)
+            lines.append(
+                ReportingLine(ancestor_id=ancestor, descendant_id=pk, depth=depth),
+            )
+            ancestor, depth = managers[ancestor], depth + 1
+    with transaction.atomic():
+        ReportingLine.objects.all().delete()
+        ReportingLine.objects.bulk_create(lines, batch_size=5000)
+    return len(lines)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from mr_tracker.users.blacklist import get_filter
+from mr_tracker.users.blacklist import prune
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired JWT outstanding and blacklisted tokens in batches, then "
+        "rebuild the blacklist filter without them. Run daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Tokens deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune(now=timezone.now(), batch_size=options["batch_size"])
+        get_filter().rebuild()
+        self.stdout.write(f"Pruned {deleted} expired tokens")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from mr_tracker.users.hierarchy import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recreate the reporting hierarchy closure table from each user's manager. "
+        "Run after bulk user changes that bypass model signals."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Wrote {rebuild()} reporting lines")
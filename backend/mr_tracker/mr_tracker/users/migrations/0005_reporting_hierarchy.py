@@ -0,0 +1,38 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_token_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='manager',
+            field=models.ForeignKey(blank=True, limit_choices_to={'role': 'admin'}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='reports', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='ReportingLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('descendant', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reporting_lines', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='users_repor_descend_dc12f6_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='unique_reporting_line')],
+            },
+        ),
+        # Existing users have no manager yet: each is only its own line.
+        migrations.RunSQL(
+            "INSERT INTO users_reportingline (ancestor_id, descendant_id, depth) SELECT id, id, 0 FROM users_user",
+            migrations.RunSQL.noop,
+        ),
+    ]
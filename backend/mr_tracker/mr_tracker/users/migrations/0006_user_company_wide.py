@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def keep_flat_admins_company_wide(apps, schema_editor):
+    # Admins outside the hierarchy kept seeing the whole company before the
+    # flag existed; the roots of a reporting tree now see their subtree.
+    User = apps.get_model("users", "User")
+    User.objects.filter(role="admin", manager__isnull=True, reports__isnull=True).update(company_wide=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_reporting_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='company_wide',
+            field=models.BooleanField(default=False, help_text='Admins only: see every MR, not just the ones reporting to them.', verbose_name='Company-wide access'),
+        ),
+        migrations.RunPython(keep_flat_admins_company_wide, migrations.RunPython.noop),
+    ]
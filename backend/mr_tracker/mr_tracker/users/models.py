@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.db.models import CharField
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
@@ -14,9 +15,94 @@ class User(AbstractUser):
 
     name = CharField(_("Name of User"), blank=True, max_length=255)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="MR")
+    # Reporting line: MRs report to area managers, area managers to regional
+    # managers (both "admin"). Admins see their own subtree unless they are
+    # company_wide.
+    manager = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="reports",
+        limit_choices_to={"role": "admin"},
+    )
+    company_wide = models.BooleanField(
+        _("Company-wide access"),
+        default=False,
+        help_text=_("Admins only: see every MR, not just the ones reporting to them."),
+    )
+    # Stamped into issued JWTs; bumping it revokes them all.
+    token_version = models.PositiveIntegerField(default=0, editable=False)
     first_name = None  # type: ignore[assignment]
     last_name = None  # type: ignore[assignment]
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=["role"]),
+        ]
+
+    def clean(self):
+        super().clean()
+        if self.manager_id is None:
+            return
+        if self.manager.role != "admin":
+            raise ValidationError({"manager": _("Only admins can have reports.")})
+        if (
+            self.pk is not None
+            and ReportingLine.objects.filter(
+                ancestor=self.pk,
+                descendant=self.manager_id,
+            ).exists()
+        ):
+            raise ValidationError(
+                {"manager": _("A user cannot report to one of their own reports.")},
+            )
+
+    def revoke_tokens(self) -> None:
+        """Reject every JWT issued to this user so far."""
+        self.token_version += 1
+        self.save(update_fields=["token_version"])
+
     def get_absolute_url(self) -> str:
 
         return reverse("users:detail", kwargs={"username": self.username})
+
+
+class ReportingLine(models.Model):
+    """
+    Closure table of ``User.manager``.
+
+    One row for every manager and everyone below them, at any distance, plus
+    a depth 0 row for each user, so "everyone in my subtree" is one indexed
+    lookup on ``ancestor``. Kept up to date by the ``User`` signals; run
+    ``rebuild_reporting_lines`` after bulk changes that bypass them.
+    """
+
+    # Indexed by the constraint and index below instead of one index each.
+    ancestor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        db_index=False,
+    )
+    descendant = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="reporting_lines",
+        db_index=False,
+    )
+    depth = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["ancestor", "descendant"],
+                name="unique_reporting_line",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["descendant", "depth"]),
+        ]
+
+    def __str__(self):
+        return f"{self.descendant_id} under {self.ancestor_id} ({self.depth})"
@@ -0,0 +1,112 @@
+"""
+Password hashing cost controls for the login endpoints.
+
+``Argon2PasswordHasher`` takes its cost parameters from the ``ARGON2_*``
+settings. Django rehashes a password whose stored parameters differ from
+the current ones when it is next checked, so a cost change reaches every
+user as they log in.
+
+Each Argon2 check takes a core for a quarter of a second or more, so at
+shift start logins can take every worker. ``hashing_slot`` caps the hashes
+running at once on a host at ``PASSWORD_HASH_CONCURRENCY``. A login waits
+up to ``PASSWORD_HASH_QUEUE_TIMEOUT`` seconds for a slot and then gets a
+503 with ``Retry-After``, leaving the other workers to other endpoints.
+Slots are cache keys that expire after ``SLOT_TTL``, so a worker that dies
+holding one does not leak it. While the cache cannot answer (the Redis
+cache ignores its errors and returns None), each process caps its own
+hashes with a semaphore instead, so logins keep working through an outage.
+"""
+
+import contextlib
+import functools
+import logging
+import random
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+SLOT_TTL = 30
+POLL_INTERVAL = 0.05
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.ARGON2_PARALLELISM
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Too many logins in progress, try again shortly.")
+    default_code = "login_busy"
+    # Sent as Retry-After.
+    wait = 1
+
+
+def _slot_keys():
+    host = socket.gethostname()
+    return [
+        f"password-hash-slot:{host}:{slot}"
+        for slot in range(settings.PASSWORD_HASH_CONCURRENCY)
+    ]
+
+
+@functools.cache
+def _local_slots(size):
+    return threading.BoundedSemaphore(size)
+
+
+def _cache_slot(keys, deadline):
+    """The slot key taken, or None if the cache cannot answer."""
+    while True:
+        random.shuffle(keys)
+        for key in keys:
+            try:
+                added = cache.add(key, 1, SLOT_TTL)
+            except Exception:  # noqa: BLE001
+                added = None
+            if added is None:
+                return None
+            if added:
+                return key
+        if time.monotonic() >= deadline:
+            raise HashingBusy
+        time.sleep(POLL_INTERVAL)
+
+
+@contextlib.contextmanager
+def hashing_slot():
+    """Hold one of the host's password hashing slots; raises ``HashingBusy``."""
+    deadline = time.monotonic() + settings.PASSWORD_HASH_QUEUE_TIMEOUT
+    held = _cache_slot(_slot_keys(), deadline)
+    if held is None:
+        logger.warning("Cache unavailable, limiting password hashing per process")
+        slots = _local_slots(settings.PASSWORD_HASH_CONCURRENCY)
+        if not slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise HashingBusy
+        try:
+            yield
+        finally:
+            slots.release()
+        return
+    try:
+        yield
+    finally:
+        cache.delete(held)
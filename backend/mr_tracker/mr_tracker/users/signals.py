@@ -0,0 +1,52 @@
+from django.db import IntegrityError
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from mr_tracker.users import hierarchy
+from mr_tracker.users.authentication import forget_user
+from mr_tracker.users.blacklist import get_filter
+from mr_tracker.users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance)
+
+
+@receiver(pre_save, sender=User)
+def check_manager_change(sender, instance, update_fields=None, **kwargs):
+    instance._previous_manager_id = instance.manager_id  # noqa: SLF001
+    if instance.pk is None or (
+        update_fields is not None and "manager" not in update_fields
+    ):
+        return
+    previous = (
+        User.objects.filter(pk=instance.pk).values_list("manager_id", flat=True).first()
+    )
+    instance._previous_manager_id = previous  # noqa: SLF001
+    # User.clean() and the serializers reject cycles with a field error; this
+    # only keeps a save that skipped them from corrupting the closure table.
+    if instance.manager_id not in (None, previous) and hierarchy.reports_to(
+        instance.manager_id,
+        instance.pk,
+    ):
+        msg = f"User {instance.pk} would report to one of their own reports"
+        raise IntegrityError(msg)
+
+
+@receiver(post_save, sender=User)
+def update_reporting_lines(sender, instance, created, **kwargs):
+    if created:
+        hierarchy.attach(instance)
+    elif instance.manager_id != instance._previous_manager_id:  # noqa: SLF001
+        hierarchy.move(instance)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        get_filter().add(instance.token.jti)
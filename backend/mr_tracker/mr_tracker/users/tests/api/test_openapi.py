@@ -1,6 +1,7 @@
 from http import HTTPStatus
 
 import pytest
+from django.core.management import call_command
 from django.urls import reverse
 
 
@@ -21,3 +22,41 @@ def test_api_schema_generated_successfully(admin_client):
     url = reverse("api-schema")
     response = admin_client.get(url)
     assert response.status_code == HTTPStatus.OK
+
+
+@pytest.fixture
+def schema_file(settings, tmp_path):
+    path = tmp_path / "openapi.json"
+    call_command("spectacular", "--format", "openapi-json", "--file", str(path))
+    settings.OPENAPI_SCHEMA_FILE = path
+    return path
+
+
+@pytest.mark.parametrize("accept", ["application/vnd.oai.openapi", "application/json"])
+def test_precomputed_schema_matches_live_generation(
+    admin_client,
+    settings,
+    schema_file,
+    accept,
+):
+    url = reverse("api-schema")
+    served = admin_client.get(url, HTTP_ACCEPT=accept)
+    settings.OPENAPI_SCHEMA_FILE = None
+    live = admin_client.get(url, HTTP_ACCEPT=accept)
+
+    assert served.status_code == live.status_code == HTTPStatus.OK
+    assert served["Content-Type"] == live["Content-Type"]
+    assert served.content == live.content
+
+
+def test_precomputed_schema_is_revalidated_by_etag(admin_client, schema_file):
+    url = reverse("api-schema")
+    yaml = admin_client.get(url)
+    json = admin_client.get(url, HTTP_ACCEPT="application/json")
+    assert yaml["ETag"] != json["ETag"]
+
+    again = admin_client.get(url, HTTP_IF_NONE_MATCH=yaml["ETag"])
+    assert again.status_code == HTTPStatus.NOT_MODIFIED
+    assert not again.content
+    changed = admin_client.get(url, HTTP_IF_NONE_MATCH=json["ETag"])
+    assert changed.status_code == HTTPStatus.OK
@@ -0,0 +1,94 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from mr_tracker.users.authentication import VersionedRefreshToken
+from mr_tracker.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+MR_LIST = "api:users_api:mr_list"
+# SessionAuthentication comes first and sends no WWW-Authenticate header, so
+# DRF reports authentication failures as 403; the error code tells them apart.
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+
+
+def jwt_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=(
+            f"Bearer {VersionedRefreshToken.for_user(user).access_token}"
+        ),
+    )
+    return client
+
+
+def user_queries(queries):
+    return [query["sql"] for query in queries if '"users_user"' in query["sql"]]
+
+
+def test_login_token_carries_version(client):
+    user = UserFactory(role="MR", password="secret-pass-1")
+    user.revoke_tokens()
+    response = client.post(
+        reverse("api:users_api:mr_login"),
+        {"username": user.username, "password": "secret-pass-1"},
+    )
+    assert response.status_code == 200
+    assert VersionedRefreshToken(response.json()["refresh"])["ver"] == 1
+
+
+def test_cached_user_skips_database():
+    client = jwt_client(UserFactory(role="admin"))
+    assert client.get(reverse(MR_LIST)).status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get(reverse(MR_LIST)).status_code == 200
+    # Only the MR list itself reads the users table.
+    assert len(user_queries(queries.captured_queries)) == 1
+
+
+def test_role_change_applies_on_next_request(django_capture_on_commit_callbacks):
+    admin = UserFactory(role="admin")
+    client = jwt_client(admin)
+    assert client.get(reverse(MR_LIST)).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin.role = "MR"
+        admin.save()
+    response = client.get(reverse(MR_LIST))
+    assert response.status_code == 403
+    assert "code" not in response.json()
+
+
+def test_deactivated_user_is_rejected(django_capture_on_commit_callbacks):
+    admin = UserFactory(role="admin")
+    client = jwt_client(admin)
+    assert client.get(reverse(MR_LIST)).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin.is_active = False
+        admin.save()
+    response = client.get(reverse(MR_LIST))
+    assert response.status_code == 403
+    assert response.json()["code"] == "user_inactive"
+
+
+def test_revoked_tokens_are_rejected(django_capture_on_commit_callbacks):
+    admin = UserFactory(role="admin")
+    old = jwt_client(admin)
+    assert old.get(reverse(MR_LIST)).status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        admin.revoke_tokens()
+    response = old.get(reverse(MR_LIST))
+    assert response.status_code == 403
+    assert response.json()["code"] == "token_revoked"
+    assert jwt_client(admin).get(reverse(MR_LIST)).status_code == 200
@@ -0,0 +1,211 @@
+import datetime
+
+import fakeredis
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from mr_tracker.users.authentication import VersionedRefreshToken
+from mr_tracker.users.blacklist import LocalFilter
+from mr_tracker.users.blacklist import RedisFilter
+from mr_tracker.users.blacklist import get_filter
+from mr_tracker.users.blacklist import prune
+from mr_tracker.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+REFRESH = "api:users_api:refresh"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_filter():
+    get_filter.cache_clear()
+    yield
+    get_filter.cache_clear()
+
+
+def refresh(token):
+    return APIClient().post(reverse(REFRESH), {"refresh": str(token)})
+
+
+def token_queries(queries):
+    return [
+        query["sql"]
+        for query in queries
+        if "token_blacklist" in query["sql"] or '"users_user"' in query["sql"]
+    ]
+
+
+def test_refresh_issues_versioned_access_token():
+    user = UserFactory(role="MR")
+    response = refresh(VersionedRefreshToken.for_user(user))
+    assert response.status_code == 200
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+    assert client.get(reverse("api:users_api:mr_list")).status_code == 403
+
+
+def test_steady_state_refresh_skips_database():
+    user = UserFactory(role="MR")
+    token = VersionedRefreshToken.for_user(user)
+    assert refresh(token).status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        assert refresh(token).status_code == 200
+    assert token_queries(queries.captured_queries) == []
+
+
+def test_logged_out_token_cannot_refresh():
+    user = UserFactory(role="MR")
+    token = VersionedRefreshToken.for_user(user)
+    assert refresh(token).status_code == 200
+
+    client = APIClient()
+    client.force_authenticate(user)
+    assert (
+        client.post(
+            reverse("api:users_api:logout"),
+            {"refresh": str(token)},
+        ).status_code
+        == 205
+    )
+    response = refresh(token)
+    assert response.status_code == 401
+    assert response.json()["code"] == "token_not_valid"
+
+
+def test_revoked_token_cannot_refresh():
+    user = UserFactory(role="MR")
+    token = VersionedRefreshToken.for_user(user)
+    user.revoke_tokens()
+    assert refresh(token).json()["code"] == "token_revoked"
+
+
+def test_filter_holds_every_blacklisted_token():
+    user = UserFactory()
+    tokens = [VersionedRefreshToken.for_user(user) for _ in range(50)]
+    for token in tokens[:25]:
+        token.blacklist()
+    # Built from the table, then kept up to date by the post_save signal.
+    get_filter().rebuild()
+    for token in tokens[25:40]:
+        token.blacklist()
+
+    jtis = [token["jti"] for token in tokens]
+    assert all(get_filter().might_contain(jti) for jti in jtis[:40])
+    assert not any(get_filter().might_contain(jti) for jti in jtis[40:])
+
+
+def test_filter_false_positive_rate():
+    bloom = LocalFilter(10 * 1000)
+    bloom.array = bytearray((bloom.bits + 7) // 8)
+    for i in range(1000):
+        bloom.add(f"member-{i}")
+    false_positives = sum(bloom.might_contain(f"other-{i}") for i in range(10000))
+    assert false_positives < 200  # noqa: PLR2004
+
+
+def test_prune_deletes_expired_tokens_in_batches():
+    user = UserFactory()
+    now = timezone.now()
+    expired = [VersionedRefreshToken.for_user(user) for _ in range(5)]
+    live = VersionedRefreshToken.for_user(user)
+    OutstandingToken.objects.filter(jti__in=[token["jti"] for token in expired]).update(
+        expires_at=now - datetime.timedelta(minutes=1),
+    )
+    for token in [*expired[:3], live]:
+        token.blacklist()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert prune(now=now, batch_size=2) == 5  # noqa: PLR2004
+    # Three batches and a final empty one.
+    assert (
+        sum(query["sql"].startswith("SELECT") for query in queries.captured_queries)
+        >= 4
+    )
+    assert list(OutstandingToken.objects.values_list("jti", flat=True)) == [live["jti"]]
+    assert BlacklistedToken.objects.get().token.jti == live["jti"]
+
+
+def test_prune_command_rebuilds_filter():
+    user = UserFactory()
+    token = VersionedRefreshToken.for_user(user)
+    token.blacklist()
+    assert get_filter().might_contain(token["jti"])
+
+    OutstandingToken.objects.update(
+        expires_at=timezone.now() - datetime.timedelta(minutes=1),
+    )
+    call_command("prune_token_blacklist")
+    assert not OutstandingToken.objects.exists()
+    assert not get_filter().might_contain(token["jti"])
+
+
+@pytest.fixture
+def redis_cache(settings):
+    """The production cache, on fakeredis."""
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django_redis.cache.RedisCache",
+            "LOCATION": "redis://localhost:6379/0",
+            "OPTIONS": {
+                "CONNECTION_POOL_KWARGS": {
+                    "connection_class": fakeredis.FakeRedisConnection,
+                },
+            },
+        },
+    }
+    redis = get_redis_connection("default")
+    redis.flushall()
+    return redis
+
+
+def test_redis_filter_builds_adds_and_rebuilds(redis_cache):
+    user = UserFactory()
+    tokens = [VersionedRefreshToken.for_user(user) for _ in range(20)]
+    for token in tokens[:5]:
+        token.blacklist()
+    bloom = get_filter()
+    assert isinstance(bloom, RedisFilter)
+    assert not redis_cache.getbit(bloom.key, 0)
+
+    # An unbuilt filter answers "maybe" and builds itself from the table.
+    assert bloom.might_contain(tokens[-1]["jti"])
+    assert redis_cache.getbit(bloom.key, 0)
+    for token in tokens[5:10]:
+        token.blacklist()
+    jtis = [token["jti"] for token in tokens]
+    assert all(bloom.might_contain(jti) for jti in jtis[:10])
+    assert not any(bloom.might_contain(jti) for jti in jtis[10:])
+
+    OutstandingToken.objects.filter(jti__in=jtis[:5]).update(
+        expires_at=timezone.now() - datetime.timedelta(minutes=1),
+    )
+    call_command("prune_token_blacklist")
+    assert not any(bloom.might_contain(jti) for jti in jtis[:5])
+    assert all(bloom.might_contain(jti) for jti in jtis[5:10])
+
+
+def test_redis_filter_is_built_by_one_request(redis_cache):
+    token = VersionedRefreshToken.for_user(UserFactory())
+    bloom = get_filter()
+    redis_cache.set(f"{bloom.key}:building", 1)
+
+    # Another request is building it: answer "maybe" without scanning the table.
+    with CaptureQueriesContext(connection) as queries:
+        assert bloom.might_contain(token["jti"])
+    assert token_queries(queries.captured_queries) == []
+    assert not redis_cache.getbit(bloom.key, 0)
+
+    redis_cache.delete(f"{bloom.key}:building")
+    assert bloom.might_contain(token["jti"])
+    assert redis_cache.getbit(bloom.key, 0)
+    assert not redis_cache.exists(f"{bloom.key}:building")
+    assert not bloom.might_contain(token["jti"])
@@ -0,0 +1,270 @@
+import pytest
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.db import connection
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import ProtectedError
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.api.serializers import UserSerializer
+from mr_tracker.users.hierarchy import rebuild
+from mr_tracker.users.hierarchy import scope_to
+from mr_tracker.users.hierarchy import subtree
+from mr_tracker.users.models import ReportingLine
+from mr_tracker.users.models import User
+from mr_tracker.users.tests.factories import UserFactory
+from mr_tracker.visits.index_advisor import seed_workload
+from mr_tracker.visits.index_advisor import unindexed_scans
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+
+pytestmark = pytest.mark.django_db
+
+
+def lines():
+    return set(
+        ReportingLine.objects.values_list("ancestor_id", "descendant_id", "depth"),
+    )
+
+
+def members(user):
+    return set(
+        User.objects.filter(pk__in=subtree(user)).values_list("username", flat=True),
+    )
+
+
+@pytest.fixture
+def org():
+    """Two regions, an area under each and an MR under each area."""
+    north = UserFactory(username="north", role="admin")
+    south = UserFactory(username="south", role="admin")
+    delhi = UserFactory(username="delhi", role="admin", manager=north)
+    chennai = UserFactory(username="chennai", role="admin", manager=south)
+    UserFactory(username="mr-delhi", manager=delhi)
+    UserFactory(username="mr-chennai", manager=chennai)
+    return {"north": north, "south": south, "delhi": delhi, "chennai": chennai}
+
+
+def test_closure_follows_manager_changes(org):
+    assert members(org["north"]) == {"north", "delhi", "mr-delhi"}
+    assert (
+        ReportingLine.objects.get(
+            ancestor=org["north"],
+            descendant__username="mr-delhi",
+        ).depth
+        == 2
+    )
+
+    org["delhi"].manager = org["south"]
+    org["delhi"].save()
+    assert members(org["north"]) == {"north"}
+    assert members(org["south"]) == {
+        "south",
+        "delhi",
+        "mr-delhi",
+        "chennai",
+        "mr-chennai",
+    }
+
+    org["delhi"].manager = None
+    org["delhi"].save()
+    assert members(org["south"]) == {"south", "chennai", "mr-chennai"}
+
+    # The incremental updates match a rebuild from scratch.
+    maintained = lines()
+    rebuild()
+    assert lines() == maintained
+
+
+def test_cycles_and_orphans_are_rejected(org):
+    org["north"].manager = User.objects.get(username="delhi")
+    with pytest.raises(ValidationError):
+        org["north"].full_clean()
+    serializer = UserSerializer(
+        org["north"],
+        data={"manager": org["delhi"].pk},
+        partial=True,
+    )
+    assert not serializer.is_valid()
+    assert "manager" in serializer.errors
+    # Saves that skip both checks still cannot create a cycle.
+    with pytest.raises(IntegrityError), transaction.atomic():
+        org["north"].save()
+    with pytest.raises(ProtectedError):
+        org["delhi"].delete()
+
+
+def test_admin_endpoints_are_scoped_to_subtree(org):
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    for username in ("mr-delhi", "mr-chennai"):
+        DoctorVisit.objects.create(
+            mr=User.objects.get(username=username),
+            doctor_name=doctor,
+        )
+    area, company = APIClient(), APIClient()
+    area.force_authenticate(org["delhi"])
+    company.force_authenticate(
+        UserFactory(username="hq", role="admin", company_wide=True),
+    )
+
+    def mrs(client, url, key):
+        return {row[key] for row in client.get(url).data}
+
+    assert mrs(area, reverse("api:users_api:mr_list"), "username") == {"mr-delhi"}
+    assert mrs(company, reverse("api:users_api:mr_list"), "username") == {
+        "mr-delhi",
+        "mr-chennai",
+    }
+
+    dashboard = area.get(reverse("admin-dashboard")).data
+    assert [row["mr"] for row in dashboard["mr_tracking"]] == ["mr-delhi"]
+    assert dashboard["summary"]["total_visits_today"] == 1
+    analytics = area.get(reverse("admin-analytics")).data
+    assert [row["mr_username"] for row in analytics["mr_performance"]] == ["mr-delhi"]
+    assert analytics["summary"]["total_doctor_visits"] == 1
+
+    visits = area.get(reverse("doctor-visits-list")).data
+    assert [visit["id"] for visit in visits] == [
+        DoctorVisit.objects.get(mr__username="mr-delhi").pk,
+    ]
+    chennai_mr = User.objects.get(username="mr-chennai")
+    assert area.get(reverse("admin-mr-detail", args=[chennai_mr.pk])).status_code == 404
+    assert (
+        company.get(reverse("admin-mr-detail", args=[chennai_mr.pk])).status_code == 200
+    )
+
+
+def test_top_of_the_tree_sees_only_its_region(org):
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    for username in ("mr-delhi", "mr-chennai"):
+        DoctorVisit.objects.create(
+            mr=User.objects.get(username=username),
+            doctor_name=doctor,
+        )
+    chennai_mr = User.objects.get(username="mr-chennai")
+    north = org["north"]
+    assert not scope_to(User.objects.filter(pk=chennai_mr.pk), north, "pk").exists()
+    assert set(
+        scope_to(DoctorVisit.objects.all(), north).values_list(
+            "mr__username",
+            flat=True,
+        ),
+    ) == {"mr-delhi"}
+
+    client = APIClient()
+    client.force_authenticate(north)
+    assert {
+        row["username"] for row in client.get(reverse("api:users_api:mr_list")).data
+    } == {"mr-delhi"}
+    dashboard = client.get(reverse("admin-dashboard")).data
+    assert [row["mr"] for row in dashboard["mr_tracking"]] == ["mr-delhi"]
+    assert dashboard["summary"]["total_visits_today"] == 1
+    analytics = client.get(reverse("admin-analytics")).data
+    assert [row["mr_username"] for row in analytics["mr_performance"]] == ["mr-delhi"]
+    assert (
+        client.get(reverse("admin-mr-detail", args=[chennai_mr.pk])).status_code == 404
+    )
+
+
+def test_tasks_are_assigned_within_subtree(org):
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    client = APIClient()
+    client.force_authenticate(org["delhi"])
+
+    def assign(username):
+        entry = {
+            "assigned_to": User.objects.get(username=username).pk,
+            "assigned_doctor": doctor.pk,
+            "due_date": "2026-11-02",
+            "due_time": "10:00",
+        }
+        single = client.post(reverse("doctor-tasks-list"), entry, format="json")
+        bulk = client.post(
+            reverse("doctor-tasks-bulk"),
+            {"tasks": [{**entry, "due_time": "11:00"}]},
+            format="json",
+        )
+        return single.status_code, bulk.status_code
+
+    assert assign("mr-chennai") == (400, 400)
+    assert not DoctorVisitTask.objects.exists()
+    assert assign("mr-delhi") == (201, 201)
+
+
+def _six_level_org():
+    """About 5,000 users: five levels of managers over 4,700 seeded MRs."""
+    seed_workload(mrs=4700, doctors=200, visits=40000, days=30)
+    levels = [[User.objects.create(username="ceo", role="admin")]]
+    for level in range(1, 5):
+        levels.append(
+            User.objects.bulk_create(
+                User(
+                    username=f"manager-{level}-{n}",
+                    role="admin",
+                    password="!",
+                    manager=levels[-1][n // 4],
+                )
+                for n in range(4**level)
+            ),
+        )
+    mrs = list(
+        User.objects.filter(username__startswith="index-advisor-mr-").order_by("pk"),
+    )
+    for n, mr in enumerate(mrs):
+        mr.manager = levels[-1][n % len(levels[-1])]
+    User.objects.bulk_update(mrs, ["manager"])
+    rebuild()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE users_user")
+        cursor.execute("ANALYZE users_reportingline")
+    return levels
+
+
+def test_subtree_aggregates_at_scale(django_assert_max_num_queries):
+    levels = _six_level_org()
+    assert User.objects.count() >= 5000  # noqa: PLR2004
+    assert (
+        ReportingLine.objects.aggregate(deepest=Count("depth", distinct=True))[
+            "deepest"
+        ]
+        == 6
+    )
+    region = levels[2][5]
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+    today = timezone.localdate()
+    queryset = (
+        scope_to(DoctorVisit.objects.filter(visit_date=today), region)
+        .values("mr")
+        .annotate(Count("id"))
+    )
+    assert unindexed_scans(queryset, {"ancestor_id", "mr_id", "visit_date"}) == []
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = on")
+
+    client = APIClient()
+    client.force_authenticate(region)
+    # Grouped queries only: the count does not depend on the team size.
+    with django_assert_max_num_queries(15):
+        dashboard = client.get(reverse("admin-dashboard")).data
+    with django_assert_max_num_queries(10):
+        analytics = client.get(reverse("admin-analytics"), {"period": "month"}).data
+
+    team = User.objects.filter(role="MR", pk__in=subtree(region))
+    assert (
+        dashboard["summary"]["active_mrs"]
+        == team.count()
+        == len(analytics["mr_performance"])
+    )
+    assert (
+        analytics["summary"]["total_doctor_visits"]
+        == DoctorVisit.objects.filter(
+            mr__in=team,
+            visit_date__gte=today - timezone.timedelta(days=30),
+        ).count()
+    )
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+from django.contrib.auth.hashers import identify_hasher
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from mr_tracker.users import passwords
+from mr_tracker.users.passwords import hashing_slot
+from mr_tracker.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db
+
+PASSWORD = "shift-start-1"  # noqa: S105
+
+
+@pytest.fixture
+def argon2(settings):
+    settings.PASSWORD_HASHERS = ["mr_tracker.users.passwords.Argon2PasswordHasher"]
+    settings.ARGON2_TIME_COST = 1
+    settings.ARGON2_MEMORY_COST = 8192
+    settings.ARGON2_PARALLELISM = 1
+    cache.clear()
+    return settings
+
+
+def login(user):
+    return APIClient().post(
+        reverse("api:users_api:mr_login"),
+        {"username": user.username, "password": PASSWORD},
+    )
+
+
+def test_login_rehashes_with_new_cost(argon2):
+    user = UserFactory(role="MR", password=PASSWORD)
+    assert user.password.startswith("argon2$argon2id$v=19$m=8192,t=1,p=1$")
+
+    argon2.ARGON2_TIME_COST = 2
+    assert login(user).status_code == 200
+    user.refresh_from_db()
+    assert user.password.startswith("argon2$argon2id$v=19$m=8192,t=2,p=1$")
+    assert not identify_hasher(user.password).must_update(user.password)
+
+
+def test_login_waits_for_a_hashing_slot(argon2):
+    argon2.PASSWORD_HASH_CONCURRENCY = 1
+    argon2.PASSWORD_HASH_QUEUE_TIMEOUT = 0.1
+    user = UserFactory(role="MR", password=PASSWORD)
+
+    with hashing_slot():
+        response = login(user)
+    assert response.status_code == 503
+    assert (
+        response.json()["detail"] == "Too many logins in progress, try again shortly."
+    )
+    assert response["Retry-After"] == "1"
+    # The slot is free again.
+    assert login(user).status_code == 200
+
+
+class UnavailableCache:
+    """The Redis cache in an outage: with IGNORE_EXCEPTIONS every call returns None."""
+
+    def add(self, *args, **kwargs):
+        return None
+
+    def delete(self, *args, **kwargs):
+        return None
+
+
+def test_logins_fall_back_to_process_slots_without_the_cache(argon2, monkeypatch):
+    argon2.PASSWORD_HASH_CONCURRENCY = 1
+    argon2.PASSWORD_HASH_QUEUE_TIMEOUT = 0.1
+    monkeypatch.setattr(passwords, "cache", UnavailableCache())
+    user = UserFactory(role="MR", password=PASSWORD)
+
+    assert login(user).status_code == 200
+    # The process still caps its own hashes.
+    with hashing_slot():
+        assert login(user).status_code == 503
+    assert login(user).status_code == 200
+
+
+def test_login_throughput(settings, record_property):
+    """Logins per CPU-second at the deployed Argon2 cost; each login uses one core."""
+    settings.PASSWORD_HASHERS = ["mr_tracker.users.passwords.Argon2PasswordHasher"]
+    user = UserFactory(role="MR", password=PASSWORD)
+    logins = 8
+    started = time.process_time()
+    for _ in range(logins):
+        assert login(user).status_code == 200
+    rate = logins / (time.process_time() - started)
+    record_property("logins_per_core_second", round(rate, 2))
+    assert rate > 1
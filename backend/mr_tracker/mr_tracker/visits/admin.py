@@ -1,30 +1,62 @@
 from django.contrib import admin
-from .models import Doctor, DoctorVisit, ShopVisit
+from .models import Doctor, DoctorVisit, ShopVisit, Territory
+from .search import (
+    admin_search,
+    doctor_matches,
+    doctor_visit_matches,
+    shop_visit_matches,
+)
+
+
+@admin.register(Territory)
+class TerritoryAdmin(admin.ModelAdmin):
+    list_display = ("name",)
+    search_fields = ("name",)
+    filter_horizontal = ("mrs",)
 
 
 @admin.register(Doctor)
 class DoctorAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "specialization")
+    list_display = (
+        "id",
+        "name",
+        "specialization",
+        "territory",
+        "latitude",
+        "longitude",
+    )
+    list_filter = ("territory",)
+    list_select_related = ("territory",)
+    autocomplete_fields = ("territory",)
     search_fields = ("name", "specialization")
     ordering = ("name",)
 
+    def get_search_results(self, request, queryset, search_term):
+        return admin_search(queryset, search_term, doctor_matches)
+
 
 @admin.register(DoctorVisit)
 class DoctorVisitAdmin(admin.ModelAdmin):
-    list_display = ("id", "mr", "doctor_name", "visit_date", "visit_time", "completed")
+    list_display = ("id", "mr", "doctor_name", "visited_at", "completed")
     list_filter = ("completed", "visit_date", "doctor_name")
     search_fields = ("mr__username", "doctor_name__name", "notes")
     readonly_fields = ("visit_date", "visit_time")
-    ordering = ("-visit_date", "-visit_time")
+    ordering = ("-visited_at",)
+
+    def get_search_results(self, request, queryset, search_term):
+        return admin_search(queryset, search_term, doctor_visit_matches, by_doctor=True)
 
 
 @admin.register(ShopVisit)
 class ShopVisitAdmin(admin.ModelAdmin):
-    list_display = ("id", "mr", "shop_name", "visit_date", "visit_time", "completed")
+    list_display = ("id", "mr", "shop_name", "visited_at", "completed")
     list_filter = ("completed", "visit_date")
     search_fields = ("mr__username", "shop_name", "location", "notes")
     readonly_fields = ("visit_date", "visit_time")
-    ordering = ("-visit_date", "-visit_time")
+    ordering = ("-visited_at",)
+
+    def get_search_results(self, request, queryset, search_term):
+        return admin_search(queryset, search_term, shop_visit_matches)
 
 
 # @admin.register(AssignedVisit)
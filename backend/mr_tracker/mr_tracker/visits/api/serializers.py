@@ -1,13 +1,35 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 
 from mr_tracker.users.models import User
-from mr_tracker.visits.models import DoctorVisit, ShopVisit, Doctor
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+
+# Offline visits are synced with the time they really happened, within limits.
+MAX_VISIT_BACKDATE = timedelta(days=7)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+# Visits per offline sync upload.
+MAX_VISIT_UPLOAD = 500
+
+
+def validate_visited_at(value):
+    now = timezone.now()
+    if value > now + MAX_CLOCK_SKEW:
+        raise serializers.ValidationError("Visit time cannot be in the future.")
+    if value < now - MAX_VISIT_BACKDATE:
+        raise serializers.ValidationError(
+            f"Visits older than {MAX_VISIT_BACKDATE.days} days cannot be recorded.",
+        )
+    return value
 
 
 class DoctorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Doctor
-        fields = ['id', 'name', 'specialization']
+        fields = ["id", "name", "specialization", "territory", "latitude", "longitude"]
 
     def __str__(self):
         return self.name
@@ -31,6 +53,7 @@ class DoctorVisitSerializer(serializers.ModelSerializer):
             'gps_lat',
             'gps_long',
             'notes',
+            "visited_at",
             'visit_date',
             'visit_time',
             'completed',
@@ -39,6 +62,9 @@ class DoctorVisitSerializer(serializers.ModelSerializer):
             'is_assigned_task',
         ]
 
+    def validate_visited_at(self, value):
+        return validate_visited_at(value)
+
     def get_task_id(self, obj):
         if hasattr(obj, "task") and obj.task:
             return obj.task.id
@@ -65,12 +91,93 @@ class ShopVisitSerializer(serializers.ModelSerializer):
             'location',
             'contact_person',
             'notes',
+            "visited_at",
             'visit_date',
             'visit_time',
             'completed',
             'visit_type',
         ]
 
+    def validate_visited_at(self, value):
+        return validate_visited_at(value)
+
+
+class DateRangeQuerySerializer(serializers.Serializer):
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        start_date = data.get("start_date")
+        end_date = data.get("end_date")
+        if start_date and end_date and start_date > end_date:
+            raise serializers.ValidationError(
+                "start_date must be on or before end_date.",
+            )
+        return data
+
+
+class VisitFilterSerializer(DateRangeQuerySerializer):
+    """
+    Query parameters of the visit list endpoints.
+
+    Every combination is served by an index; see ``filter_visits`` and the
+    plan tests before adding a filter or an ordering.
+    """
+
+    ORDERINGS = {
+        "-visited_at": ("-visited_at", "-id"),
+        "visited_at": ("visited_at", "id"),
+    }
+
+    mr = serializers.IntegerField(
+        required=False,
+        help_text="Admins only; MRs always see their own visits.",
+    )
+    visit_type = serializers.ChoiceField(
+        choices=DoctorVisit.VISIT_TYPE_CHOICES,
+        required=False,
+    )
+    ordering = serializers.ChoiceField(
+        choices=list(ORDERINGS),
+        required=False,
+        default="-visited_at",
+    )
+
+
+class DoctorVisitFilterSerializer(VisitFilterSerializer):
+    doctor = serializers.IntegerField(required=False)
+
+
+class VisitTimelineQuerySerializer(DateRangeQuerySerializer):
+    mr = serializers.IntegerField(
+        required=False,
+        help_text="Admins only; MRs always see their own visits.",
+    )
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(
+        required=False,
+        default=50,
+        min_value=1,
+        max_value=200,
+    )
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=200)
+    page = serializers.IntegerField(
+        required=False,
+        default=1,
+        min_value=1,
+        max_value=10,
+    )
+    page_size = serializers.IntegerField(
+        required=False,
+        default=20,
+        min_value=1,
+        max_value=50,
+    )
+
+
 # class AssignedVisitSerializer(serializers.ModelSerializer):
 #     # Make admin read-only - it will be set in perform_create
 #     # DO NOT use HiddenField or CurrentUserDefault here
@@ -1,5 +1,11 @@
-from rest_framework.routers import DefaultRouter
-from .views import DoctorViewSet, DoctorVisitViewSet, ShopVisitViewSet
+from django.urls import path
+
+from config.transactions import DefaultRouter
+
+from .views import DoctorViewSet
+from .views import DoctorVisitViewSet
+from .views import ShopVisitViewSet
+from .views import VisitTimelineView
 
 router = DefaultRouter()
 router.register(r"doctors", DoctorViewSet, basename="doctors")
@@ -7,4 +13,7 @@ router.register(r"doctor-visits", DoctorVisitViewSet, basename="doctor-visits")
 router.register(r"shop-visits", ShopVisitViewSet, basename="shop-visits")
 # router.register(r"assigned-visits", AssignedVisitViewSet, basename="assigned-visits")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("timeline/", VisitTimelineView.as_view(), name="visit-timeline"),
+    *router.urls,
+]
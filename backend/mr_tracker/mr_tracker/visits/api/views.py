@@ -1,64 +1,304 @@
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from drf_spectacular.utils import OpenApiResponse
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.utils import extend_schema_view
+from rest_framework import serializers
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.mixins import ListModelMixin, CreateModelMixin
+from rest_framework.exceptions import NotFound
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.mixins import ListModelMixin
 from rest_framework.mixins import RetrieveModelMixin
 from rest_framework.mixins import UpdateModelMixin
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
-from django.utils import timezone
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+
+from config.transactions import READ_ONLY
+from config.transactions import ReadPolicyMixin
+from mr_tracker.tasks.linking import link_visits_to_tasks
+from mr_tracker.users.hierarchy import scope_to
 from mr_tracker.users.models import User
-from drf_spectacular.utils import extend_schema, OpenApiResponse
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+from mr_tracker.visits.models import Territory
+from mr_tracker.visits.search import merge_ranked
+from mr_tracker.visits.search import ranked
+from mr_tracker.visits.territories import doctors_for
+from mr_tracker.visits.territories import territory_ids
+from mr_tracker.visits.timeline import InvalidCursorError
+from mr_tracker.visits.timeline import merge_timeline
 
-from .serializers import (
-    DoctorSerializer, 
-    DoctorVisitSerializer, 
-    ShopVisitSerializer, 
-)
-from mr_tracker.visits.models import DoctorVisit, ShopVisit, Doctor
+from .serializers import MAX_VISIT_UPLOAD
+from .serializers import DoctorSerializer
+from .serializers import DoctorVisitFilterSerializer
+from .serializers import DoctorVisitSerializer
+from .serializers import SearchQuerySerializer
+from .serializers import ShopVisitSerializer
+from .serializers import VisitFilterSerializer
+from .serializers import VisitTimelineQuerySerializer
 
-import logging        
 logger = logging.getLogger(__name__)
 
 
-class DoctorViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateModelMixin, UpdateModelMixin):
+def filter_visits(queryset, data):
+    """Apply validated ``VisitFilterSerializer`` parameters to a visit queryset."""
+    filters = {}
+    if "mr" in data:
+        filters["mr_id"] = data["mr"]
+    if "doctor" in data:
+        filters["doctor_name_id"] = data["doctor"]
+    if "visit_type" in data:
+        filters["visit_type"] = data["visit_type"]
+    if "start_date" in data:
+        filters["visit_date__gte"] = data["start_date"]
+    if "end_date" in data:
+        filters["visit_date__lte"] = data["end_date"]
+    return queryset.filter(**filters).order_by(
+        *VisitFilterSerializer.ORDERINGS[data["ordering"]],
+    )
+
+
+class VisitFilterMixin:
+    """Validated filters and ordering on the ``list`` action."""
+
+    filter_serializer_class = VisitFilterSerializer
+
+    def filter_queryset(self, queryset):
+        if self.action != "list":
+            return queryset
+        params = self.filter_serializer_class(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        data = dict(params.validated_data)
+        if self.request.user.role == "MR":
+            data.pop("mr", None)
+        return filter_visits(queryset, data)
+
+
+class DoctorViewSet(
+    ReadPolicyMixin,
+    GenericViewSet,
+    ListModelMixin,
+    RetrieveModelMixin,
+    CreateModelMixin,
+    UpdateModelMixin,
+):
+    read_policy = READ_ONLY
     queryset = Doctor.objects.all()
     serializer_class = DoctorSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # MRs see the doctors of their territories.
+        return doctors_for(self.request.user, super().get_queryset())
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        user = self.request.user
+        territory = serializer.validated_data.get("territory")
+        # An MR's new doctor goes into their territory, or must name one of theirs.
+        mine = (
+            set(territory_ids(user).values_list("territory", flat=True))
+            if user.role == "MR"
+            else set()
+        )
+        if territory is None and len(mine) == 1:
+            territory = Territory.objects.get(pk=mine.pop())
+        elif mine and (territory is None or territory.pk not in mine):
+            msg = "Doctors you add must be in one of your territories."
+            raise serializers.ValidationError({"territory": msg})
+        serializer.save(created_by=user, territory=territory)
 
 
-class DoctorVisitViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateModelMixin, UpdateModelMixin):
+@extend_schema_view(list=extend_schema(parameters=[DoctorVisitFilterSerializer]))
+class DoctorVisitViewSet(
+    ReadPolicyMixin,
+    VisitFilterMixin,
+    GenericViewSet,
+    ListModelMixin,
+    RetrieveModelMixin,
+    CreateModelMixin,
+    UpdateModelMixin,
+):
+    read_policy = READ_ONLY
     serializer_class = DoctorVisitSerializer
+    filter_serializer_class = DoctorVisitFilterSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == "MR":
-            return DoctorVisit.objects.filter(mr=user)
-        return DoctorVisit.objects.all()
+        if getattr(self, "swagger_fake_view", False):  # Schema generation has no user.
+            return DoctorVisit.objects.none()
+        return scope_to(DoctorVisit.objects.all(), self.request.user)
+
+    def get_serializer(self, *args, **kwargs):
+        # A list body uploads several visits at once (offline sync).
+        if isinstance(kwargs.get("data"), list):
+            kwargs.update(many=True, max_length=MAX_VISIT_UPLOAD)
+        return super().get_serializer(*args, **kwargs)
     
     def perform_create(self, serializer):
-        serializer.save(mr=self.request.user)
+        with transaction.atomic():
+            visits = serializer.save(mr=self.request.user)
+            link_visits_to_tasks(visits if isinstance(visits, list) else [visits])
 
 
-class ShopVisitViewSet(GenericViewSet, ListModelMixin, RetrieveModelMixin, CreateModelMixin, UpdateModelMixin):
+@extend_schema_view(list=extend_schema(parameters=[VisitFilterSerializer]))
+class ShopVisitViewSet(
+    ReadPolicyMixin,
+    VisitFilterMixin,
+    GenericViewSet,
+    ListModelMixin,
+    RetrieveModelMixin,
+    CreateModelMixin,
+    UpdateModelMixin,
+):
+    read_policy = READ_ONLY
     serializer_class = ShopVisitSerializer  
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.role == "MR":
-            return ShopVisit.objects.filter(mr=user)
-        return ShopVisit.objects.all()
+        if getattr(self, "swagger_fake_view", False):  # Schema generation has no user.
+            return ShopVisit.objects.none()
+        return scope_to(ShopVisit.objects.all(), self.request.user)
     
     def perform_create(self, serializer):
         serializer.save(mr=self.request.user)
 
 
+class VisitTimelineView(ReadPolicyMixin, APIView):
+    """
+    Doctor and shop visits as one newest-first, cursor-paginated stream.
+
+    Endpoint: GET /api/visits/timeline/?mr=&start_date=&end_date=&cursor=&page_size=
+    Each entry is the visit's usual serializer output plus ``kind``
+    ("doctor" or "shop"). Follow ``next`` until it is null.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[VisitTimelineQuerySerializer],
+        responses={
+            200: OpenApiResponse(
+                description="{next, results} page of doctor and shop visits",
+            ),
+            400: OpenApiResponse(description="Invalid filter"),
+            404: OpenApiResponse(description="Invalid cursor"),
+        },
+    )
+    def get(self, request):
+        params = VisitTimelineQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        filters = {}
+        if request.user.role != "MR" and "mr" in data:
+            filters["mr_id"] = data["mr"]
+        if "start_date" in data:
+            filters["visit_date__gte"] = data["start_date"]
+        if "end_date" in data:
+            filters["visit_date__lte"] = data["end_date"]
+
+        querysets = {
+            "doctor": scope_to(
+                DoctorVisit.objects.filter(**filters),
+                request.user,
+            ).select_related("doctor_name", "task"),
+            "shop": scope_to(ShopVisit.objects.filter(**filters), request.user),
+        }
+        try:
+            entries, next_cursor = merge_timeline(
+                querysets,
+                cursor=data.get("cursor"),
+                page_size=data["page_size"],
+            )
+        except InvalidCursorError:
+            raise NotFound("Invalid cursor.")
+
+        serializer_classes = {
+            "doctor": DoctorVisitSerializer,
+            "shop": ShopVisitSerializer,
+        }
+        results = [
+            {"kind": kind, **serializer_classes[kind](visit).data}
+            for kind, visit in entries
+        ]
+        next_url = None
+        if next_cursor is not None:
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                "cursor",
+                next_cursor,
+            )
+        return Response({"next": next_url, "results": results})
+
+
+class SearchView(ReadPolicyMixin, APIView):
+    """
+    Ranked full-text search across doctors, doctor visits and shop visits.
+
+    Endpoint: GET /api/search/?q=&page=&page_size=
+    ``q`` accepts web-search syntax ("quoted phrases", -excluded, or).
+    Each result is the usual serializer output plus ``kind`` and ``rank``.
+    MRs only find their own visits, managers those of their reporting subtree.
+    MRs with territories only find the doctors in them.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(
+        parameters=[SearchQuerySerializer],
+        responses={
+            200: OpenApiResponse(description="{next, results} page of ranked matches"),
+            400: OpenApiResponse(description="Invalid query"),
+        },
+    )
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        text = params.validated_data["q"]
+        page = params.validated_data["page"]
+
+        doctor_visits = scope_to(
+            DoctorVisit.objects.select_related("doctor_name", "task"),
+            request.user,
+        )
+        shop_visits = scope_to(ShopVisit.objects.all(), request.user)
+
+        entries, has_next = merge_ranked(
+            {
+                "doctor": ranked(doctors_for(request.user), text, trigram_field="name"),
+                "doctor_visit": ranked(doctor_visits, text),
+                "shop_visit": ranked(shop_visits, text, trigram_field="shop_name"),
+            },
+            page=page,
+            page_size=params.validated_data["page_size"],
+        )
+
+        serializer_classes = {
+            "doctor": DoctorSerializer,
+            "doctor_visit": DoctorVisitSerializer,
+            "shop_visit": ShopVisitSerializer,
+        }
+        results = [
+            {"kind": kind, "rank": row.rank, **serializer_classes[kind](row).data}
+            for kind, row in entries
+        ]
+        next_url = None
+        if has_next:
+            next_url = replace_query_param(
+                request.build_absolute_uri(),
+                "page",
+                page + 1,
+            )
+        return Response({"next": next_url, "results": results})
+
+
 # class AssignedVisitViewSet(
 #     GenericViewSet, 
 #     ListModelMixin, 
@@ -1,5 +1,9 @@
 from django.apps import AppConfig
 
+
 class VisitsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "mr_tracker.visits"
+
+    def ready(self):
+        import mr_tracker.visits.signals  # noqa: F401, PLC0415
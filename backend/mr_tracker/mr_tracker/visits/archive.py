@@ -0,0 +1,193 @@
+"""
+Cold archive of old visits as zstd-compressed Parquet files.
+
+Each archived month of each visit table is one file on the media filesystem:
+``MEDIA_ROOT/visit_archive/<kind>/YYYY-MM.parquet``. Column names match the
+API serializers so archived rows can be returned alongside live ones.
+"""
+
+import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.utils import timezone
+
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+from mr_tracker.visits.partitions import add_months
+
+ARCHIVE_DIRNAME = "visit_archive"
+BATCH_SIZE = 50_000
+
+# kind -> (model, [(column, ORM lookup, arrow type), ...])
+ARCHIVES = {
+    "doctor_visits": (
+        DoctorVisit,
+        [
+            ("id", "id", pa.int64()),
+            ("mr_id", "mr_id", pa.int64()),
+            ("doctor_name", "doctor_name_id", pa.int64()),
+            ("doctor_name_display", "doctor_name__name", pa.string()),
+            ("doctor_specialization", "doctor_name__specialization", pa.string()),
+            ("gps_lat", "gps_lat", pa.float64()),
+            ("gps_long", "gps_long", pa.float64()),
+            ("notes", "notes", pa.string()),
+            ("visited_at", "visited_at", pa.timestamp("us", tz="UTC")),
+            ("visit_date", "visit_date", pa.date32()),
+            ("visit_time", "visit_time", pa.time64("us")),
+            ("completed", "completed", pa.bool_()),
+            ("visit_type", "visit_type", pa.string()),
+            ("task_id", "task__id", pa.int64()),
+        ],
+    ),
+    "shop_visits": (
+        ShopVisit,
+        [
+            ("id", "id", pa.int64()),
+            ("mr_id", "mr_id", pa.int64()),
+            ("shop_name", "shop_name", pa.string()),
+            ("location", "location", pa.string()),
+            ("contact_person", "contact_person", pa.string()),
+            ("notes", "notes", pa.string()),
+            ("visited_at", "visited_at", pa.timestamp("us", tz="UTC")),
+            ("visit_date", "visit_date", pa.date32()),
+            ("visit_time", "visit_time", pa.time64("us")),
+            ("completed", "completed", pa.bool_()),
+            ("visit_type", "visit_type", pa.string()),
+        ],
+    ),
+}
+
+
+def archive_dir(kind: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / ARCHIVE_DIRNAME / kind
+
+
+def archive_path(kind: str, month: datetime.date) -> Path:
+    return archive_dir(kind) / f"{month:%Y-%m}.parquet"
+
+
+def archived_months(kind: str) -> list[datetime.date]:
+    directory = archive_dir(kind)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        datetime.datetime.strptime(path.stem, "%Y-%m").date()  # noqa: DTZ007
+        for path in directory.glob("*.parquet")
+    )
+
+
+def _schema(kind: str) -> pa.Schema:
+    _, columns = ARCHIVES[kind]
+    return pa.schema([(name, arrow_type) for name, _, arrow_type in columns])
+
+
+def write_month(kind: str, month: datetime.date) -> int:
+    """
+    Write every row of ``month`` to its archive file and return the row count.
+
+    Rows are streamed from the database in batches. If the file already exists
+    (a previous run was interrupted before the rows were removed) its rows are
+    kept and only ids it does not contain yet are added, so re-running is safe.
+    """
+    model, columns = ARCHIVES[kind]
+    schema = _schema(kind)
+    path = archive_path(kind, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+
+    rows = (
+        model.objects.filter(
+            visit_date__gte=month,
+            visit_date__lt=add_months(month, 1),
+        )
+        .order_by("visited_at", "id")
+        .values_list(*(lookup for _, lookup, _ in columns))
+    )
+
+    written = 0
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        existing_ids = None
+        if path.exists():
+            existing = pq.read_table(path, schema=schema)
+            writer.write_table(existing, row_group_size=BATCH_SIZE)
+            existing_ids = existing["id"]
+            written += existing.num_rows
+
+        batch = []
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                written += _write_batch(writer, schema, batch, existing_ids)
+                batch = []
+        if batch:
+            written += _write_batch(writer, schema, batch, existing_ids)
+
+    tmp_path.replace(path)
+    return written
+
+
+def _write_batch(writer, schema, rows, existing_ids) -> int:
+    table = pa.Table.from_arrays(
+        [
+            pa.array(values, type=field.type)
+            for values, field in zip(zip(*rows), schema, strict=True)
+        ],
+        schema=schema,
+    )
+    if existing_ids is not None:
+        table = table.filter(pc.invert(pc.is_in(table["id"], value_set=existing_ids)))
+    writer.write_table(table, row_group_size=BATCH_SIZE)
+    return table.num_rows
+
+
+def read_archived_visits(
+    kind: str,
+    *,
+    mr_id: int,
+    start_date: datetime.date | None = None,
+    end_date: datetime.date | None = None,
+) -> list[dict]:
+    """
+    Return archived visits of one MR in ``[start_date, end_date]``, newest first.
+
+    Only files for months overlapping the range are opened, so a range that
+    does not reach back into the archive costs one directory listing.
+    """
+    months = [
+        month
+        for month in archived_months(kind)
+        if (start_date is None or add_months(month, 1) > start_date)
+        and (end_date is None or month <= end_date)
+    ]
+    if not months:
+        return []
+
+    filters = [("mr_id", "=", mr_id)]
+    if start_date is not None:
+        filters.append(("visit_date", ">=", start_date))
+    if end_date is not None:
+        filters.append(("visit_date", "<=", end_date))
+
+    schema = _schema(kind)
+    tables = [
+        pq.read_table(archive_path(kind, month), schema=schema, filters=filters)
+        for month in months
+    ]
+    rows = pa.concat_tables(tables).to_pylist()
+    rows.sort(key=lambda row: row["visited_at"], reverse=True)
+    return rows
+
+
+def to_payload(row: dict) -> dict:
+    """Shape an archived row like the matching visit serializer's output."""
+    payload = {key: value for key, value in row.items() if key != "mr_id"}
+    payload["visited_at"] = timezone.localtime(row["visited_at"]).isoformat()
+    payload["visit_date"] = row["visit_date"].isoformat()
+    payload["visit_time"] = row["visit_time"].isoformat()
+    if "task_id" in row:
+        payload["is_assigned_task"] = row["task_id"] is not None
+    return payload
@@ -0,0 +1,453 @@
+"""
+Plan analysis behind ``manage.py index_advisor``.
+
+Captured queries are grouped by shape, each shape is run once under
+``EXPLAIN (ANALYZE, BUFFERS)``, and the plan nodes that read or sort many
+rows are turned into findings. A finding on a model table comes with a
+proposed ``models.Index``: equality columns first, then one range column,
+then the sort keys. Low-cardinality equality columns (choices and booleans)
+become the condition of a partial index instead.
+"""
+
+import datetime
+import re
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.models import User
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.partitions import PARTITIONED_TABLES
+from mr_tracker.visits.partitions import add_months
+from mr_tracker.visits.partitions import create_partition
+from mr_tracker.visits.partitions import month_floor
+
+SCAN_NODES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+SORT_NODES = {"Sort", "Incremental Sort"}
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+_COMPARISON = re.compile(
+    r"\(*(?:\w+\.)?(\w+)\)*(?:::[\w ]+)?\s*(=|<=|>=|<|>)\s*"
+    r"('(?:[^']|'')*'|\w+)",
+)
+_NEGATION = re.compile(r"NOT \(*(?:\w+\.)?(\w+)")
+_BARE = re.compile(r"(?:\w+\.)?(\w+)")
+_SORT_KEY = re.compile(r"^(?:(\w+)\.)?(\w+)( DESC)?$")
+
+
+class QueryRecorder:
+    """
+    Execute wrapper that keeps the first run of each distinct SELECT.
+
+    Queries are told apart by their parametrised SQL, so an N+1 loop shows up
+    as one query with a high count rather than thousands of entries.
+    """
+
+    def __init__(self):
+        self.total = 0
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        if not many and sql.lstrip().upper().startswith("SELECT"):
+            key = _IN_LIST.sub("IN (...)", sql)
+            if key in self.queries:
+                self.queries[key][1] += 1
+            else:
+                self.queries[key] = [connection.ops.compose_sql(sql, params), 1]
+        return execute(sql, params, many, context)
+
+
+def explain(sql: str) -> dict:
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        return cursor.fetchone()[0][0]["Plan"]
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def plan_of(queryset) -> dict:
+    """The estimated plan of ``queryset``, without running it."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        return cursor.fetchone()[0][0]["Plan"]
+
+
+def index_leads() -> dict[str, tuple[str, str, bool]]:
+    """Index name -> (table, leading column, whether the index is partial)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT index_class.relname, table_class.relname, attribute.attname,
+                   index.indpred IS NOT NULL
+            FROM pg_index index
+            JOIN pg_class index_class ON index_class.oid = index.indexrelid
+            JOIN pg_class table_class ON table_class.oid = index.indrelid
+            JOIN pg_attribute attribute
+              ON attribute.attrelid = index.indrelid
+             AND attribute.attnum = index.indkey[0]
+            """,
+        )
+        return {
+            name: (table, column, partial)
+            for name, table, column, partial in cursor.fetchall()
+        }
+
+
+def empty_tables() -> set[str]:
+    """Tables that were empty when last analysed."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relkind = 'r' AND reltuples = 0",
+        )
+        return {name for (name,) in cursor.fetchall()}
+
+
+def unindexed_scans(queryset, columns) -> list[str]:
+    """
+    Scans in the plan of ``queryset`` that its filters on ``columns`` do not drive.
+
+    A scan is fine when it uses a partial index, or an index that leads
+    with one of ``columns`` or has an index condition on one (a skip scan).
+    Without ``columns`` any index scan is fine, and scans of empty tables
+    (such as future partitions) are always fine. Run it on analysed tables
+    with ``enable_seqscan`` off.
+    """
+    leads = index_leads()
+    empty = empty_tables()
+    problems = []
+    for node in walk(plan_of(queryset)):
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] not in empty:
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        elif "Index Name" in node and columns:
+            table, column, partial = leads[node["Index Name"]]
+            condition = node.get("Index Cond", "")
+            if table in empty or partial or column in columns:
+                continue
+            if not any(
+                re.search(rf"\b{re.escape(name)}\b", condition) for name in columns
+            ):
+                problems.append(f"{node['Node Type']} using {node['Index Name']}")
+    return problems
+
+
+def partition_parents() -> dict[str, str]:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, parent.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            """,
+        )
+        return dict(cursor.fetchall())
+
+
+def _table_models() -> dict[str, type[models.Model]]:
+    return {model._meta.db_table: model for model in apps.get_models()}  # noqa: SLF001
+
+
+def _fields_by_column(model) -> dict[str, models.Field]:
+    return {
+        field.column: field
+        for field in model._meta.concrete_fields  # noqa: SLF001
+    }
+
+
+def _low_cardinality(field) -> bool:
+    return bool(field.choices) or isinstance(field, models.BooleanField)
+
+
+def _constant(field, literal: str):
+    if literal in ("true", "false"):
+        return literal == "true"
+    if literal.startswith("'"):
+        return field.to_python(literal[1:-1].replace("''", "'"))
+    return None
+
+
+def parse_conditions(text: str, fields: dict) -> tuple[list, list, dict]:
+    """
+    Split a plan condition into ``(equality, range, constants)``.
+
+    ``equality`` and ``range`` are lists of fields; ``constants`` maps fields
+    compared with a literal to that value, for partial index conditions.
+    """
+    equality, ranges, constants = [], [], {}
+    for column, operator, operand in _COMPARISON.findall(text):
+        field = fields.get(column)
+        if field is None:
+            continue
+        if operator != "=":
+            if field not in ranges:
+                ranges.append(field)
+            continue
+        if field not in equality:
+            equality.append(field)
+        value = _constant(field, operand)
+        if value is not None:
+            constants[field] = value
+    for part in text.split(" AND "):
+        negated = _NEGATION.fullmatch(part.strip("() "))
+        bare = _BARE.fullmatch(part.strip("() "))
+        match = negated or bare
+        field = fields.get(match.group(1)) if match else None
+        if isinstance(field, models.BooleanField) and field not in equality:
+            equality.append(field)
+            constants[field] = negated is None
+    return equality, ranges, constants
+
+
+def _sort_fields(keys: list[str], fields: dict) -> list[str] | None:
+    """Index field names for ``keys``, or ``None`` if a key is not a plain column."""
+    names = []
+    for key in keys:
+        match = _SORT_KEY.match(key)
+        field = fields.get(match.group(2)) if match else None
+        if field is None:
+            return None
+        names.append(f"-{field.name}" if match.group(3) else field.name)
+    return names
+
+
+def _rows(node: dict) -> int:
+    loops = node.get("Actual Loops", 1)
+    return (node.get("Actual Rows", 0) + node.get("Rows Removed by Filter", 0)) * loops
+
+
+def analyse(plan: dict, *, min_rows: int) -> list[dict]:
+    """
+    Return the findings for one plan.
+
+    Each finding is a dict with ``node``, ``table``, ``rows``, ``detail`` and,
+    when an index could help, ``model`` and ``index``.
+    """
+    parents = partition_parents()
+    table_models = _table_models()
+    findings = []
+
+    def scan_of(node):
+        relation = node.get("Relation Name")
+        table = parents.get(relation, relation)
+        return table, table_models.get(table)
+
+    sorted_scans = set()
+    for node in walk(plan):
+        if node["Node Type"] not in SORT_NODES or _rows(node) < min_rows:
+            continue
+        scans = [child for child in walk(node) if child["Node Type"] in SCAN_NODES]
+        detail = "sort by " + ", ".join(node["Sort Key"])
+        finding = {
+            "node": node["Node Type"],
+            "table": None,
+            "rows": _rows(node),
+            "detail": detail,
+        }
+        tables = {scan_of(scan) for scan in scans}
+        if len(tables) == 1:
+            ((table, model),) = tables
+            finding["table"] = table
+            if model is not None:
+                fields = _fields_by_column(model)
+                sort_fields = _sort_fields(node["Sort Key"], fields)
+                if sort_fields is not None:
+                    finding.update(_propose(model, scans[0], fields, sort_fields))
+                    sorted_scans.update(id(scan) for scan in scans)
+        findings.append(finding)
+
+    for node in walk(plan):
+        if node["Node Type"] not in SCAN_NODES or id(node) in sorted_scans:
+            continue
+        removed = node.get("Rows Removed by Filter", 0) * node.get("Actual Loops", 1)
+        if node["Node Type"] == "Seq Scan":
+            if _rows(node) < min_rows:
+                continue
+        elif removed < min_rows:
+            continue
+        table, model = scan_of(node)
+        detail = node.get("Filter") or node.get("Index Cond") or "no filter"
+        finding = {
+            "node": node["Node Type"],
+            "table": table,
+            "rows": _rows(node),
+            "detail": detail,
+        }
+        if model is not None:
+            finding.update(_propose(model, node, _fields_by_column(model), []))
+        findings.append(finding)
+    return findings
+
+
+def _propose(model, scan: dict, fields: dict, sort_fields: list[str]) -> dict:
+    text = " AND ".join(
+        scan[key] for key in ("Index Cond", "Recheck Cond", "Filter") if key in scan
+    )
+    equality, ranges, constants = parse_conditions(text, fields)
+
+    condition = {
+        field.name: constants[field]
+        for field in equality
+        if _low_cardinality(field) and field in constants
+    }
+    columns = [field.name for field in equality if field.name not in condition]
+    columns += [field.name for field in ranges[:1] if field.name not in columns]
+    sort_names = [name for name in sort_fields if name.lstrip("-") not in columns]
+    if columns or sort_names:
+        columns += sort_names
+    elif condition:
+        # Nothing left to index once the condition is taken out.
+        columns, condition = list(condition), {}
+    else:
+        return {}
+
+    index = models.Index(fields=columns)
+    index.set_name_with_model(model)
+    if condition:
+        # Partial indexes must be named up front; keep the generated name
+        # but mark it so it cannot clash with a full index on the same columns.
+        index = models.Index(
+            fields=columns,
+            condition=Q(**condition),
+            name=f"{index.name[:28]}_p",
+        )
+    return {"model": model, "index": index}
+
+
+def is_covered(model, index: models.Index) -> bool:
+    """Whether an existing database index already starts with ``index``'s columns."""
+    fields = {field.name: field for field in model._meta.concrete_fields}  # noqa: SLF001
+    wanted = [fields[name.lstrip("-")].column for name in index.fields]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(
+            cursor,
+            model._meta.db_table,  # noqa: SLF001
+        )
+    return any(
+        (details["index"] or details["primary_key"] or details["unique"])
+        and details["columns"][: len(wanted)] == wanted
+        for details in constraints.values()
+    )
+
+
+def seed_workload(*, mrs: int, doctors: int, visits: int, days: int):
+    """
+    Fill the database with a synthetic workload and return ``(admin, mr)``.
+
+    Meant to run inside a transaction that is rolled back afterwards.
+    """
+    today = timezone.localdate()
+    month = month_floor(today - datetime.timedelta(days=days))
+    while month <= today:
+        for table in PARTITIONED_TABLES:
+            create_partition(table, month)
+        month = add_months(month, 1)
+
+    admin = User.objects.create(
+        username="index-advisor-admin",
+        role="admin",
+        company_wide=True,
+        password="!",
+    )
+    mr_users = User.objects.bulk_create(
+        User(username=f"index-advisor-mr-{number}", role="MR", password="!")
+        for number in range(mrs)
+    )
+    doctor_rows = Doctor.objects.bulk_create(
+        Doctor(name=f"Dr. Advisor {number}", specialization="General")
+        for number in range(doctors)
+    )
+    mr_ids = [user.pk for user in mr_users]
+    doctor_ids = [doctor.pk for doctor in doctor_rows]
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO visits_doctorvisit (
+                mr_id, doctor_name_id, notes, visited_at, visit_date, visit_time,
+                completed, visit_type
+            )
+            SELECT
+                (%(mrs)s::bigint[])[1 + i %% cardinality(%(mrs)s::bigint[])],
+                (%(doctors)s::bigint[])[
+                    1 + (i * 7) %% cardinality(%(doctors)s::bigint[])
+                ],
+                '', ts, (ts AT TIME ZONE %(tz)s)::date, (ts AT TIME ZONE %(tz)s)::time,
+                true, CASE WHEN i %% 4 = 0 THEN 'task' ELSE 'self' END
+            FROM (
+                SELECT i, now() - random() * %(days)s * interval '1 day' AS ts
+                FROM generate_series(1, %(visits)s) AS i
+            ) AS workload
+            """,
+            {
+                "mrs": mr_ids,
+                "doctors": doctor_ids,
+                "tz": settings.TIME_ZONE,
+                "days": days,
+                "visits": visits,
+            },
+        )
+        cursor.execute(
+            """
+            INSERT INTO visits_shopvisit (
+                mr_id, shop_name, location, notes, visited_at, visit_date, visit_time,
+                completed, visit_type
+            )
+            SELECT
+                (%(mrs)s::bigint[])[1 + i %% cardinality(%(mrs)s::bigint[])],
+                'Shop ' || (i %% 500), 'Area ' || (i %% 40), '',
+                ts, (ts AT TIME ZONE %(tz)s)::date, (ts AT TIME ZONE %(tz)s)::time,
+                true, CASE WHEN i %% 5 = 0 THEN 'task' ELSE 'self' END
+            FROM (
+                SELECT i, now() - random() * %(days)s * interval '1 day' AS ts
+                FROM generate_series(1, %(visits)s / 2) AS i
+            ) AS workload
+            """,
+            {"mrs": mr_ids, "tz": settings.TIME_ZONE, "days": days, "visits": visits},
+        )
+        cursor.execute(
+            """
+            INSERT INTO tasks_doctorvisittask (
+                assigned_to_id, assigned_by_id, assigned_doctor_id, assigned_date,
+                due_date, due_time, notes, completed
+            )
+            SELECT
+                (%(mrs)s::bigint[])[1 + i %% cardinality(%(mrs)s::bigint[])],
+                %(admin)s,
+                (%(doctors)s::bigint[])[
+                    1 + (i * 3) %% cardinality(%(doctors)s::bigint[])
+                ],
+                due - 3, due, '10:00', '', due < current_date - 2
+            FROM (
+                SELECT i, current_date - (random() * %(days)s)::int + 14 AS due
+                FROM generate_series(1, %(visits)s / 5) AS i
+            ) AS workload
+            """,
+            {
+                "mrs": mr_ids,
+                "doctors": doctor_ids,
+                "admin": admin.pk,
+                "days": days,
+                "visits": visits,
+            },
+        )
+        for model in (
+            User,
+            Doctor,
+            DoctorVisitTask,
+            *apps.get_app_config("visits").get_models(),
+        ):
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")  # noqa: SLF001
+
+    mr = User.objects.get(pk=mr_ids[0])
+    return admin, mr
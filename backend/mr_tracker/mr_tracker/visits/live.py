@@ -0,0 +1,212 @@
+"""
+Live visit counters for the dashboards' figures of the day.
+
+The admin dashboard's summary and the day's analytics counted the day's
+visits in SQL on every load. Each new visit now also updates Redis once its
+transaction commits, in one MULTI/EXEC, under keys for its day:
+
+- ``live-visits:{day}``: a hash of the day's doctor and shop visit counts;
+- ``live-visits:{day}:mrs:{doctor,shop,task,self}``: sorted sets of each
+  MR's doctor, shop, task-based and self visits;
+- ``live-visits:{day}:doctors``: a sorted set of visits per doctor.
+
+The day's totals, the number of MRs who saw a doctor and the top doctors
+are then constant-time reads, and the MR rankings one read per set.
+
+Edited and deleted visits, rows written without ``save()`` and increments
+lost while Redis was unreachable are not counted. ``reconcile_live_visits``
+recounts recent days from the table and replaces their keys in one
+MULTI/EXEC (schedule it every few minutes); a visit committed while it
+counts may be missed until its next run. A day is only read once it has
+been recounted (its hash has a ``built`` field), so a new day, or a
+flushed Redis, is counted in SQL until then.
+
+The counters are company-wide, so only ``company_wide`` admins read them;
+everyone else still gets their subtree's figures from SQL.
+"""
+
+import functools
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from mr_tracker.users.hierarchy import is_company_wide
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+
+logger = logging.getLogger(__name__)
+
+KINDS = ("doctor", "shop")
+MR_COUNTS = ("doctor", "shop", "task", "self")
+# Keys outlive their day long enough for late offline syncs to be recounted.
+KEEP_SECONDS = 3 * 24 * 60 * 60
+
+
+def _key(day, *parts):
+    return ":".join(("live-visits", day.isoformat(), *parts))
+
+
+def _day_keys(day):
+    return [
+        _key(day),
+        _key(day, "doctors"),
+        *(_key(day, "mrs", kind) for kind in MR_COUNTS),
+    ]
+
+
+def count_visits(day):
+    """The day's counts from the table, in the shape ``LiveVisits`` stores."""
+    counts = {
+        "totals": dict.fromkeys(KINDS, 0),
+        "mrs": {kind: {} for kind in MR_COUNTS},
+        "doctors": {},
+    }
+    for kind, model in (("doctor", DoctorVisit), ("shop", ShopVisit)):
+        rows = (
+            model.objects.filter(visit_date=day)
+            .values("mr", "visit_type")
+            .annotate(visits=Count("id"))
+            .order_by()
+        )
+        for row in rows:
+            counts["totals"][kind] += row["visits"]
+            for name in (kind, row["visit_type"]):
+                mrs = counts["mrs"][name]
+                mrs[row["mr"]] = mrs.get(row["mr"], 0) + row["visits"]
+    counts["doctors"] = dict(
+        DoctorVisit.objects.filter(visit_date=day)
+        .values_list("doctor_name")
+        .annotate(Count("id"))
+        .order_by(),
+    )
+    return counts
+
+
+class LiveVisits:
+    def __init__(self, redis):
+        self.redis = redis
+
+    def record(self, kind, day, mr_id, visit_type, doctor_id=None):
+        pipe = self.redis.pipeline()
+        pipe.hincrby(_key(day), kind, 1)
+        pipe.zincrby(_key(day, "mrs", kind), 1, mr_id)
+        pipe.zincrby(_key(day, "mrs", visit_type), 1, mr_id)
+        if doctor_id is not None:
+            pipe.zincrby(_key(day, "doctors"), 1, doctor_id)
+        for key in _day_keys(day):
+            pipe.expire(key, KEEP_SECONDS)
+        pipe.execute()
+
+    def read(self, day, *, top=1, per_mr=False):
+        """
+        The day's totals, MRs with doctor visits, ``top`` doctors and, with
+        ``per_mr``, each MR's counts; None if the day has not been counted.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(_key(day))
+        pipe.zcard(_key(day, "mrs", "doctor"))
+        pipe.zrevrange(_key(day, "doctors"), 0, top - 1, withscores=True)
+        if per_mr:
+            for kind in MR_COUNTS:
+                pipe.zrange(_key(day, "mrs", kind), 0, -1, withscores=True)
+        totals, visited, doctors, *mrs = pipe.execute()
+        if b"built" not in totals:
+            return None
+        live = {
+            **{kind: int(totals.get(kind.encode(), 0)) for kind in KINDS},
+            "mrs_visited": visited,
+            "top_doctors": [(int(doctor), int(visits)) for doctor, visits in doctors],
+        }
+        if per_mr:
+            live["per_mr"] = {
+                kind: {int(mr): int(visits) for mr, visits in rows}
+                for kind, rows in zip(MR_COUNTS, mrs, strict=True)
+            }
+        return live
+
+    def recount(self, day):
+        """
+        Replace the day's keys with counts from the table; returns the totals
+        before and after.
+        """
+        counts = count_visits(day)
+        previous = self.redis.hgetall(_key(day))
+        pipe = self.redis.pipeline()
+        pipe.delete(*_day_keys(day))
+        pipe.hset(_key(day), mapping={"built": 1, **counts["totals"]})
+        for kind, mrs in counts["mrs"].items():
+            if mrs:
+                pipe.zadd(_key(day, "mrs", kind), mrs)
+        if counts["doctors"]:
+            pipe.zadd(_key(day, "doctors"), counts["doctors"])
+        for key in _day_keys(day):
+            pipe.expire(key, KEEP_SECONDS)
+        pipe.execute()
+        before = {kind: int(previous.get(kind.encode(), 0)) for kind in KINDS}
+        return before, counts["totals"]
+
+
+@functools.cache
+def get_live_visits():
+    """The counters, or None when ``LIVE_VISIT_COUNTERS`` is off."""
+    if not settings.LIVE_VISIT_COUNTERS:
+        return None
+    from django_redis import get_redis_connection
+
+    return LiveVisits(get_redis_connection("default"))
+
+
+def _record(live, *args):
+    try:
+        live.record(*args)
+    except Exception:
+        logger.exception(
+            "Live visit counters unavailable, the next reconcile will count the visit",
+        )
+
+
+def count_on_commit(kind, visit):
+    """Add a new ``kind`` ("doctor" or "shop") visit to the counters once it commits."""
+    live = get_live_visits()
+    if live is None:
+        return
+    doctor_id = visit.doctor_name_id if kind == "doctor" else None
+    transaction.on_commit(
+        functools.partial(
+            _record,
+            live,
+            kind,
+            visit.visit_date,
+            visit.mr_id,
+            visit.visit_type,
+            doctor_id,
+        ),
+    )
+
+
+def read(user, day, **kwargs):
+    """
+    ``LiveVisits.read`` for a company-wide admin; None if ``user``'s figures
+    must come from SQL.
+    """
+    live = get_live_visits()
+    if live is None or not is_company_wide(user):
+        return None
+    try:
+        return live.read(day, **kwargs)
+    except Exception:
+        logger.exception("Live visit counters unavailable, counting in SQL")
+        return None
+
+
+def top_doctors(live):
+    """``(doctor, visits)`` for ``live["top_doctors"]``, most visited first."""
+    doctors = Doctor.objects.in_bulk([doctor for doctor, _ in live["top_doctors"]])
+    return [
+        (doctors[doctor], visits)
+        for doctor, visits in live["top_doctors"]
+        if doctor in doctors
+    ]
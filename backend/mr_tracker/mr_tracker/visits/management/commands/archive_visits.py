@@ -0,0 +1,86 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.visits.archive import ARCHIVES
+from mr_tracker.visits.archive import archive_path
+from mr_tracker.visits.archive import write_month
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.partitions import add_months
+from mr_tracker.visits.partitions import detach_partition
+from mr_tracker.visits.partitions import existing_partitions
+from mr_tracker.visits.partitions import month_floor
+
+
+class Command(BaseCommand):
+    help = (
+        "Move visits older than N months out of the database into compressed "
+        "Parquet files under MEDIA_ROOT/visit_archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=24,
+            metavar="MONTHS",
+            help="Archive whole months that ended more than MONTHS months ago.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the months that would be archived without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        if options["older_than"] < 1:
+            msg = "--older-than must be at least 1 month."
+            raise CommandError(msg)
+
+        cutoff = add_months(month_floor(timezone.localdate()), -options["older_than"])
+
+        for kind, (model, _) in ARCHIVES.items():
+            months = model.objects.filter(visit_date__lt=cutoff).dates(
+                "visit_date",
+                "month",
+            )
+            for month in months:
+                if options["dry_run"]:
+                    self.stdout.write(f"Would archive {kind} {month:%Y-%m}")
+                    continue
+
+                count = write_month(kind, month)
+                self._remove_month(model, month)
+                self.stdout.write(
+                    f"Archived {count} {kind} for {month:%Y-%m} "
+                    f"to {archive_path(kind, month)}",
+                )
+
+    def _remove_month(self, model, month):
+        """
+        Delete a month that is safely on disk.
+
+        The month's partition is detached and dropped when there is one, which
+        frees its index space immediately instead of leaving dead tuples behind.
+        """
+        month_rows = model.objects.filter(
+            visit_date__gte=month,
+            visit_date__lt=add_months(month, 1),
+        )
+        table = model._meta.db_table  # noqa: SLF001
+        partition = None
+        if connection.vendor == "postgresql":
+            partition = existing_partitions(table).get(month)
+
+        if partition is None:
+            month_rows.delete()
+            return
+
+        # Same effect as the SET_NULL cascade a row delete would have run.
+        if model is DoctorVisit:
+            DoctorVisitTask.objects.filter(visit_record__in=month_rows).update(
+                visit_record=None,
+            )
+        detach_partition(table, partition, drop=True)
@@ -0,0 +1,222 @@
+import datetime
+import inspect
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import migrations
+from django.db import transaction
+from django.db.migrations.autodetector import MigrationAutodetector
+from django.db.migrations.loader import MigrationLoader
+from django.db.migrations.writer import MigrationWriter
+from django.test.utils import override_settings
+from django.urls import resolve
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from rest_framework.test import force_authenticate
+
+from mr_tracker.users.models import User
+from mr_tracker.visits.index_advisor import QueryRecorder
+from mr_tracker.visits.index_advisor import analyse
+from mr_tracker.visits.index_advisor import explain
+from mr_tracker.visits.index_advisor import is_covered
+from mr_tracker.visits.index_advisor import seed_workload
+from mr_tracker.visits.models import DoctorVisit
+
+
+async def _result(awaitable):
+    return await awaitable
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the dashboard, analytics and list endpoints against a seeded "
+        "workload, EXPLAIN (ANALYZE, BUFFERS) every query they issue, report "
+        "large scans and sorts and propose indexes for them. All seeded data "
+        "is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--no-seed",
+            action="store_true",
+            help=(
+                "Use the data already in the database instead of a synthetic workload."
+            ),
+        )
+        parser.add_argument("--mrs", type=int, default=40, help="MRs to seed.")
+        parser.add_argument("--doctors", type=int, default=400, help="Doctors to seed.")
+        parser.add_argument(
+            "--visits",
+            type=int,
+            default=20_000,
+            help=(
+                "Doctor visits to seed; half as many shop visits and a fifth "
+                "as many tasks."
+            ),
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=120,
+            help="Spread seeded visits over this many days.",
+        )
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=1000,
+            help="Ignore scans and sorts that touch fewer rows than this.",
+        )
+        parser.add_argument(
+            "--write-migrations",
+            action="store_true",
+            help="Write a migration per app with the proposed indexes.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            msg = "The index advisor needs PostgreSQL."
+            raise CommandError(msg)
+
+        proposals = {}
+        with transaction.atomic():
+            if options["no_seed"]:
+                admin = User.objects.filter(role="admin", company_wide=True).first()
+                mr = User.objects.filter(
+                    pk__in=DoctorVisit.objects.values("mr")[:1],
+                ).first()
+                if admin is None or mr is None:
+                    msg = (
+                        "--no-seed needs a company-wide admin and an MR with "
+                        "visits in the database."
+                    )
+                    raise CommandError(msg)
+            else:
+                admin, mr = seed_workload(
+                    mrs=options["mrs"],
+                    doctors=options["doctors"],
+                    visits=options["visits"],
+                    days=options["days"],
+                )
+
+            for label, user, url, params in self._endpoints(admin, mr):
+                self._advise(label, user, url, params, options["min_rows"], proposals)
+            transaction.set_rollback(True)
+
+        self._report_proposals(proposals)
+        if options["write_migrations"] and proposals:
+            self._write_migrations(proposals)
+
+    def _endpoints(self, admin, mr):
+        since = (timezone.localdate() - datetime.timedelta(days=30)).isoformat()
+        return [
+            ("MR dashboard", mr, reverse("mr-dashboard"), {}),
+            ("admin dashboard", admin, reverse("admin-dashboard"), {}),
+            ("analytics (day)", admin, reverse("admin-analytics"), {"period": "day"}),
+            (
+                "analytics (month)",
+                admin,
+                reverse("admin-analytics"),
+                {"period": "month"},
+            ),
+            (
+                "MR detail (30 days)",
+                admin,
+                reverse("admin-mr-detail", kwargs={"mr_id": mr.id}),
+                {"start_date": since},
+            ),
+            ("MR list", admin, reverse("api:users_api:mr_list"), {}),
+            ("doctor visits (MR)", mr, reverse("doctor-visits-list"), {}),
+            ("doctor visits (admin)", admin, reverse("doctor-visits-list"), {}),
+            ("shop visits (MR)", mr, reverse("shop-visits-list"), {}),
+            ("shop visits (admin)", admin, reverse("shop-visits-list"), {}),
+            ("timeline (MR)", mr, reverse("visit-timeline"), {}),
+            ("timeline (admin)", admin, reverse("visit-timeline"), {}),
+            ("tasks (MR)", mr, reverse("doctor-tasks-list"), {}),
+            ("tasks (admin)", admin, reverse("doctor-tasks-list"), {}),
+        ]
+
+    def _advise(self, label, user, url, params, min_rows, proposals):
+        request = APIRequestFactory().get(url, params)
+        force_authenticate(request, user=user)
+        match = resolve(url)
+        # The request never leaves the process; accept the factory's host name.
+        recorder = QueryRecorder()
+        with (
+            override_settings(ALLOWED_HOSTS=["testserver"]),
+            connection.execute_wrapper(recorder),
+        ):
+            response = match.func(request, *match.args, **match.kwargs)
+            if inspect.isawaitable(response):
+                response = async_to_sync(_result)(response)
+        if response.status_code >= 400:  # noqa: PLR2004
+            self.stderr.write(f"{label}: HTTP {response.status_code}, skipped")
+            return
+
+        self.stdout.write(
+            self.style.MIGRATE_HEADING(
+                f"{label}: {recorder.total} queries, {len(recorder.queries)} distinct",
+            ),
+        )
+        for sql, times in recorder.queries.values():
+            findings = analyse(explain(sql), min_rows=min_rows)
+            if times > 1:
+                self.stdout.write(f"  repeated {times}x: {sql[:120]}")
+            for finding in findings:
+                self.stdout.write(
+                    f"  {finding['node']} on {finding['table'] or '?'} "
+                    f"({finding['rows']} rows): {finding['detail']}",
+                )
+                if "index" not in finding or is_covered(
+                    finding["model"],
+                    finding["index"],
+                ):
+                    continue
+                model, index = finding["model"], finding["index"]
+                proposals.setdefault((model, index.name), (model, index))
+
+    def _report_proposals(self, proposals):
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("No missing indexes found."))
+            return
+        self.stdout.write(
+            self.style.MIGRATE_HEADING("Proposed indexes (add to Meta.indexes):"),
+        )
+        for model, index in proposals.values():
+            arguments = f"fields={index.fields!r}"
+            if index.condition is not None:
+                lookups = ", ".join(
+                    f"{key}={value!r}" for key, value in index.condition.children
+                )
+                arguments += f", condition=Q({lookups}), name={index.name!r}"
+            self.stdout.write(f"  {model._meta.label}: models.Index({arguments})")  # noqa: SLF001
+
+    def _write_migrations(self, proposals):
+        loader = MigrationLoader(connection, ignore_no_migrations=True)
+        by_app = {}
+        for model, index in proposals.values():
+            by_app.setdefault(model._meta.app_label, []).append((model, index))  # noqa: SLF001
+
+        for app_label, indexes in by_app.items():
+            leaves = [
+                name for app, name in loader.graph.leaf_nodes() if app == app_label
+            ]
+            number = (
+                max(
+                    (MigrationAutodetector.parse_number(name) or 0 for name in leaves),
+                    default=0,
+                )
+                + 1
+            )
+            migration = migrations.Migration(f"{number:04d}_index_advisor", app_label)
+            migration.dependencies = [(app_label, name) for name in leaves]
+            migration.operations = [
+                migrations.AddIndex(model_name=model._meta.model_name, index=index)  # noqa: SLF001
+                for model, index in indexes
+            ]
+            writer = MigrationWriter(migration)
+            Path(writer.path).write_text(writer.as_string())
+            self.stdout.write(f"Wrote {writer.path}")
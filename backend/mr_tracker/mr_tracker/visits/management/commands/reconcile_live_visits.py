@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from mr_tracker.visits.live import get_live_visits
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the live visit counters of recent days from the visit tables "
+        "and replace them in Redis. Run every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=2,
+            help="Recount today and the days before it, this many in all.",
+        )
+
+    def handle(self, *args, **options):
+        live = get_live_visits()
+        if live is None:
+            msg = "LIVE_VISIT_COUNTERS is off"
+            raise CommandError(msg)
+        today = timezone.localdate()
+        for offset in range(options["days"]):
+            day = today - timedelta(days=offset)
+            before, after = live.recount(day)
+            self.stdout.write(
+                f"{day}: {after['doctor']} doctor visits "
+                f"({after['doctor'] - before['doctor']:+d}), "
+                f"{after['shop']} shop visits "
+                f"({after['shop'] - before['shop']:+d})",
+            )
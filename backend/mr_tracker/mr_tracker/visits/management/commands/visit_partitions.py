@@ -0,0 +1,116 @@
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from django.db import connection
+from django.utils import timezone
+
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.visits.archive import ARCHIVES
+from mr_tracker.visits.archive import archive_path
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.partitions import PARTITIONED_TABLES
+from mr_tracker.visits.partitions import add_months
+from mr_tracker.visits.partitions import create_partition
+from mr_tracker.visits.partitions import detach_partition
+from mr_tracker.visits.partitions import existing_partitions
+from mr_tracker.visits.partitions import month_floor
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-create upcoming monthly partitions for the visit tables and "
+        "optionally detach old ones. Run daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead",
+            type=int,
+            default=3,
+            help="Create partitions up to this many months after the current one.",
+        )
+        parser.add_argument(
+            "--detach-older-than",
+            type=int,
+            metavar="MONTHS",
+            help="Detach partitions that end more than MONTHS months ago.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help=(
+                "Drop detached partitions instead of keeping them as plain tables. "
+                "Months with visits must have been archived first (archive_visits)."
+            ),
+        )
+        parser.add_argument(
+            "--lock-timeout",
+            default="5s",
+            help="Give up on DDL that waits longer than this for a lock.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            msg = "Visit partitions are only supported on PostgreSQL."
+            raise CommandError(msg)
+
+        # Fail fast rather than queueing behind a long report query, which
+        # would block every visit insert queued up behind the DDL.
+        with connection.cursor() as cursor:
+            cursor.execute("SET lock_timeout = %s", [options["lock_timeout"]])
+
+        this_month = month_floor(timezone.localdate())
+        for table in PARTITIONED_TABLES:
+            # Last month too: offline visits may be synced a few days late.
+            for offset in range(-1, options["months_ahead"] + 1):
+                month = add_months(this_month, offset)
+                if create_partition(table, month):
+                    self.stdout.write(f"Created {table} partition for {month:%Y-%m}")
+
+            if options["detach_older_than"] is None:
+                continue
+
+            cutoff = add_months(this_month, -options["detach_older_than"])
+            old = {
+                month: name
+                for month, name in existing_partitions(table).items()
+                if add_months(month, 1) <= cutoff
+            }
+            kind, model = self._archive(table)
+            if options["drop"]:
+                unarchived = [
+                    month
+                    for month in old
+                    if self._month_rows(model, month).exists()
+                    and not archive_path(kind, month).exists()
+                ]
+                if unarchived:
+                    months = ", ".join(f"{month:%Y-%m}" for month in unarchived)
+                    msg = (
+                        f"Not dropping {table} months that are not archived: {months}. "
+                        "Run archive_visits first."
+                    )
+                    raise CommandError(msg)
+
+            for month, name in old.items():
+                # The detached rows leave the table: unlink them like the
+                # SET_NULL cascade a row delete would have run.
+                if model is DoctorVisit:
+                    DoctorVisitTask.objects.filter(
+                        visit_record__in=self._month_rows(model, month),
+                    ).update(visit_record=None)
+                detach_partition(table, name, drop=options["drop"])
+                action = "Dropped" if options["drop"] else "Detached"
+                self.stdout.write(f"{action} {name}")
+
+    def _archive(self, table):
+        for kind, (model, _) in ARCHIVES.items():
+            if model._meta.db_table == table:  # noqa: SLF001
+                return kind, model
+        msg = f"No archive for {table}"
+        raise CommandError(msg)
+
+    def _month_rows(self, model, month):
+        return model.objects.filter(
+            visit_date__gte=month,
+            visit_date__lt=add_months(month, 1),
+        )
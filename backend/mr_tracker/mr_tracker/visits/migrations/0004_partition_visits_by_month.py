@@ -0,0 +1,115 @@
+"""
+Rebuild the visit tables as PostgreSQL tables range-partitioned by month on
+``visit_date``.
+
+PostgreSQL cannot turn an existing table into a partitioned one, so each table
+is renamed, a partitioned parent with the same columns is created, the rows are
+copied across and the old table is dropped. Secondary indexes and foreign keys
+are captured before the rename and recreated on the parent under their original
+names so later migrations can still find them. The primary key becomes
+``(id, visit_date)`` because every unique constraint on a partitioned table must
+include the partition key.
+
+Partitions are created from the month of the oldest visit up to three months
+ahead; ``manage.py visit_partitions`` keeps creating future months after that.
+"""
+import datetime
+
+from django.db import migrations
+from django.utils import timezone
+
+TABLES = ("visits_doctorvisit", "visits_shopvisit")
+MONTHS_AHEAD = 3
+
+
+def _add_months(day, months):
+    index = day.year * 12 + (day.month - 1) + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def _partition_table(cursor, table):
+    old_table = f"{table}_unpartitioned"
+
+    cursor.execute(
+        """
+        SELECT indexdef FROM pg_indexes
+        WHERE tablename = %s
+          AND indexname NOT IN (
+              SELECT conname FROM pg_constraint
+              WHERE conrelid = %s::regclass AND contype = 'p'
+          )
+        """,
+        [table, table],
+    )
+    index_defs = [row[0] for row in cursor.fetchall()]
+
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype = 'f'
+        """,
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+
+    cursor.execute(f"SELECT min(visit_date), max(id) FROM {table}")
+    first_visit, max_id = cursor.fetchone()
+
+    cursor.execute(f"ALTER TABLE {table} RENAME TO {old_table}")
+    cursor.execute(
+        f"CREATE TABLE {table} (LIKE {old_table} INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (visit_date)"
+    )
+
+    today = timezone.localdate()
+    month = (first_visit or today).replace(day=1)
+    last_month = _add_months(today, MONTHS_AHEAD)
+    while month <= last_month:
+        cursor.execute(
+            f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+            "FOR VALUES FROM (%s) TO (%s)",
+            [month, _add_months(month, 1)],
+        )
+        month = _add_months(month, 1)
+
+    cursor.execute(f"INSERT INTO {table} SELECT * FROM {old_table}")
+    # Dropping the old table also drops its identity sequence, whose name the
+    # replacement sequence below reuses.
+    cursor.execute(f"DROP TABLE {old_table}")
+
+    cursor.execute(f"CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    if max_id is not None:
+        cursor.execute(f"SELECT setval('{table}_id_seq', %s)", [max_id])
+    cursor.execute(
+        f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')"
+    )
+    cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY (id, visit_date)")
+
+    for index_def in index_defs:
+        cursor.execute(index_def)
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+
+
+def partition_visit_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            _partition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("visits", "0003_doctorvisit_visit_type_shopvisit_visit_type_and_more"),
+        # The FK from DoctorVisitTask.visit_record must be gone before the
+        # referenced primary key changes.
+        ("tasks", "0002_visit_record_no_db_constraint"),
+    ]
+
+    operations = [
+        # The partitioned tables have the same columns as before, so the
+        # Django model state is unchanged and going backwards needs no work.
+        migrations.RunPython(partition_visit_tables, migrations.RunPython.noop),
+    ]
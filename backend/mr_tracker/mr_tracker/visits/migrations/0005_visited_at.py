@@ -0,0 +1,141 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:51
+
+import datetime
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min
+
+
+def _add_months(day, months):
+    index = day.year * 12 + (day.month - 1) + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def backfill_visited_at(apps, schema_editor):
+    """
+    Combine the existing local visit_date/visit_time into visited_at.
+
+    One UPDATE per month keeps each statement inside a single partition and
+    commits as it goes, so no long-running transaction holds the whole table.
+    """
+    for model_name in ("DoctorVisit", "ShopVisit"):
+        model = apps.get_model("visits", model_name)
+        table = model._meta.db_table
+        bounds = model.objects.aggregate(first=Min("visit_date"), last=Max("visit_date"))
+        if bounds["first"] is None:
+            continue
+
+        month = bounds["first"].replace(day=1)
+        with schema_editor.connection.cursor() as cursor:
+            while month <= bounds["last"]:
+                cursor.execute(
+                    f"UPDATE {table} SET visited_at = (visit_date + visit_time) AT TIME ZONE %s "
+                    "WHERE visit_date >= %s AND visit_date < %s AND visited_at IS NULL",
+                    [settings.TIME_ZONE, month, _add_months(month, 1)],
+                )
+                month = _add_months(month, 1)
+
+
+class Migration(migrations.Migration):
+
+    # The backfill commits month by month.
+    atomic = False
+
+    dependencies = [
+        ('visits', '0004_partition_visits_by_month'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='doctorvisit',
+            options={'ordering': ['-visited_at']},
+        ),
+        migrations.AlterModelOptions(
+            name='shopvisit',
+            options={'ordering': ['-visited_at']},
+        ),
+        migrations.RemoveIndex(
+            model_name='doctorvisit',
+            name='visits_doct_mr_id_36a7f0_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='doctorvisit',
+            name='visits_doct_visit_d_3ffb1a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='shopvisit',
+            name='visits_shop_mr_id_38f99c_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='shopvisit',
+            name='visits_shop_visit_d_608ae0_idx',
+        ),
+        migrations.AddField(
+            model_name='doctorvisit',
+            name='visited_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AddField(
+            model_name='shopvisit',
+            name='visited_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_visited_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='doctorvisit',
+            name='visited_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='shopvisit',
+            name='visited_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='doctorvisit',
+            name='visit_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='doctorvisit',
+            name='visit_time',
+            field=models.TimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='shopvisit',
+            name='visit_date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='shopvisit',
+            name='visit_time',
+            field=models.TimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['mr', '-visited_at'], name='visits_doct_mr_id_1c6a29_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['visit_date', '-visited_at'], name='visits_doct_visit_d_a1bb8b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['-visited_at'], name='visits_doct_visited_1d111d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopvisit',
+            index=models.Index(fields=['mr', '-visited_at'], name='visits_shop_mr_id_d5c9a7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopvisit',
+            index=models.Index(fields=['visit_date', '-visited_at'], name='visits_shop_visit_d_cdc737_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopvisit',
+            index=models.Index(fields=['-visited_at'], name='visits_shop_visited_bd424e_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0005_visited_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['mr', 'visit_date', '-visited_at'], name='visits_doct_mr_id_292be8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['mr', 'visit_type', 'visit_date'], name='visits_doct_mr_id_cccb91_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopvisit',
+            index=models.Index(fields=['mr', 'visit_date', '-visited_at'], name='visits_shop_mr_id_9275fc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopvisit',
+            index=models.Index(fields=['mr', 'visit_type', 'visit_date'], name='visits_shop_mr_id_d50c66_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0007_search_vectors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
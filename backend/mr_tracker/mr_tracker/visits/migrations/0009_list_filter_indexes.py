@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 02:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0008_doctor_location'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['doctor_name', 'visit_date'], name='visits_doct_doctor__4cca4b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorvisit',
+            index=models.Index(fields=['visit_type', 'visit_date'], name='visits_doct_visit_t_c279d1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopvisit',
+            index=models.Index(fields=['visit_type', 'visit_date'], name='visits_shop_visit_t_028b5a_idx'),
+        ),
+    ]
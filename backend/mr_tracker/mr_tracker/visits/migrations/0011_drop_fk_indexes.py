@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# The single-column FK indexes duplicate the leading column of the
+# (mr, ...) and (doctor_name, visit_date) composites. Only the indexes are
+# dropped: AlterField would also drop and re-add (and so re-validate) the
+# foreign keys on the two biggest tables.
+FK_INDEXES = [
+    ("visits_doctorvisit", "visits_doctorvisit_doctor_name_id_adc867e6", "doctor_name_id"),
+    ("visits_doctorvisit", "visits_doctorvisit_mr_id_3edb7433", "mr_id"),
+    ("visits_shopvisit", "visits_shopvisit_mr_id_9b0cf161", "mr_id"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('visits', '0010_territories'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    f'DROP INDEX IF EXISTS "{name}"',
+                    f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}")',
+                )
+                for table, name, column in FK_INDEXES
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='doctorvisit',
+                    name='doctor_name',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='doctor', to='visits.doctor'),
+                ),
+                migrations.AlterField(
+                    model_name='doctorvisit',
+                    name='mr',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='doctor_visits', to=settings.AUTH_USER_MODEL),
+                ),
+                migrations.AlterField(
+                    model_name='shopvisit',
+                    name='mr',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='shop_visits', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+    ]
@@ -1,9 +1,64 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.utils import timezone
+
 from mr_tracker.users.models import User
 
+SEARCH_CONFIG = "english"
+
+
+def generated_search_vector(*weighted_fields):
+    """A stored tsvector column generated from ``(field, weight)`` pairs."""
+    vectors = [
+        SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        for field, weight in weighted_fields
+    ]
+    expression = vectors[0]
+    for vector in vectors[1:]:
+        expression += vector
+    return models.GeneratedField(
+        expression=expression,
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+
+def local_date_time(moment):
+    """Split an aware datetime into the local (TIME_ZONE) date and time."""
+    local = timezone.localtime(moment)
+    return local.date(), local.time()
+
+
+class Territory(models.Model):
+    """A sales territory: the doctors in it and the MRs who cover it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    mrs = models.ManyToManyField(
+        User,
+        blank=True,
+        related_name="territories",
+        limit_choices_to={"role": "MR"},
+    )
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ["name"]
+
+
 class Doctor(models.Model):
     name = models.CharField(max_length=255)
     specialization = models.CharField(max_length=255)
+    territory = models.ForeignKey(
+        Territory,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="doctors",
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.SET_NULL,
@@ -11,9 +66,23 @@ class Doctor(models.Model):
         blank=True,
         related_name="doctors_created"
     )
+    # Clinic location, used to plan routes. Falls back to visit GPS if unset.
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    search_vector = generated_search_vector(("name", "A"), ("specialization", "B"))
 
     def __str__(self):
         return self.name
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"]),
+            GinIndex(
+                fields=["name"],
+                opclasses=["gin_trgm_ops"],
+                name="visits_doctor_name_trgm",
+            ),
+        ]
     
 
 class DoctorVisit(models.Model):
@@ -22,15 +91,29 @@ class DoctorVisit(models.Model):
         ('task', 'Task-Based Visit'),
     ]
 
-    mr = models.ForeignKey(User,on_delete=models.CASCADE, related_name='doctor_visits')
-    doctor_name = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name='doctor')
+    # Indexed by the (mr, ...) and (doctor_name, visit_date) indexes below.
+    mr = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="doctor_visits",
+        db_index=False,
+    )
+    doctor_name = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        related_name="doctor",
+        db_index=False,
+    )
     gps_lat = models.FloatField(null=True, blank=True)
     gps_long = models.FloatField(null=True, blank=True)
 
     notes = models.TextField(blank=True)
 
-    visit_date = models.DateField(auto_now_add=True)
-    visit_time = models.TimeField(auto_now_add=True)
+    visited_at = models.DateTimeField(default=timezone.now)
+    # Local date/time of visited_at, kept in sync by save(). visit_date is the
+    # partition key, so it has to be a stored column.
+    visit_date = models.DateField(editable=False)
+    visit_time = models.TimeField(editable=False)
 
     completed = models.BooleanField(default=False)
     
@@ -40,15 +123,29 @@ class DoctorVisit(models.Model):
         default='self'
     )
 
+    search_vector = generated_search_vector(("notes", "C"))
+
+    def save(self, *args, **kwargs):
+        self.visit_date, self.visit_time = local_date_time(self.visited_at)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Visit to {self.doctor_name} by {self.mr.username} on {self.visit_date}"
     
     class Meta:
-        ordering = ['-visit_date', '-visit_time']
+        ordering = ["-visited_at"]
         indexes = [
-            models.Index(fields=['mr', '-visit_date']),
-            models.Index(fields=['visit_date', '-visit_time']),
+            models.Index(fields=["mr", "-visited_at"]),
+            models.Index(fields=["visit_date", "-visited_at"]),
+            models.Index(fields=["-visited_at"]),
+            # From `manage.py index_advisor`: an MR's visits in a date range,
+            # and the per-MR task/self counts in analytics and MR detail.
+            models.Index(fields=["mr", "visit_date", "-visited_at"]),
+            models.Index(fields=["mr", "visit_type", "visit_date"]),
+            # Admin list filters without an MR (see filter_visits).
+            models.Index(fields=["doctor_name", "visit_date"]),
+            models.Index(fields=["visit_type", "visit_date"]),
+            GinIndex(fields=["search_vector"]),
         ]
 
 class ShopVisit(models.Model):
@@ -57,15 +154,23 @@ class ShopVisit(models.Model):
         ('task', 'Task-Based Visit'),
     ]
 
-    mr = models.ForeignKey(User, on_delete=models.CASCADE, related_name='shop_visits')
+    # Indexed by the (mr, ...) indexes below.
+    mr = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shop_visits",
+        db_index=False,
+    )
     
     shop_name = models.CharField(max_length=255)
     location = models.CharField(max_length=255, blank=True, null=True)
     contact_person = models.CharField(max_length=255, blank=True, null=True)
     notes = models.TextField(blank=True)
 
-    visit_date = models.DateField(auto_now_add=True)
-    visit_time = models.TimeField(auto_now_add=True)
+    visited_at = models.DateTimeField(default=timezone.now)
+    # Local date/time of visited_at, kept in sync by save().
+    visit_date = models.DateField(editable=False)
+    visit_time = models.TimeField(editable=False)
     completed = models.BooleanField(default=False)
     
     visit_type = models.CharField(
@@ -74,14 +179,38 @@ class ShopVisit(models.Model):
         default='self'
     )
 
+    search_vector = generated_search_vector(
+        ("shop_name", "A"),
+        ("location", "B"),
+        ("contact_person", "B"),
+        ("notes", "C"),
+    )
+
+    def save(self, *args, **kwargs):
+        self.visit_date, self.visit_time = local_date_time(self.visited_at)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Shop Visit to {self.shop_name} by {self.mr.username} on {self.id}"
     
     class Meta:
-        ordering = ['-visit_date', '-visit_time']
+        ordering = ["-visited_at"]
         indexes = [
-            models.Index(fields=['mr', '-visit_date']),
-            models.Index(fields=['visit_date', '-visit_time']),
+            models.Index(fields=["mr", "-visited_at"]),
+            models.Index(fields=["visit_date", "-visited_at"]),
+            models.Index(fields=["-visited_at"]),
+            # From `manage.py index_advisor`: an MR's visits in a date range,
+            # and the per-MR task/self counts in analytics and MR detail.
+            models.Index(fields=["mr", "visit_date", "-visited_at"]),
+            models.Index(fields=["mr", "visit_type", "visit_date"]),
+            # Admin list filter without an MR (see filter_visits).
+            models.Index(fields=["visit_type", "visit_date"]),
+            GinIndex(fields=["search_vector"]),
+            GinIndex(
+                fields=["shop_name"],
+                opclasses=["gin_trgm_ops"],
+                name="visits_shop_name_trgm",
+            ),
         ]
 
 
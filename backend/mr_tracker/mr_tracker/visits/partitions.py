@@ -0,0 +1,82 @@
+"""
+Helpers for the monthly range partitions of the visit tables.
+
+``visits_doctorvisit`` and ``visits_shopvisit`` are partitioned by month on
+``visit_date`` (see migration 0004). Each partition is named
+``<table>_pYYYY_MM`` and covers ``[first of month, first of next month)``.
+"""
+
+import datetime
+import re
+
+from django.db import connection
+
+PARTITIONED_TABLES = ("visits_doctorvisit", "visits_shopvisit")
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_floor(day: datetime.date) -> datetime.date:
+    return day.replace(day=1)
+
+
+def add_months(day: datetime.date, months: int) -> datetime.date:
+    index = day.year * 12 + (day.month - 1) + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime.date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def existing_partitions(table: str) -> dict[datetime.date, str]:
+    """Return ``{first day of month: partition name}`` for attached partitions."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            year, month = (int(part) for part in match.groups())
+            partitions[datetime.date(year, month, 1)] = name
+    return dict(sorted(partitions.items()))
+
+
+def create_partition(table: str, month: datetime.date) -> bool:
+    """Create the partition holding ``month``. Returns False if it already exists."""
+    month = month_floor(month)
+    name = partition_name(table, month)
+    if month in existing_partitions(table):
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)",
+            [month, add_months(month, 1)],
+        )
+    return True
+
+
+def detach_partition(table: str, name: str, *, drop: bool = False) -> None:
+    """
+    Detach a partition without blocking reads or writes on the parent.
+
+    ``DETACH ... CONCURRENTLY`` only takes a SHARE UPDATE EXCLUSIVE lock on the
+    parent, but it cannot run inside a transaction block, so callers must be in
+    autocommit mode (management commands are, unless wrapped in ``atomic``).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY")
+        if drop:
+            cursor.execute(f"DROP TABLE {name}")
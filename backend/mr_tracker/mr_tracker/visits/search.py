@@ -0,0 +1,99 @@
+"""
+Full-text search over doctors, doctor visits and shop visits.
+
+Each model has a generated ``search_vector`` column with a GIN index (see
+``generated_search_vector``). Doctor and shop names also have trigram GIN
+indexes, so a misspelt name still matches. The same filters back the
+``/api/search/`` endpoint and the Django admin search box.
+"""
+
+import heapq
+import itertools
+
+from django.contrib.postgres.search import SearchQuery
+from django.contrib.postgres.search import SearchRank
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db.models import F
+from django.db.models import Q
+from django.db.models.functions import Greatest
+
+from mr_tracker.users.models import User
+from mr_tracker.visits.models import SEARCH_CONFIG
+from mr_tracker.visits.models import Doctor
+
+# Breaks ties between results of different kinds with the same rank.
+KIND_RANK = {"doctor_visit": 0, "shop_visit": 1, "doctor": 2}
+
+
+def search_query(text: str) -> SearchQuery:
+    return SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def doctor_matches(text: str) -> Q:
+    return Q(search_vector=search_query(text)) | Q(name__trigram_similar=text)
+
+
+def shop_visit_matches(text: str) -> Q:
+    return Q(search_vector=search_query(text)) | Q(shop_name__trigram_similar=text)
+
+
+def doctor_visit_matches(text: str) -> Q:
+    return Q(search_vector=search_query(text))
+
+
+def ranked(queryset, text: str, *, trigram_field: str | None = None):
+    """
+    ``queryset`` narrowed to matches for ``text`` and annotated with ``rank``.
+
+    With ``trigram_field`` a fuzzy match on that field also counts, ranked by
+    its similarity when that beats the full-text rank.
+    """
+    query = search_query(text)
+    matches = Q(search_vector=query)
+    rank = SearchRank(F("search_vector"), query)
+    if trigram_field is not None:
+        matches |= Q(**{f"{trigram_field}__trigram_similar": text})
+        rank = Greatest(rank, TrigramSimilarity(trigram_field, text))
+    return queryset.filter(matches).annotate(rank=rank)
+
+
+def admin_search(queryset, text: str, matches, *, by_doctor: bool = False):
+    """
+    Admin ``get_search_results`` through the search indexes.
+
+    ``matches`` is one of the ``*_matches`` helpers. Visits additionally match
+    on the MR's username and, with ``by_doctor``, on the visited doctor.
+    """
+    if not text:
+        return queryset, False
+    condition = matches(text)
+    if "mr" in {field.name for field in queryset.model._meta.fields}:  # noqa: SLF001
+        condition |= Q(mr__in=User.objects.filter(username__icontains=text))
+    if by_doctor:
+        condition |= Q(doctor_name__in=Doctor.objects.filter(doctor_matches(text)))
+    return queryset.filter(condition), False
+
+
+def _stream(kind, rows):
+    rank = KIND_RANK[kind]
+    for row in rows:
+        yield (row.rank, rank, row.pk), kind, row
+
+
+def merge_ranked(querysets: dict, *, page: int, page_size: int):
+    """
+    Return page ``page`` of ``querysets`` (kind -> ``ranked`` queryset), best first.
+
+    The result is ``(entries, has_next)`` with ``(kind, object)`` entries.
+    Each query is limited to the rows the page can need, and the ranked
+    streams are merged lazily.
+    """
+    limit = page * page_size + 1
+    streams = [
+        _stream(kind, queryset.order_by("-rank", "-id")[:limit])
+        for kind, queryset in querysets.items()
+    ]
+    merged = heapq.merge(*streams, key=lambda entry: entry[0], reverse=True)
+    entries = list(itertools.islice(merged, (page - 1) * page_size, limit))
+    has_next = len(entries) > page_size
+    return [(kind, row) for _, kind, row in entries[:page_size]], has_next
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from mr_tracker.visits.live import count_on_commit
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+
+
+@receiver(post_save, sender=DoctorVisit)
+def count_doctor_visit(sender, instance, created, **kwargs):
+    if created:
+        count_on_commit("doctor", instance)
+
+
+@receiver(post_save, sender=ShopVisit)
+def count_shop_visit(sender, instance, created, **kwargs):
+    if created:
+        count_on_commit("shop", instance)
@@ -0,0 +1,89 @@
+"""
+Territory-scoped doctor directories and territory rollups.
+
+An MR assigned to territories sees only the doctors in them: one semi-join
+from ``Doctor.territory`` (indexed) to the MR's assignments (indexed by
+user), so the cost follows the territory's size rather than the directory's.
+An MR with no territory yet keeps the whole directory, and admins always do.
+"""
+
+from django.db.models import Count
+from django.db.models import Q
+
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import Territory
+
+Assignment = Territory.mrs.through
+
+
+def territory_ids(user):
+    return Assignment.objects.filter(user=user).values("territory")
+
+
+def doctors_for(user, queryset=None):
+    """``queryset`` (all doctors by default) as far as ``user`` may see it."""
+    if queryset is None:
+        queryset = Doctor.objects.all()
+    if user.role != "MR" or not territory_ids(user).exists():
+        return queryset
+    return queryset.filter(territory__in=territory_ids(user))
+
+
+def territory_rollup(visits, tasks, mrs=None):
+    """
+    Per-territory figures from ``visits`` (doctor visits) and ``tasks``.
+
+    Returns one dict per territory, by name: its doctor and MR counts, the
+    visits to its doctors, how many of its doctors were visited and their
+    share, and the pending tasks for its doctors. Doctors without a
+    territory are left out. With ``mrs`` (a queryset of MRs), only the
+    territories they cover are listed and only they are counted as their
+    MRs. Five grouped queries, however many territories.
+    """
+    territories = Territory.objects.all()
+    doctors = Doctor.objects.exclude(territory=None)
+    assignments = Assignment.objects.all()
+    if mrs is not None:
+        assignments = assignments.filter(user__in=mrs.values("pk"))
+        territories = territories.filter(pk__in=assignments.values("territory"))
+        doctors = doctors.filter(territory__in=assignments.values("territory"))
+    doctors = dict(doctors.values_list("territory").annotate(Count("id")).order_by())
+    mr_counts = dict(
+        assignments.values_list("territory").annotate(Count("user")).order_by(),
+    )
+    visited = {
+        row["doctor_name__territory"]: row
+        for row in visits.exclude(doctor_name__territory=None)
+        .values("doctor_name__territory")
+        .annotate(
+            visits=Count("id"),
+            doctors_visited=Count("doctor_name", distinct=True),
+        )
+        .order_by()
+    }
+    pending = dict(
+        tasks.filter(Q(completed=False), ~Q(assigned_doctor__territory=None))
+        .values_list("assigned_doctor__territory")
+        .annotate(Count("id"))
+        .order_by(),
+    )
+
+    rollup = []
+    for territory in territories.order_by("name").values("id", "name"):
+        pk = territory["id"]
+        row = visited.get(pk, {"visits": 0, "doctors_visited": 0})
+        rollup.append(
+            {
+                "territory_id": pk,
+                "territory": territory["name"],
+                "doctors": doctors.get(pk, 0),
+                "mrs": mr_counts.get(pk, 0),
+                "visits": row["visits"],
+                "doctors_visited": row["doctors_visited"],
+                "coverage": round(100 * row["doctors_visited"] / doctors[pk], 1)
+                if doctors.get(pk)
+                else 0.0,
+                "pending_tasks": pending.get(pk, 0),
+            },
+        )
+    return rollup
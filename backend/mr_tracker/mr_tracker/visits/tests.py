@@ -1,3 +1,773 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import itertools
+from io import StringIO
 
-# Create your tests here.
+import fakeredis
+import pytest
+from django.contrib import admin
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from mr_tracker.dashboard import sections
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.models import User
+from mr_tracker.users.tests.factories import UserFactory
+from mr_tracker.visits import live
+from mr_tracker.visits.admin import DoctorVisitAdmin
+from mr_tracker.visits.api.serializers import VisitFilterSerializer
+from mr_tracker.visits.api.views import filter_visits
+from mr_tracker.visits.archive import archive_path
+from mr_tracker.visits.archive import archived_months
+from mr_tracker.visits.index_advisor import analyse
+from mr_tracker.visits.index_advisor import seed_workload
+from mr_tracker.visits.index_advisor import unindexed_scans
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import DoctorVisit
+from mr_tracker.visits.models import ShopVisit
+from mr_tracker.visits.models import Territory
+from mr_tracker.visits.partitions import PARTITIONED_TABLES
+from mr_tracker.visits.partitions import add_months
+from mr_tracker.visits.partitions import create_partition
+from mr_tracker.visits.partitions import existing_partitions
+from mr_tracker.visits.partitions import month_floor
+from mr_tracker.visits.partitions import partition_name
+from mr_tracker.visits.search import doctor_visit_matches
+from mr_tracker.visits.search import shop_visit_matches
+from mr_tracker.visits.territories import doctors_for
+
+pytestmark = pytest.mark.django_db
+
+
+def test_visit_tables_have_current_month_partition():
+    this_month = month_floor(timezone.localdate())
+    for table in PARTITIONED_TABLES:
+        assert this_month in existing_partitions(table)
+
+
+def test_visit_foreign_keys_have_no_single_column_index():
+    # The composite indexes starting with them serve the FK lookups.
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            single = [c["columns"] for c in constraints.values() if c["index"]]
+            assert ["mr_id"] not in single
+            assert ["doctor_name_id"] not in single
+
+
+def test_visit_partitions_command_creates_future_months():
+    call_command("visit_partitions", "--months-ahead", "6", stdout=StringIO())
+
+    far_month = add_months(month_floor(timezone.localdate()), 6)
+    for table in PARTITIONED_TABLES:
+        assert existing_partitions(table)[far_month] == partition_name(table, far_month)
+
+
+def test_visit_date_range_prunes_partitions(user):
+    this_month = month_floor(timezone.localdate())
+    last_month = add_months(this_month, -1)
+    create_partition("visits_doctorvisit", last_month)
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    DoctorVisit.objects.create(mr=user, doctor_name=doctor)
+
+    plan = DoctorVisit.objects.filter(visit_date__gte=this_month).explain()
+
+    assert partition_name("visits_doctorvisit", this_month) in plan
+    assert partition_name("visits_doctorvisit", last_month) not in plan
+
+
+# DETACH PARTITION CONCURRENTLY cannot run inside the per-test transaction.
+@pytest.mark.django_db(transaction=True)
+def test_archive_visits_moves_old_months_and_reads_through(user):
+    old_month = add_months(month_floor(timezone.localdate()), -30)
+    old_day = old_month.replace(day=12)
+    old_moment = timezone.make_aware(
+        datetime.datetime.combine(old_day, datetime.time(11, 30)),
+    )
+    for table in PARTITIONED_TABLES:
+        create_partition(table, old_month)
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    admin = UserFactory(role="admin", company_wide=True)
+    old_visit = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=doctor,
+        visit_type="task",
+        visited_at=old_moment,
+    )
+    task = DoctorVisitTask.objects.create(
+        assigned_to=user,
+        assigned_by=admin,
+        assigned_doctor=doctor,
+        due_date=old_day,
+        due_time="10:00",
+        visit_record=old_visit,
+        completed=True,
+    )
+    ShopVisit.objects.create(mr=user, shop_name="Apollo", visited_at=old_moment)
+    DoctorVisit.objects.create(mr=user, doctor_name=doctor)
+
+    call_command("archive_visits", "--older-than", "24", stdout=StringIO())
+
+    assert archived_months("doctor_visits") == [old_month]
+    assert archive_path("shop_visits", old_month).exists()
+    assert old_month not in existing_partitions("visits_doctorvisit")
+    assert DoctorVisit.objects.count() == 1
+    assert not ShopVisit.objects.exists()
+    task.refresh_from_db()
+    assert task.visit_record_id is None
+
+    client = APIClient()
+    client.force_authenticate(admin)
+    url = reverse("admin-mr-detail", kwargs={"mr_id": user.id})
+
+    recent = client.get(url, {"start_date": timezone.localdate().isoformat()}).data
+    assert recent["statistics"]["total_visits"] == 1
+
+    everything = client.get(url).data
+    assert everything["statistics"]["total_doctor_visits"] == 2
+    assert everything["statistics"]["total_shop_visits"] == 1
+    assert everything["statistics"]["task_based_doctor_visits"] == 1
+    assert everything["top_doctors"][0]["count"] == 2
+    assert everything["daily_breakdown"] == [
+        {"date": old_day.isoformat(), "doctor_visits": 1, "shop_visits": 1, "total": 2},
+        {
+            "date": timezone.localdate().isoformat(),
+            "doctor_visits": 1,
+            "shop_visits": 0,
+            "total": 1,
+        },
+    ]
+    archived = everything["doctor_visits"][-1]
+    assert archived["id"] == old_visit.id
+    assert archived["visit_date"] == old_day.isoformat()
+    assert archived["visit_time"] == "11:30:00"
+    assert archived["visited_at"] == old_moment.isoformat()
+    assert archived["doctor_name_display"] == "Dr. Rao"
+    assert archived["task_id"] == task.id
+    assert archived["is_assigned_task"] is True
+
+
+@pytest.mark.django_db(transaction=True)
+def test_detaching_old_months_unlinks_tasks_and_keeps_unarchived_data(user):
+    old_month = add_months(month_floor(timezone.localdate()), -40)
+    old_moment = timezone.make_aware(
+        datetime.datetime.combine(old_month, datetime.time(11, 30)),
+    )
+    for table in PARTITIONED_TABLES:
+        create_partition(table, old_month)
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    old_visit = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=doctor,
+        visit_type="task",
+        visited_at=old_moment,
+    )
+    task = DoctorVisitTask.objects.create(
+        assigned_to=user,
+        assigned_by=UserFactory(role="admin"),
+        assigned_doctor=doctor,
+        due_date=old_month,
+        due_time="10:00",
+        visit_record=old_visit,
+        completed=True,
+    )
+    name = partition_name("visits_doctorvisit", old_month)
+
+    with pytest.raises(CommandError, match=f"{old_month:%Y-%m}"):
+        call_command(
+            "visit_partitions",
+            "--detach-older-than",
+            "36",
+            "--drop",
+            stdout=StringIO(),
+        )
+    assert existing_partitions("visits_doctorvisit")[old_month] == name
+
+    try:
+        call_command("visit_partitions", "--detach-older-than", "36", stdout=StringIO())
+        assert old_month not in existing_partitions("visits_doctorvisit")
+        task.refresh_from_db()
+        assert task.visit_record_id is None
+    finally:
+        with connection.cursor() as cursor:
+            for table in PARTITIONED_TABLES:
+                cursor.execute(
+                    f"DROP TABLE IF EXISTS {partition_name(table, old_month)}",
+                )
+
+    # A task left pointing at a detached visit is completed again, not a 500.
+    DoctorVisitTask.objects.filter(pk=task.pk).update(visit_record_id=old_visit.pk)
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.post(reverse("doctor-tasks-complete", kwargs={"pk": task.pk}))
+    assert response.status_code == 200
+    assert response.data["visit_id"] != old_visit.pk
+
+
+def test_doctor_visit_keeps_client_supplied_visited_at(user):
+    this_month = month_floor(timezone.localdate())
+    create_partition("visits_doctorvisit", add_months(this_month, -1))
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    visited_at = timezone.localtime() - datetime.timedelta(hours=3)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        reverse("doctor-visits-list"),
+        {"doctor_name": doctor.id, "visited_at": visited_at.isoformat()},
+    )
+
+    assert response.status_code == 201, response.data
+    visit = DoctorVisit.objects.get(pk=response.data["id"])
+    assert visit.visited_at == visited_at
+    assert visit.visit_date == visited_at.date()
+    assert response.data["visit_time"] == visited_at.time().isoformat()
+
+
+def test_shop_visit_rejects_future_visited_at(user):
+    client = APIClient()
+    client.force_authenticate(user)
+
+    response = client.post(
+        reverse("shop-visits-list"),
+        {
+            "shop_name": "Apollo",
+            "visited_at": (timezone.now() + datetime.timedelta(hours=1)).isoformat(),
+        },
+    )
+
+    assert response.status_code == 400
+    assert "visited_at" in response.data
+
+
+def test_visit_timeline_merges_both_kinds_across_pages(
+    user,
+    django_assert_max_num_queries,
+):
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    start = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0)
+    expected = []
+    for minute in range(5):
+        moment = start + datetime.timedelta(minutes=minute)
+        expected.append(
+            (
+                "shop",
+                ShopVisit.objects.create(
+                    mr=user,
+                    shop_name="Apollo",
+                    visited_at=moment,
+                ).id,
+            ),
+        )
+        expected.append(
+            (
+                "doctor",
+                DoctorVisit.objects.create(
+                    mr=user,
+                    doctor_name=doctor,
+                    visited_at=moment,
+                ).id,
+            ),
+        )
+    DoctorVisit.objects.create(mr=UserFactory(), doctor_name=doctor, visited_at=start)
+    # Newest first; at the same instant the doctor visit comes first.
+    expected.reverse()
+    client = APIClient()
+    client.force_authenticate(user)
+
+    seen = []
+    url = reverse("visit-timeline")
+    params = {"page_size": 3}
+    while url:
+        with django_assert_max_num_queries(4):
+            page = client.get(url, params).data
+        seen += [(entry["kind"], entry["id"]) for entry in page["results"]]
+        url, params = page["next"], None
+
+    assert seen == expected
+
+
+def test_visit_timeline_filters_by_mr_and_date_for_admin(user):
+    doctor = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    other = UserFactory()
+    DoctorVisit.objects.create(mr=user, doctor_name=doctor)
+    ShopVisit.objects.create(mr=other, shop_name="Apollo")
+    client = APIClient()
+    client.force_authenticate(UserFactory(role="admin", company_wide=True))
+    url = reverse("visit-timeline")
+
+    assert len(client.get(url).data["results"]) == 2
+    results = client.get(url, {"mr": other.id}).data["results"]
+    assert [entry["kind"] for entry in results] == ["shop"]
+    tomorrow = timezone.localdate() + datetime.timedelta(days=1)
+    assert client.get(url, {"start_date": tomorrow.isoformat()}).data["results"] == []
+    assert client.get(url, {"cursor": "bogus"}).status_code == 404
+
+
+def test_index_advisor_reports_plans_and_rolls_back_its_workload():
+    out = StringIO()
+
+    call_command(
+        "index_advisor",
+        "--mrs",
+        "2",
+        "--doctors",
+        "3",
+        "--visits",
+        "60",
+        "--min-rows",
+        "0",
+        stdout=out,
+        stderr=StringIO(),
+    )
+
+    report = out.getvalue()
+    assert "admin dashboard:" in report
+    assert "Seq Scan on" in report
+    assert not User.objects.filter(username__startswith="index-advisor").exists()
+    assert not DoctorVisit.objects.exists()
+
+
+def test_index_advisor_turns_boolean_filter_into_partial_index():
+    plan = {
+        "Node Type": "Seq Scan",
+        "Relation Name": "tasks_doctorvisittask",
+        "Filter": (
+            "((NOT completed) AND (assigned_to_id = 3) "
+            "AND (due_date <= '2026-10-19'::date))"
+        ),
+        "Actual Rows": 12,
+        "Actual Loops": 1,
+        "Rows Removed by Filter": 5000,
+    }
+
+    (finding,) = analyse(plan, min_rows=1000)
+
+    assert finding["model"] is DoctorVisitTask
+    assert finding["index"].fields == ["assigned_to", "due_date"]
+    assert finding["index"].condition.children == [("completed", False)]
+
+
+def test_search_ranks_doctors_and_visits_and_scopes_mr_visits(user):
+    cardiologist = Doctor.objects.create(
+        name="Dr. Kulkarni",
+        specialization="Cardiology",
+    )
+    Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    mine = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=cardiologist,
+        notes="Discussed the new cardiology samples",
+    )
+    DoctorVisit.objects.create(
+        mr=UserFactory(),
+        doctor_name=cardiologist,
+        notes="Cardiology samples again",
+    )
+    shop = ShopVisit.objects.create(
+        mr=user,
+        shop_name="Apollo Pharmacy",
+        location="MG Road",
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("api:search")
+
+    results = client.get(url, {"q": "cardiology"}).data["results"]
+    assert [(entry["kind"], entry["id"]) for entry in results] == [
+        ("doctor", cardiologist.id),
+        ("doctor_visit", mine.id),
+    ]
+    assert results[0]["rank"] > results[1]["rank"]
+
+    fuzzy = client.get(url, {"q": "Apolo Pharmacy"}).data["results"]
+    assert [(entry["kind"], entry["id"]) for entry in fuzzy] == [
+        ("shop_visit", shop.id),
+    ]
+
+    paged = client.get(url, {"q": "cardiology", "page_size": 1}).data
+    assert len(paged["results"]) == 1
+    assert "page=2" in paged["next"]
+
+
+def test_search_filters_use_the_search_indexes():
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    plan = (
+        DoctorVisit.objects.filter(doctor_visit_matches("samples")).order_by().explain()
+    )
+    assert "search_vector_idx" in plan
+    plan = ShopVisit.objects.filter(shop_visit_matches("Apolo")).order_by().explain()
+    assert "shop_name_idx" in plan
+    assert "search_vector_idx" in plan
+
+
+def test_admin_search_matches_notes_and_doctor_names(user):
+    doctor = Doctor.objects.create(name="Dr. Kulkarni", specialization="Cardiology")
+    by_notes = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=doctor,
+        notes="Left brochures",
+    )
+    other = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=Doctor.objects.create(name="Dr. Rao", specialization="ENT"),
+    )
+    model_admin = DoctorVisitAdmin(DoctorVisit, admin.site)
+
+    def search(term):
+        queryset, _ = model_admin.get_search_results(
+            None,
+            DoctorVisit.objects.all(),
+            term,
+        )
+        return set(queryset)
+
+    assert search("brochure") == {by_notes}
+    assert search("Kulkarny") == {by_notes}
+    assert search(user.username) == {by_notes, other}
+
+
+VISIT_FILTER_COLUMNS = {
+    "mr": "mr_id",
+    "doctor": "doctor_name_id",
+    "visit_type": "visit_type",
+    "start_date": "visit_date",
+    "end_date": "visit_date",
+}
+
+
+def _combinations(names):
+    return [
+        combination
+        for size in range(len(names) + 1)
+        for combination in itertools.combinations(names, size)
+    ]
+
+
+def test_visit_list_filters_are_index_backed():
+    _, mr = seed_workload(mrs=20, doctors=100, visits=5000, days=90)
+    today = timezone.localdate()
+    values = {
+        "mr": mr.id,
+        "doctor": Doctor.objects.order_by("id").first().id,
+        "visit_type": "task",
+        "start_date": today - datetime.timedelta(days=30),
+        "end_date": today,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    problems = {}
+    for model, names in [
+        (DoctorVisit, ["mr", "doctor", "visit_type", "start_date", "end_date"]),
+        (ShopVisit, ["mr", "visit_type", "start_date", "end_date"]),
+    ]:
+        for combination in _combinations(names):
+            for ordering in VisitFilterSerializer.ORDERINGS:
+                data = {
+                    **{name: values[name] for name in combination},
+                    "ordering": ordering,
+                }
+                columns = {VISIT_FILTER_COLUMNS[name] for name in combination}
+                if scans := unindexed_scans(
+                    filter_visits(model.objects.all(), data),
+                    columns,
+                ):
+                    problems[(model.__name__, combination, ordering)] = scans
+    assert problems == {}
+
+
+def test_visit_lists_filter_by_type_date_and_doctor(user):
+    doctor = Doctor.objects.create(name="Dr. Shah", specialization="ENT")
+    other = Doctor.objects.create(name="Dr. Rao", specialization="ENT")
+    now = timezone.now()
+    old = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=doctor,
+        visited_at=now - datetime.timedelta(days=3),
+    )
+    recent = DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=doctor,
+        visited_at=now,
+        visit_type="task",
+    )
+    DoctorVisit.objects.create(mr=user, doctor_name=other, visited_at=now)
+    shop = ShopVisit.objects.create(
+        mr=user,
+        shop_name="Apollo",
+        visited_at=now - datetime.timedelta(days=3),
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+
+    by_doctor = client.get(
+        reverse("doctor-visits-list"),
+        {"doctor": doctor.id, "ordering": "visited_at"},
+    )
+    by_type = client.get(reverse("doctor-visits-list"), {"visit_type": "task"})
+    shops = client.get(
+        reverse("shop-visits-list"),
+        {"end_date": timezone.localdate(old.visited_at).isoformat()},
+    )
+    invalid = client.get(reverse("shop-visits-list"), {"visit_type": "walk-in"})
+
+    assert [visit["id"] for visit in by_doctor.data] == [old.id, recent.id]
+    assert [visit["id"] for visit in by_type.data] == [recent.id]
+    assert [visit["id"] for visit in shops.data] == [shop.id]
+    assert invalid.status_code == 400
+
+
+def test_mr_doctor_list_and_search_are_territory_scoped(user):
+    north, south = (
+        Territory.objects.create(name="North"),
+        Territory.objects.create(name="South"),
+    )
+    north.mrs.add(user)
+    mine = Doctor.objects.create(
+        name="Dr. Kulkarni",
+        specialization="Cardiology",
+        territory=north,
+    )
+    theirs = Doctor.objects.create(
+        name="Dr. Kumar",
+        specialization="Cardiology",
+        territory=south,
+    )
+    client = APIClient()
+    client.force_authenticate(user)
+
+    assert [doctor["id"] for doctor in client.get(reverse("doctors-list")).data] == [
+        mine.id,
+    ]
+    assert client.get(reverse("doctors-detail", args=[theirs.id])).status_code == 404
+    results = client.get(reverse("api:search"), {"q": "cardiology"}).data["results"]
+    assert [(entry["kind"], entry["id"]) for entry in results] == [("doctor", mine.id)]
+
+    created = client.post(
+        reverse("doctors-list"),
+        {"name": "Dr. New", "specialization": "ENT"},
+    )
+    assert created.data["territory"] == north.id
+    foreign = client.post(
+        reverse("doctors-list"),
+        {"name": "Dr. Far", "specialization": "ENT", "territory": south.id},
+    )
+    assert foreign.status_code == 400
+    assert "territory" in foreign.data
+
+    # Admins, and MRs not yet assigned a territory, keep the whole directory.
+    admin_client = APIClient()
+    admin_client.force_authenticate(UserFactory(role="admin"))
+    assert len(admin_client.get(reverse("doctors-list")).data) == 3  # noqa: PLR2004
+    unassigned = APIClient()
+    unassigned.force_authenticate(UserFactory())
+    assert len(unassigned.get(reverse("doctors-list")).data) == 3  # noqa: PLR2004
+
+
+def test_territory_doctor_list_is_index_backed():
+    _, mr = seed_workload(mrs=20, doctors=20000, visits=1000, days=30)
+    territories = Territory.objects.bulk_create(
+        Territory(name=f"Territory {n}") for n in range(50)
+    )
+    doctors = list(Doctor.objects.all())
+    for n, doctor in enumerate(doctors):
+        doctor.territory = territories[n % len(territories)]
+    Doctor.objects.bulk_update(doctors, ["territory"], batch_size=5000)
+    territories[0].mrs.add(mr)
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE visits_doctor")
+        cursor.execute(f"ANALYZE {Territory.mrs.through._meta.db_table}")  # noqa: SLF001
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    assert unindexed_scans(doctors_for(mr), {"territory_id", "user_id"}) == []
+    assert doctors_for(mr).count() == len(doctors) // len(territories)
+
+
+def test_admin_territory_rollup(user):
+    north, south = (
+        Territory.objects.create(name="North"),
+        Territory.objects.create(name="South"),
+    )
+    north.mrs.add(user)
+    doctors = [
+        Doctor.objects.create(name=f"Dr. {n}", specialization="ENT", territory=north)
+        for n in range(4)
+    ]
+    Doctor.objects.create(name="Dr. South", specialization="ENT", territory=south)
+    Doctor.objects.create(name="Dr. Nowhere", specialization="ENT")
+    for doctor in (doctors[0], doctors[0], doctors[1]):
+        DoctorVisit.objects.create(mr=user, doctor_name=doctor)
+    DoctorVisit.objects.create(
+        mr=user,
+        doctor_name=doctors[2],
+        visited_at=timezone.now() - datetime.timedelta(days=5),
+    )
+    manager = UserFactory(role="admin", company_wide=True)
+    DoctorVisitTask.objects.create(
+        assigned_to=user,
+        assigned_by=manager,
+        assigned_doctor=doctors[3],
+        due_date=timezone.localdate(),
+        due_time=datetime.time(10, 0),
+    )
+    client = APIClient()
+    client.force_authenticate(manager)
+
+    rollup = client.get(reverse("admin-territories"), {"days": 1}).data
+    assert [dict(row) for row in rollup] == [
+        {
+            "territory_id": north.id,
+            "territory": "North",
+            "doctors": 4,
+            "mrs": 1,
+            "visits": 3,
+            "doctors_visited": 2,
+            "coverage": 50.0,
+            "pending_tasks": 1,
+        },
+        {
+            "territory_id": south.id,
+            "territory": "South",
+            "doctors": 1,
+            "mrs": 0,
+            "visits": 0,
+            "doctors_visited": 0,
+            "coverage": 0.0,
+            "pending_tasks": 0,
+        },
+    ]
+    assert client.get(reverse("admin-territories"), {"days": 7}).data[0]["visits"] == 4  # noqa: PLR2004
+    assert client.get(reverse("admin-territories"), {"days": 0}).status_code == 400
+
+
+def test_territory_rollup_is_scoped_to_subtree():
+    north_manager, south_manager = UserFactory(role="admin"), UserFactory(role="admin")
+    north_mr, south_mr = (
+        UserFactory(manager=north_manager),
+        UserFactory(manager=south_manager),
+    )
+    north, shared, south = (
+        Territory.objects.create(name=name) for name in ("North", "Shared", "South")
+    )
+    north.mrs.add(north_mr)
+    shared.mrs.add(north_mr, south_mr)
+    south.mrs.add(south_mr)
+    for territory in (north, shared, south):
+        Doctor.objects.create(
+            name=f"Dr. {territory.name}",
+            specialization="ENT",
+            territory=territory,
+        )
+    client = APIClient()
+
+    def rollup(manager):
+        client.force_authenticate(manager)
+        return {
+            row["territory"]: row["mrs"]
+            for row in client.get(reverse("admin-territories")).data
+        }
+
+    assert rollup(north_manager) == {"North": 1, "Shared": 1}
+    assert rollup(south_manager) == {"Shared": 1, "South": 1}
+    assert rollup(UserFactory(role="admin", company_wide=True)) == {
+        "North": 1,
+        "Shared": 2,
+        "South": 1,
+    }
+
+
+@pytest.fixture
+def live_counters(settings, monkeypatch):
+    settings.LIVE_VISIT_COUNTERS = True
+    counters = live.LiveVisits(fakeredis.FakeRedis())
+    monkeypatch.setattr(live, "get_live_visits", lambda: counters)
+    return counters
+
+
+def test_live_counters_count_committed_visits(
+    user,
+    live_counters,
+    django_capture_on_commit_callbacks,
+    django_assert_num_queries,
+):
+    admin = UserFactory(role="admin", company_wide=True)
+    other = UserFactory()
+    rao, iyer = (
+        Doctor.objects.create(name="Dr. Rao"),
+        Doctor.objects.create(name="Dr. Iyer"),
+    )
+    today = timezone.localdate()
+    call_command("reconcile_live_visits", stdout=StringIO())
+    assert live_counters.read(today)["doctor"] == 0
+
+    client = APIClient()
+    with django_capture_on_commit_callbacks(execute=True):
+        client.force_authenticate(user)
+        for doctor in (rao, rao):
+            assert (
+                client.post(
+                    reverse("doctor-visits-list"),
+                    {"doctor_name": doctor.id},
+                ).status_code
+                == 201
+            )
+        assert (
+            client.post(
+                reverse("shop-visits-list"),
+                {"shop_name": "Apollo", "visit_type": "task"},
+            ).status_code
+            == 201
+        )
+        client.force_authenticate(other)
+        assert (
+            client.post(
+                reverse("doctor-visits-list"),
+                {"doctor_name": iyer.id},
+            ).status_code
+            == 201
+        )
+        # A rolled back visit is never counted.
+        with contextlib.suppress(RuntimeError), transaction.atomic():
+            DoctorVisit.objects.create(mr=other, doctor_name=iyer)
+            raise RuntimeError
+
+    counters = live_counters.read(today, top=2, per_mr=True)
+    assert (counters["doctor"], counters["shop"], counters["mrs_visited"]) == (3, 1, 2)
+    assert counters["top_doctors"] == [(rao.id, 2), (iyer.id, 1)]
+    assert counters["per_mr"]["task"] == {user.id: 1}
+    assert counters["per_mr"]["self"] == {user.id: 2, other.id: 1}
+
+    # Only the MR count and the top doctor's name are read from the database.
+    with django_assert_num_queries(2):
+        summary = sections.admin_summary(admin, today)
+    assert summary["total_visits_today"] == 4
+    assert summary["top_doctor_today"] == {"name": "Dr. Rao", "visits": 2}
+    client.force_authenticate(admin)
+    # The MRs and the top doctors, inside the view's savepoint.
+    with django_assert_num_queries(4):
+        from_counters = client.get(reverse("admin-analytics")).data
+    assert [row["total_visits"] for row in from_counters["mr_performance"]] == [3, 1]
+    # Other admins get their subtree's figures from SQL.
+    assert live.read(UserFactory(role="admin"), today) is None
+
+    # The same figures as counted in SQL.
+    live_counters.redis.flushall()
+    assert sections.admin_summary(admin, today) == summary
+    assert client.get(reverse("admin-analytics")).data == from_counters
+
+    # Deletes are not counted until the next reconcile.
+    call_command("reconcile_live_visits", stdout=StringIO())
+    DoctorVisit.objects.filter(mr=other).delete()
+    assert live_counters.read(today)["doctor"] == 3
+    out = StringIO()
+    call_command("reconcile_live_visits", "--days", "1", stdout=out)
+    assert out.getvalue() == f"{today}: 2 doctor visits (-1), 1 shop visits (+0)\n"
+    assert live_counters.read(today)["mrs_visited"] == 1
@@ -0,0 +1,89 @@
+"""
+Doctor and shop visits merged into one newest-first timeline.
+
+Each visit table is read with its own keyset query ordered by
+``(visited_at, id)`` descending, which the ``visited_at`` indexes serve
+without a sort. The two ordered streams are merged lazily with
+``heapq.merge``, so a page reads at most ``page_size + 1`` rows per table no
+matter how long the history is.
+"""
+
+import base64
+import binascii
+import datetime
+import heapq
+import itertools
+import json
+
+from django.db.models import Q
+
+# Breaks ties between a doctor and a shop visit recorded at the same instant.
+KIND_RANK = {"shop": 0, "doctor": 1}
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(key: tuple) -> str:
+    visited_at, rank, pk = key
+    raw = json.dumps([visited_at.isoformat(), rank, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        visited_at, rank, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        visited_at = datetime.datetime.fromisoformat(visited_at)
+    except (ValueError, TypeError, binascii.Error) as exc:
+        raise InvalidCursorError(cursor) from exc
+    if (
+        visited_at.tzinfo is None
+        or rank not in KIND_RANK.values()
+        or not isinstance(pk, int)
+    ):
+        raise InvalidCursorError(cursor)
+    return visited_at, rank, pk
+
+
+def _after(key: tuple, rank: int) -> Q:
+    """Rows of a table with ``rank`` that come after ``key`` in timeline order."""
+    visited_at, key_rank, pk = key
+    if rank < key_rank:
+        return Q(visited_at__lte=visited_at)
+    if rank > key_rank:
+        return Q(visited_at__lt=visited_at)
+    return Q(visited_at__lt=visited_at) | Q(visited_at=visited_at, id__lt=pk)
+
+
+def _stream(kind, rows):
+    rank = KIND_RANK[kind]
+    for visit in rows:
+        yield (visit.visited_at, rank, visit.pk), kind, visit
+
+
+def merge_timeline(querysets: dict, *, cursor: str | None = None, page_size: int):
+    """
+    Return one page of ``querysets`` (kind -> visit queryset) merged newest first.
+
+    The result is ``(entries, next_cursor)`` where ``entries`` is a list of
+    ``(kind, visit)`` pairs and ``next_cursor`` is ``None`` on the last page.
+    Raises ``InvalidCursorError`` for a cursor this module did not produce.
+    """
+    key = decode_cursor(cursor) if cursor else None
+
+    streams = []
+    for kind, queryset in querysets.items():
+        if key is not None:
+            queryset = queryset.filter(_after(key, KIND_RANK[kind]))  # noqa: PLW2901
+        rows = queryset.order_by("-visited_at", "-id")[: page_size + 1]
+        streams.append(_stream(kind, rows))
+
+    merged = heapq.merge(*streams, key=lambda entry: entry[0], reverse=True)
+    page = list(itertools.islice(merged, page_size + 1))
+
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1][0])
+    return [(kind, visit) for _, kind, visit in page], next_cursor
@@ -0,0 +1,94 @@
+"""
+Throughput through a pool of four connections as the number of threads
+competing for them grows well past four.
+
+Each thread stands for a worker thread serving requests: it runs a query,
+then closes its connection as Django does at the end of a request, which
+returns it to the pool. However many threads there are, the server sees
+at most four connections and throughput stays flat. Run with ``-s`` to see
+the figures:
+
+    uv run pytest tests/test_db_pool.py -s
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import connections
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from mr_tracker.users.tests.factories import UserFactory
+
+pytestmark = pytest.mark.django_db(transaction=True, databases=["default", "pooled"])
+
+POOL_SIZE = 4
+QUERIES_PER_THREAD = 10
+QUERY_SECONDS = 0.005
+
+
+@pytest.fixture
+def pooled():
+    connection = connections["pooled"]
+    yield connection
+    # Pooled connections hold the test database open; close them before it is dropped.
+    connection.close_pool()
+
+
+def run(threads):
+    """Queries per second with ``threads`` threads; returns the backends seen too."""
+    backends = set()
+    lock = threading.Lock()
+
+    def work(_):
+        connection = connections["pooled"]
+        for _ in range(QUERIES_PER_THREAD):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT pg_backend_pid() FROM pg_sleep(%s)",
+                    [QUERY_SECONDS],
+                )
+                pid = cursor.fetchone()[0]
+            connection.close()
+            with lock:
+                backends.add(pid)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, range(threads)))
+    return threads * QUERIES_PER_THREAD / (time.perf_counter() - started), backends
+
+
+def test_throughput_is_stable_with_more_threads_than_connections(
+    pooled,
+    record_property,
+):
+    rates = {}
+    for threads in (4, 16, 64):
+        rates[threads], backends = run(threads)
+        assert len(backends) <= POOL_SIZE
+        record_property(f"queries_per_second_{threads}_threads", round(rates[threads]))
+
+    stats = pooled.pool.get_stats()
+    assert stats["pool_max"] == POOL_SIZE
+    assert stats.get("requests_errors", 0) == 0
+    assert stats.get("requests_queued", 0) > 0
+    assert min(rates.values()) > 0.5 * max(rates.values())
+
+
+def test_pool_stats_endpoint(pooled):
+    run(POOL_SIZE)
+    client = APIClient()
+    client.force_authenticate(UserFactory(is_staff=True))
+    response = client.get(reverse("db-pool"))
+    assert response.status_code == 200
+    assert response.data["pools"]["pooled"]["pool_max"] == POOL_SIZE
+    assert (
+        response.data["pools"]["pooled"]["requests_num"]
+        >= POOL_SIZE * QUERIES_PER_THREAD
+    )
+
+    client.force_authenticate(UserFactory(role="admin"))
+    assert client.get(reverse("db-pool")).status_code == 403
@@ -0,0 +1,116 @@
+"""
+The API's transaction policy (see ``config.transactions``).
+
+Every API view that serves GET opts out of ``ATOMIC_REQUESTS`` and declares
+a ``read_policy``; every view that writes still runs its writes in a
+transaction.
+"""
+
+import datetime
+
+import pytest
+from django.db import DEFAULT_DB_ALIAS
+from django.db import connection
+from django.urls import URLPattern
+from django.urls import get_resolver
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from config.transactions import ReadPolicyMixin
+from mr_tracker.tasks.models import DoctorVisitTask
+from mr_tracker.users.tests.factories import UserFactory
+from mr_tracker.visits.models import Doctor
+from mr_tracker.visits.models import ShopVisit
+
+SAFE = {"get", "head", "options"}
+
+
+def api_views(patterns=None, prefix=""):
+    """``(route, view)`` for every URL pattern under ``api/``."""
+    for pattern in get_resolver().url_patterns if patterns is None else patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLPattern):
+            if route.startswith("api/"):
+                yield route, pattern.callback
+        else:
+            yield from api_views(pattern.url_patterns, route)
+
+
+def methods(view):
+    if getattr(view, "actions", None):  # A viewset route.
+        return set(view.actions)
+    return {
+        method
+        for method in view.cls.http_method_names
+        if method != "options" and hasattr(view.cls, method)
+    }
+
+
+def non_atomic(view):
+    return DEFAULT_DB_ALIAS in getattr(view, "_non_atomic_requests", set())
+
+
+@pytest.mark.parametrize(
+    ("route", "view"),
+    list(api_views()),
+    ids=lambda value: value if isinstance(value, str) else "",
+)
+def test_api_views_declare_a_transaction_policy(route, view):
+    assert hasattr(view, "cls"), f"{route} is not an API view"
+    handled = methods(view)
+    if "get" in handled:
+        assert issubclass(view.cls, ReadPolicyMixin), (
+            f"{route} serves GET without a read_policy"
+        )
+        assert non_atomic(view), f"{route} serves GET inside ATOMIC_REQUESTS"
+    if handled - SAFE:
+        # Either ATOMIC_REQUESTS still applies, or the mixin wraps the writes.
+        assert not non_atomic(view) or (
+            issubclass(view.cls, ReadPolicyMixin) and not view.cls.view_is_async
+        ), f"{route} writes outside a transaction"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reads_follow_the_policy_and_writes_stay_atomic():
+    admin = UserFactory(role="admin")
+    mr = UserFactory(manager=admin)
+    DoctorVisitTask.objects.create(
+        assigned_to=mr,
+        assigned_by=admin,
+        assigned_doctor=Doctor.objects.create(name="Dr. Rao"),
+        due_date=timezone.localdate(),
+        due_time=datetime.time(10),
+    )
+    client = APIClient()
+    statements = []
+
+    def record(execute, sql, params, many, context):
+        statements.append((sql, connection.in_atomic_block))
+        return execute(sql, params, many, context)
+
+    def run(user, method, url, **kwargs):
+        client.force_authenticate(user)
+        statements.clear()
+        with connection.execute_wrapper(record):
+            response = getattr(client, method)(url, **kwargs)
+        assert response.status_code < 300  # noqa: PLR2004
+        return list(statements)
+
+    # NON_ATOMIC: autocommit, no transaction around the view.
+    mr_list = run(admin, "get", reverse("api:users_api:mr_list"))
+    assert mr_list
+    assert not any(atomic for _, atomic in mr_list)
+
+    # READ_ONLY: one read-only transaction around all of the view's queries.
+    task_list = run(admin, "get", reverse("doctor-tasks-list"))
+    assert (
+        task_list[0][0] == "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+    )
+    assert all(atomic for _, atomic in task_list)
+
+    # Writes run in a transaction, as under ATOMIC_REQUESTS.
+    created = run(mr, "post", reverse("shop-visits-list"), data={"shop_name": "Apollo"})
+    assert any(sql.startswith("INSERT") for sql, _ in created)
+    assert all(atomic for _, atomic in created)
+    assert ShopVisit.objects.filter(mr=mr).exists()